@@ -0,0 +1,7 @@
+'''
+Benchmarks of the reader, decoder and renderer stages, run with
+
+	python -m benchmarks [-o report.json]
+
+from the top of the source tree.
+'''
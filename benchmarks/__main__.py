@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from teletextimager import teletextdecoder, teletextrenderpil
+from teletextimager.reader import parallelt42, readep1, readt42, readtti
+
+from benchmarks import corpus
+
+levels = ('1', '1.5', '2.5', '3.5')
+
+def percentile(sorted_values, p):
+	'''
+	Returns the p'th percentile of a sorted list, interpolating between the nearest values.
+	'''
+	if len(sorted_values) == 1:
+		return sorted_values[0]
+	k = (len(sorted_values) - 1) * p / 100
+	f = int(k)
+	c = min(f + 1, len(sorted_values) - 1)
+	return sorted_values[f] + (sorted_values[c] - sorted_values[f]) * (k - f)
+
+def run_stage(items, func, repeat):
+	'''
+	Calls func on each item repeat times, timing each call. func returns the
+	number of pages it handled. Then calls it once more on each item with
+	tracemalloc running to find the peak memory used.
+	'''
+	latencies = []
+	pages = 0
+	total = 0.0
+
+	for _ in range(repeat):
+		for item in items:
+			start = time.perf_counter()
+			pages += func(item)
+			elapsed = time.perf_counter() - start
+			latencies.append(elapsed)
+			total += elapsed
+
+	tracemalloc.start()
+	for item in items:
+		func(item)
+	peak_memory = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	latencies.sort()
+	return {
+		'calls': len(latencies),
+		'pages': pages,
+		'seconds': total,
+		'pages_per_sec': pages / total if total > 0 else None,
+		'latency_ms': {
+			'min': latencies[0] * 1000,
+			'mean': total / len(latencies) * 1000,
+			'p50': percentile(latencies, 50) * 1000,
+			'p90': percentile(latencies, 90) * 1000,
+			'p99': percentile(latencies, 99) * 1000,
+			'max': latencies[-1] * 1000
+		},
+		'peak_memory_bytes': peak_memory
+	}
+
+def main():
+	parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Time the reader, decoder and renderer stages of teletextimager')
+	parser.add_argument('-n', '--pages', type=int, default=10, help='pages of each kind in the corpus')
+	parser.add_argument('-r', '--repeat', type=int, default=3, help='times to run each stage over the corpus')
+	parser.add_argument('--seed', type=int, default=0, help='seed for generating the corpus')
+	parser.add_argument('--t42-pages', type=int, default=1000, help='pages in the T42 capture')
+	parser.add_argument('--stage', action='append', help='only run stages whose names start with this, can be repeated')
+	parser.add_argument('-o', '--outfile', help='write the JSON report to this file instead of stdout')
+	args = parser.parse_args()
+
+	def wanted(name):
+		return args.stage == None or any(name.startswith(s) for s in args.stage)
+
+	pages = corpus.make_corpus(args.pages, args.seed)
+	stages = {}
+
+	with tempfile.TemporaryDirectory() as temp_dir:
+		# One TTI and one EP1 file per page, as they would be found in a page archive
+		tti_files = []
+		ep1_files = []
+		for i, (kind, page) in enumerate(pages):
+			tti_files.append(os.path.join(temp_dir, '{0}.tti'.format(i)))
+			with open(tti_files[-1], 'w') as f:
+				f.write(corpus.tti_file([page]))
+			ep1_files.append(os.path.join(temp_dir, '{0}.ep1'.format(i)))
+			with open(ep1_files[-1], 'wb') as f:
+				f.write(corpus.ep1_file(page))
+
+		if wanted('read_tti'):
+			my_reader = readtti.TeletextReadTTI()
+			stages['read_tti'] = run_stage(tti_files, lambda f: len(my_reader.read(f)), args.repeat)
+
+		if wanted('read_ep1'):
+			my_reader = readep1.TeletextReadEP1()
+			stages['read_ep1'] = run_stage(ep1_files, lambda f: len(my_reader.read(f)), args.repeat)
+
+	if any(wanted(name) for name in ('read_t42', 'read_t42_pages', 'read_t42_mmap', 'read_t42_parallel')):
+		# A large capture made of the corpus pages repeated with different page numbers
+		capture_pages = []
+		for i in range(args.t42_pages):
+			page = dict(pages[i % len(pages)][1])
+			page['number'] = (page['number'] & 0x700) | (i % 0x100 if i % 0x100 != 0xff else 0)
+			capture_pages.append(page)
+		capture = corpus.t42_capture(capture_pages)
+
+		def read_t42(_):
+			my_reader = readt42.TeletextReadT42()
+			source = io.BytesIO(capture)
+			n = 0
+			while my_reader.read(source) != None:
+				n += 1
+			return n
+
+		if wanted('read_t42'):
+			stages['read_t42'] = run_stage([capture], read_t42, args.repeat)
+			stages['read_t42']['capture_bytes'] = len(capture)
+
+		if wanted('read_t42_pages'):
+			def read_t42_pages(_):
+				my_reader = readt42.TeletextReadT42()
+				return sum(1 for _ in my_reader.pages(io.BytesIO(capture)))
+
+			stages['read_t42_pages'] = run_stage([capture], read_t42_pages, args.repeat)
+			stages['read_t42_pages']['capture_bytes'] = len(capture)
+
+		if wanted('read_t42_mmap'):
+			def read_t42_mmap(_):
+				my_reader = readt42.TeletextReadT42MMap()
+				return sum(1 for _ in my_reader.pages(capture))
+
+			stages['read_t42_mmap'] = run_stage([capture], read_t42_mmap, args.repeat)
+			stages['read_t42_mmap']['capture_bytes'] = len(capture)
+
+		if wanted('read_t42_parallel'):
+			# Worker processes read the capture from a file
+			with tempfile.TemporaryDirectory() as temp_dir:
+				capture_file = os.path.join(temp_dir, 'capture.t42')
+				with open(capture_file, 'wb') as f:
+					f.write(capture)
+
+				def read_t42_parallel(_):
+					my_reader = parallelt42.TeletextReadT42Parallel(chunk_size=len(capture) // (os.cpu_count() or 1) + 1)
+					return sum(1 for _ in my_reader.pages(capture_file))
+
+				stages['read_t42_parallel'] = run_stage([capture], read_t42_parallel, args.repeat)
+				stages['read_t42_parallel']['capture_bytes'] = len(capture)
+				stages['read_t42_parallel']['workers'] = os.cpu_count()
+
+	my_decoder = teletextdecoder.TeletextDecode()
+
+	for level in levels:
+		if wanted('decode_' + level):
+			def decode(page):
+				my_decoder.decode(page, level=level)
+				return 1
+
+			stages['decode_' + level] = run_stage([p for k, p in pages], decode, args.repeat)
+			stages['decode_' + level]['latency_ms_by_kind'] = {}
+			for kind in corpus.kinds:
+				stages['decode_' + level]['latency_ms_by_kind'][kind] = run_stage([p for k, p in pages if k == kind], decode, args.repeat)['latency_ms']
+
+	if any(wanted('render_' + str(f)) for f in range(6)):
+		decoded = [my_decoder.decode(p, snapshot=True) for k, p in pages]
+		my_renderer = teletextrenderpil.TeletextRenderPIL()
+		for flash_phase in range(6):
+			if wanted('render_' + str(flash_phase)):
+				def render(decoded_page):
+					my_renderer.render(decoded_page, flash_phase=flash_phase)
+					return 1
+
+				stages['render_' + str(flash_phase)] = run_stage(decoded, render, args.repeat)
+
+	report = {
+		'python': platform.python_version(),
+		'implementation': platform.python_implementation(),
+		'machine': platform.machine(),
+		'corpus': {
+			'kinds': corpus.kinds,
+			'pages_per_kind': args.pages,
+			'seed': args.seed
+		},
+		'repeat': args.repeat,
+		'stages': stages
+	}
+
+	if args.outfile == None:
+		json.dump(report, sys.stdout, indent=2)
+		print()
+	else:
+		with open(args.outfile, 'w') as f:
+			json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+	main()
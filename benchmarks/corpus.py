@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import random
+
+from teletextimager.bits import hamming_24_18
+
+# Kinds of page in the corpus
+kinds = ('plain', 'double', 'flash', 'objects')
+
+hamming_8_4_encode = [
+	0x15, 0x02, 0x49, 0x5e, 0x64, 0x73, 0x38, 0x2f,
+	0xd0, 0xc7, 0x8c, 0x9b, 0xa1, 0xb6, 0xfd, 0xea
+]
+
+_hamming_24_18_cache = {}
+
+def hamming_24_18_encode(d):
+	'''
+	Returns the three bytes of an 18-bit triplet Hamming 24/18 encoded.
+	'''
+	if d in _hamming_24_18_cache:
+		return _hamming_24_18_cache[d]
+
+	# Data bits D1-D4 sit in bits 2, 4, 5 and 6 of the first byte, D5-D11 and D12-D18
+	# in the low seven bits of the other two. Try each setting of the six parity bits
+	# until none of the parity checks fail.
+	e0 = ((d & 0x1) << 2) | ((d & 0xe) << 3)
+	e1 = (d >> 4) & 0x7f
+	e2 = (d >> 11) & 0x7f
+	for p in range(64):
+		b0 = e0 | (p & 0x01) | (p & 0x02) | ((p & 0x04) << 1) | ((p & 0x08) << 4)
+		b1 = e1 | ((p & 0x10) << 3)
+		b2 = e2 | ((p & 0x20) << 2)
+		if hamming_24_18.ham_24_18_parity_1st[b0] ^ hamming_24_18.ham_24_18_parity_2nd[b1] ^ hamming_24_18.ham_24_18_parity_3rd[b2] == 0:
+			_hamming_24_18_cache[d] = bytes((b0, b1, b2))
+			return _hamming_24_18_cache[d]
+
+	raise ValueError('No Hamming 24/18 codeword for {0:05x}'.format(d))
+
+def odd_parity(b):
+	b &= 0x7f
+	if bin(b).count('1') % 2 == 0:
+		b |= 0x80
+	return b
+
+def triplet(address, mode, data):
+	return address | (mode << 6) | (data << 11)
+
+def level1_row(rng, kind):
+	'''
+	Returns a row of 40 bytes of text, mosaics and spacing attributes.
+	'''
+	if kind == 'double':
+		attributes = (0x0d, 0x0d, 0x0e, 0x0f, 0x0c, 0x01, 0x02, 0x12, 0x1d, 0x1c)
+	elif kind == 'flash':
+		attributes = (0x08, 0x08, 0x09, 0x01, 0x03, 0x14, 0x1d)
+	else:
+		attributes = tuple(range(0x20))
+
+	row = bytearray(b' ' * 40)
+	for c in range(40):
+		x = rng.random()
+		if x < 0.12:
+			row[c] = rng.choice(attributes)
+		elif x < 0.25:
+			row[c] = rng.randrange(0x20, 0x80)
+		elif x < 0.7:
+			row[c] = rng.choice(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 ')
+	return row
+
+def column_enhancement(rng, c):
+	mode = rng.choice((0x00, 0x01, 0x02, 0x03, 0x07, 0x08, 0x09, 0x0b, 0x0c, 0x0f) + tuple(range(0x10, 0x20)))
+	if mode == 0x00 or mode == 0x03:
+		data = rng.randrange(32)
+	elif mode == 0x07:
+		data = rng.randrange(24)
+	elif mode == 0x08:
+		data = rng.choice((0x00, 0x20, 0x27, 0x2c, 0x37, 0x40, 0x50, 0x55, 0x57, 0x08))
+	elif mode == 0x0c:
+		data = rng.randrange(128)
+	else:
+		data = rng.randrange(0x20, 0x80)
+	return triplet(c, mode, data)
+
+def enhancement_packets(rng):
+	'''
+	Returns X/26 packets holding Local Enhancement Data which invokes Active,
+	Adaptive and Passive Objects, and the definitions of those Objects.
+	'''
+	enhancements = []
+	for r in sorted(rng.sample(range(1, 13), 3)):
+		enhancements.append(triplet(40 + r, 0x04, rng.randrange(40)))
+		for c in sorted(rng.sample(range(40), 3)):
+			enhancements.append(column_enhancement(rng, c))
+
+	definitions = []
+	for k, r in enumerate(sorted(rng.sample(range(13, 19), 3))):
+		# One of each type of Object: Active, Adaptive and Passive
+		obj_mode = (0x11, 0x12, 0x13)[k]
+		d = 3 + k
+		enhancements.append(triplet(40 + r, 0x04, rng.randrange(20)))
+		enhancements.append(triplet(0x28, obj_mode, d << 4))
+
+		body = [triplet(0x38, obj_mode | 0x04, d << 4)]
+		for obj_r in range(2):
+			body.append(triplet(40 + obj_r if obj_r else 41, 0x04, rng.randrange(20)))
+			for c in sorted(rng.sample(range(20), 3)):
+				body.append(column_enhancement(rng, c))
+		definitions.append((d, body))
+
+	enhancements.append(triplet(63, 0x1f, 0))
+
+	packets = {}
+	enhancements += [triplet(63, 0x1f, 0)] * (39 - len(enhancements))
+	for d in range(3):
+		packets[(26, d)] = enhancements[d * 13:(d + 1) * 13]
+	for d, body in definitions:
+		body.append(triplet(63, 0x1f, 0))
+		body += [triplet(63, 0x1f, 0)] * (13 - len(body))
+		packets[(26, d)] = body[:13]
+
+	return packets
+
+def make_page(rng, kind, number=0x100, subcode=0):
+	'''
+	Returns the packets of a page of the given kind, in the form the readers return.
+	'''
+	page = {'control_bits': set(), 'number': number, 'subcode': subcode}
+	page[0] = bytearray(b' ' * 8) + bytearray('P{0:03x}  TELETEXT {0:03x} Mon 01 Jan 12:34/56'.format(number & 0x7ff).encode()[:32])
+
+	for r in range(1, 25):
+		page[r] = level1_row(rng, kind)
+
+	if kind == 'objects':
+		page.update(enhancement_packets(rng))
+		# Page presentation with a side panel and a different CLUT
+		page[(28, 0)] = [rng.randrange(1 << 18) for _ in range(13)]
+		page[(28, 0)][0] &= 0x3c07f
+
+	return page
+
+def make_corpus(pages_per_kind, seed=0):
+	'''
+	Returns a list of (kind, page) pairs with pages_per_kind pages of each kind.
+	'''
+	rng = random.Random(seed)
+	result = []
+	for k, kind in enumerate(kinds):
+		for i in range(pages_per_kind):
+			result.append((kind, make_page(rng, kind, 0x100 + k * 0x100 + i, i)))
+	return result
+
+# Writers for the file formats
+
+def tti_file(pages):
+	'''
+	Returns a TTI file holding the pages as subpages.
+	'''
+	lines = []
+	for s, page in enumerate(pages):
+		lines.append('DE,benchmark page\n')
+		lines.append('PN,{0:03x}{1:02d}\n'.format(page['number'], s + 1))
+		lines.append('SC,{0:04x}\n'.format(page['subcode']))
+		lines.append('PS,8000\n')
+		lines.append('CT,8,T\n')
+		for k in sorted(k for k in page if type(k) is tuple):
+			line = chr(0x40 | k[1])
+			for t in page[k]:
+				line += chr(0x40 | (t & 0x3f)) + chr(0x40 | ((t >> 6) & 0x3f)) + chr(0x40 | ((t >> 12) & 0x3f))
+			lines.append('OL,{0},{1}\n'.format(k[0], line))
+		for r in range(1, 25):
+			line = ''
+			for b in page[r]:
+				if b < 0x20:
+					line += '\x1b' + chr(0x40 | b)
+				else:
+					line += chr(b)
+			lines.append('OL,{0},{1}\n'.format(r, line))
+	return ''.join(lines)
+
+def ep1_file(page):
+	'''
+	Returns an EP1 file holding one page.
+	'''
+	result = bytearray()
+	x26 = sorted(k for k in page if type(k) is tuple and k[0] == 26)
+	result += b'\xfe\x01' + bytes((0x09, 0xca if x26 else 0x00, 0, 0))
+	if x26:
+		n = len(x26) * 40
+		result += bytes((0, 0, n & 0xff, n >> 8))
+		for k in x26:
+			packet = bytearray(40)
+			for j, t in enumerate(page[k]):
+				packet[1 + j * 3] = t & 0x3f
+				packet[2 + j * 3] = (t >> 6) & 0x1f
+				packet[3 + j * 3] = t >> 11
+			result += packet
+	result += b' ' * 40
+	for r in range(1, 24):
+		result += page[r]
+	return bytes(result)
+
+def t42_packet(mag, pkt, payload):
+	return bytes((hamming_8_4_encode[(mag & 0x7) | ((pkt & 0x1) << 3)], hamming_8_4_encode[pkt >> 1])) + bytes(payload)
+
+def t42_capture(pages):
+	'''
+	Returns a T42 capture holding the pages one after another, ending with a
+	header in each magazine so that the last page in each magazine is finished.
+	'''
+	result = bytearray()
+	for page in pages:
+		mag = (page['number'] >> 8) & 0x7
+		page_no = page['number'] & 0xff
+		subcode = page['subcode']
+		header = [
+			hamming_8_4_encode[page_no & 0xf], hamming_8_4_encode[page_no >> 4],
+			hamming_8_4_encode[subcode & 0xf], hamming_8_4_encode[(subcode >> 4) & 0x7],
+			hamming_8_4_encode[(subcode >> 8) & 0xf], hamming_8_4_encode[(subcode >> 12) & 0x3],
+			hamming_8_4_encode[0], hamming_8_4_encode[0]
+		]
+		result += t42_packet(mag, 0, header + [odd_parity(b) for b in page[0][8:40]])
+		for k in sorted(k for k in page if type(k) is tuple):
+			payload = bytearray((hamming_8_4_encode[k[1]], ))
+			for t in page[k]:
+				payload += hamming_24_18_encode(t)
+			result += t42_packet(mag, k[0], payload)
+		for r in range(1, 25):
+			result += t42_packet(mag, r, [odd_parity(b) for b in page[r]])
+
+	for mag in range(8):
+		result += t42_packet(mag, 0, [hamming_8_4_encode[0xe], hamming_8_4_encode[0xf]] + [hamming_8_4_encode[0]] * 6 + [odd_parity(0x20)] * 32)
+
+	return bytes(result)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+from contextlib import contextmanager
+import os
+import secrets
+
+@contextmanager
+def atomic_write(path):
+	'''
+	Opens a temporary file next to path for writing in binary mode, and moves
+	it over path when the with block completes, so that other processes never
+	read a partially written file. If the block raises, the temporary file is
+	removed instead.
+
+	Unlike the files made by tempfile, which only their owner can read, the
+	temporary file is created with mode 0666 for the kernel to apply the
+	umask to, as it would for any other new file.
+	'''
+	directory, name = os.path.split(os.path.abspath(path))
+	while True:
+		temp_path = os.path.join(directory, '.{}.{}.tmp'.format(name, secrets.token_hex(8)))
+		try:
+			fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+			break
+		except FileExistsError:
+			pass
+
+	try:
+		with os.fdopen(fd, 'wb') as f:
+			yield f
+		os.replace(temp_path, path)
+	except:
+		try:
+			os.unlink(temp_path)
+		except OSError:
+			pass
+		raise
@@ -105,38 +105,49 @@ ham_24_18_parity_3rd = [
 	0x1f, 0x2e, 0x2d, 0x1c, 0x2c, 0x1d, 0x1e, 0x2f
 ]
 
-def decode(e0, e1, e2):
-	ham_24_18_decode_d1_d4 = [
-		0x00, 0x01, 0x00, 0x01, 0x02, 0x03, 0x02, 0x03,
-		0x04, 0x05, 0x04, 0x05, 0x06, 0x07, 0x06, 0x07,
-		0x08, 0x09, 0x08, 0x09, 0x0a, 0x0b, 0x0a, 0x0b,
-		0x0c, 0x0d, 0x0c, 0x0d, 0x0e, 0x0f, 0x0e, 0x0f,
-		0x00, 0x01, 0x00, 0x01, 0x02, 0x03, 0x02, 0x03,
-		0x04, 0x05, 0x04, 0x05, 0x06, 0x07, 0x06, 0x07,
-		0x08, 0x09, 0x08, 0x09, 0x0a, 0x0b, 0x0a, 0x0b,
-		0x0c, 0x0d, 0x0c, 0x0d, 0x0e, 0x0f, 0x0e, 0x0f
-	]
-	# Mapping from parity checks in ham_24_18_parities to incorrect bit
-	# 0x80000000 - double bit error that can't be corrected
-	ham_24_18_decode_correct = [
-		0x00000000, 0x80000000, 0x80000000, 0x80000000,
-		0x80000000, 0x80000000, 0x80000000, 0x80000000,
-		0x80000000, 0x80000000, 0x80000000, 0x80000000,
-		0x80000000, 0x80000000, 0x80000000, 0x80000000,
-		0x80000000, 0x80000000, 0x80000000, 0x80000000,
-		0x80000000, 0x80000000, 0x80000000, 0x80000000,
-		0x80000000, 0x80000000, 0x80000000, 0x80000000,
-		0x80000000, 0x80000000, 0x80000000, 0x80000000,
-		0x00000000, 0x00000000, 0x00000000, 0x00000001,
-		0x00000000, 0x00000002, 0x00000004, 0x00000008,
-		0x00000000, 0x00000010, 0x00000020, 0x00000040,
-		0x00000080, 0x00000100, 0x00000200, 0x00000400,
-		0x00000000, 0x00000800, 0x00001000, 0x00002000,
-		0x00004000, 0x00008000, 0x00010000, 0x00020000,
-		0x80000000, 0x80000000, 0x80000000, 0x80000000,
-		0x80000000, 0x80000000, 0x80000000, 0x80000000
-	]
+ham_24_18_decode_d1_d4 = [
+	0x00, 0x01, 0x00, 0x01, 0x02, 0x03, 0x02, 0x03,
+	0x04, 0x05, 0x04, 0x05, 0x06, 0x07, 0x06, 0x07,
+	0x08, 0x09, 0x08, 0x09, 0x0a, 0x0b, 0x0a, 0x0b,
+	0x0c, 0x0d, 0x0c, 0x0d, 0x0e, 0x0f, 0x0e, 0x0f,
+	0x00, 0x01, 0x00, 0x01, 0x02, 0x03, 0x02, 0x03,
+	0x04, 0x05, 0x04, 0x05, 0x06, 0x07, 0x06, 0x07,
+	0x08, 0x09, 0x08, 0x09, 0x0a, 0x0b, 0x0a, 0x0b,
+	0x0c, 0x0d, 0x0c, 0x0d, 0x0e, 0x0f, 0x0e, 0x0f
+]
+
+# Mapping from parity checks in ham_24_18_parities to incorrect bit
+# 0x80000000 - double bit error that can't be corrected
+ham_24_18_decode_correct = [
+	0x00000000, 0x80000000, 0x80000000, 0x80000000,
+	0x80000000, 0x80000000, 0x80000000, 0x80000000,
+	0x80000000, 0x80000000, 0x80000000, 0x80000000,
+	0x80000000, 0x80000000, 0x80000000, 0x80000000,
+	0x80000000, 0x80000000, 0x80000000, 0x80000000,
+	0x80000000, 0x80000000, 0x80000000, 0x80000000,
+	0x80000000, 0x80000000, 0x80000000, 0x80000000,
+	0x80000000, 0x80000000, 0x80000000, 0x80000000,
+	0x00000000, 0x00000000, 0x00000000, 0x00000001,
+	0x00000000, 0x00000002, 0x00000004, 0x00000008,
+	0x00000000, 0x00000010, 0x00000020, 0x00000040,
+	0x00000080, 0x00000100, 0x00000200, 0x00000400,
+	0x00000000, 0x00000800, 0x00001000, 0x00002000,
+	0x00004000, 0x00008000, 0x00010000, 0x00020000,
+	0x80000000, 0x80000000, 0x80000000, 0x80000000,
+	0x80000000, 0x80000000, 0x80000000, 0x80000000
+]
+
+# Each byte of a triplet looked up as its data bits in bits 0-17 and its
+# part of the parity checks in bits 18-23, so that a triplet decodes by
+# XORing three lookups together, see decode_triplets()
+_ham_24_18_lookup_1st = [ham_24_18_decode_d1_d4[e >> 2] | (ham_24_18_parity_1st[e] << 18) for e in range(256)]
+_ham_24_18_lookup_2nd = [((e & 0x7f) << 4) | (ham_24_18_parity_2nd[e] << 18) for e in range(256)]
+_ham_24_18_lookup_3rd = [((e & 0x7f) << 11) | (ham_24_18_parity_3rd[e] << 18) for e in range(256)]
+
+# The same tables as NumPy arrays, made the first time decode_triplets_array() is called
+_numpy_tables = None
 
+def decode(e0, e1, e2):
 	d1_d4 = ham_24_18_decode_d1_d4[e0 >> 2]
 	d5_d11 = e1 & 0x7f
 	d12_d18 = e2 & 0x7f
@@ -148,3 +159,44 @@ def decode(e0, e1, e2):
 	d ^= ham_24_18_decode_correct[abcdef]
 
 	return d
+
+def decode_triplets(data):
+	'''
+	Decodes the triplets of three bytes each held in data, such as the 13
+	triplets of an X/26, X/27 or X/28 packet. Returns a list of the decoded
+	values, with bit 31 set on those that have a double bit error as with
+	decode().
+	'''
+	lookup_1st = _ham_24_18_lookup_1st
+	lookup_2nd = _ham_24_18_lookup_2nd
+	lookup_3rd = _ham_24_18_lookup_3rd
+	correct = ham_24_18_decode_correct
+
+	result = []
+	for e0, e1, e2 in zip(data[0::3], data[1::3], data[2::3]):
+		d = lookup_1st[e0] ^ lookup_2nd[e1] ^ lookup_3rd[e2]
+		result.append((d & 0x3ffff) ^ correct[d >> 18])
+	return result
+
+def decode_triplets_array(data):
+	'''
+	Decodes triplets like decode_triplets(), but all at once from a NumPy
+	array of bytes whose last axis holds the three bytes of each triplet,
+	for example shaped (N, 13, 3) for the triplets of N packets. Returns a
+	uint32 array of the decoded values. Needs NumPy to be installed.
+	'''
+	import numpy as np
+
+	global _numpy_tables
+	if _numpy_tables == None:
+		_numpy_tables = (
+			np.array(_ham_24_18_lookup_1st, dtype=np.uint32),
+			np.array(_ham_24_18_lookup_2nd, dtype=np.uint32),
+			np.array(_ham_24_18_lookup_3rd, dtype=np.uint32),
+			np.array(ham_24_18_decode_correct, dtype=np.uint32)
+		)
+	lookup_1st, lookup_2nd, lookup_3rd, correct = _numpy_tables
+
+	data = np.asarray(data, dtype=np.uint8)
+	d = lookup_1st[data[..., 0]] ^ lookup_2nd[data[..., 1]] ^ lookup_3rd[data[..., 2]]
+	return (d & 0x3ffff) ^ correct[d >> 18]
@@ -1,41 +1,52 @@
 #!/usr/bin/env python3
 
-def decode(e):
-	# decoded_value = ham_8_4_decode[encoded_value]
-	# 0xff - double bit error that can't be corrected
-	ham_8_4_decode = [
-		0x01, 0xff, 0x01, 0x01, 0xff, 0x00, 0x01, 0xff,
-		0xff, 0x02, 0x01, 0xff, 0x0a, 0xff, 0xff, 0x07,
-		0xff, 0x00, 0x01, 0xff, 0x00, 0x00, 0xff, 0x00,
-		0x06, 0xff, 0xff, 0x0b, 0xff, 0x00, 0x03, 0xff,
-		0xff, 0x0c, 0x01, 0xff, 0x04, 0xff, 0xff, 0x07,
-		0x06, 0xff, 0xff, 0x07, 0xff, 0x07, 0x07, 0x07,
-		0x06, 0xff, 0xff, 0x05, 0xff, 0x00, 0x0d, 0xff,
-		0x06, 0x06, 0x06, 0xff, 0x06, 0xff, 0xff, 0x07,
-		0xff, 0x02, 0x01, 0xff, 0x04, 0xff, 0xff, 0x09,
-		0x02, 0x02, 0xff, 0x02, 0xff, 0x02, 0x03, 0xff,
-		0x08, 0xff, 0xff, 0x05, 0xff, 0x00, 0x03, 0xff,
-		0xff, 0x02, 0x03, 0xff, 0x03, 0xff, 0x03, 0x03,
-		0x04, 0xff, 0xff, 0x05, 0x04, 0x04, 0x04, 0xff,
-		0xff, 0x02, 0x0f, 0xff, 0x04, 0xff, 0xff, 0x07,
-		0xff, 0x05, 0x05, 0x05, 0x04, 0xff, 0xff, 0x05,
-		0x06, 0xff, 0xff, 0x05, 0xff, 0x0e, 0x03, 0xff,
-		0xff, 0x0c, 0x01, 0xff, 0x0a, 0xff, 0xff, 0x09,
-		0x0a, 0xff, 0xff, 0x0b, 0x0a, 0x0a, 0x0a, 0xff,
-		0x08, 0xff, 0xff, 0x0b, 0xff, 0x00, 0x0d, 0xff,
-		0xff, 0x0b, 0x0b, 0x0b, 0x0a, 0xff, 0xff, 0x0b,
-		0x0c, 0x0c, 0xff, 0x0c, 0xff, 0x0c, 0x0d, 0xff,
-		0xff, 0x0c, 0x0f, 0xff, 0x0a, 0xff, 0xff, 0x07,
-		0xff, 0x0c, 0x0d, 0xff, 0x0d, 0xff, 0x0d, 0x0d,
-		0x06, 0xff, 0xff, 0x0b, 0xff, 0x0e, 0x0d, 0xff,
-		0x08, 0xff, 0xff, 0x09, 0xff, 0x09, 0x09, 0x09,
-		0xff, 0x02, 0x0f, 0xff, 0x0a, 0xff, 0xff, 0x09,
-		0x08, 0x08, 0x08, 0xff, 0x08, 0xff, 0xff, 0x09,
-		0x08, 0xff, 0xff, 0x0b, 0xff, 0x0e, 0x03, 0xff,
-		0xff, 0x0c, 0x0f, 0xff, 0x04, 0xff, 0xff, 0x09,
-		0x0f, 0xff, 0x0f, 0x0f, 0xff, 0x0e, 0x0f, 0xff,
-		0x08, 0xff, 0xff, 0x05, 0xff, 0x0e, 0x0d, 0xff,
-		0xff, 0x0e, 0x0f, 0xff, 0x0e, 0x0e, 0xff, 0x0e
-	]
+# decoded_value = ham_8_4_decode[encoded_value]
+# 0xff - double bit error that can't be corrected
+ham_8_4_decode = [
+	0x01, 0xff, 0x01, 0x01, 0xff, 0x00, 0x01, 0xff,
+	0xff, 0x02, 0x01, 0xff, 0x0a, 0xff, 0xff, 0x07,
+	0xff, 0x00, 0x01, 0xff, 0x00, 0x00, 0xff, 0x00,
+	0x06, 0xff, 0xff, 0x0b, 0xff, 0x00, 0x03, 0xff,
+	0xff, 0x0c, 0x01, 0xff, 0x04, 0xff, 0xff, 0x07,
+	0x06, 0xff, 0xff, 0x07, 0xff, 0x07, 0x07, 0x07,
+	0x06, 0xff, 0xff, 0x05, 0xff, 0x00, 0x0d, 0xff,
+	0x06, 0x06, 0x06, 0xff, 0x06, 0xff, 0xff, 0x07,
+	0xff, 0x02, 0x01, 0xff, 0x04, 0xff, 0xff, 0x09,
+	0x02, 0x02, 0xff, 0x02, 0xff, 0x02, 0x03, 0xff,
+	0x08, 0xff, 0xff, 0x05, 0xff, 0x00, 0x03, 0xff,
+	0xff, 0x02, 0x03, 0xff, 0x03, 0xff, 0x03, 0x03,
+	0x04, 0xff, 0xff, 0x05, 0x04, 0x04, 0x04, 0xff,
+	0xff, 0x02, 0x0f, 0xff, 0x04, 0xff, 0xff, 0x07,
+	0xff, 0x05, 0x05, 0x05, 0x04, 0xff, 0xff, 0x05,
+	0x06, 0xff, 0xff, 0x05, 0xff, 0x0e, 0x03, 0xff,
+	0xff, 0x0c, 0x01, 0xff, 0x0a, 0xff, 0xff, 0x09,
+	0x0a, 0xff, 0xff, 0x0b, 0x0a, 0x0a, 0x0a, 0xff,
+	0x08, 0xff, 0xff, 0x0b, 0xff, 0x00, 0x0d, 0xff,
+	0xff, 0x0b, 0x0b, 0x0b, 0x0a, 0xff, 0xff, 0x0b,
+	0x0c, 0x0c, 0xff, 0x0c, 0xff, 0x0c, 0x0d, 0xff,
+	0xff, 0x0c, 0x0f, 0xff, 0x0a, 0xff, 0xff, 0x07,
+	0xff, 0x0c, 0x0d, 0xff, 0x0d, 0xff, 0x0d, 0x0d,
+	0x06, 0xff, 0xff, 0x0b, 0xff, 0x0e, 0x0d, 0xff,
+	0x08, 0xff, 0xff, 0x09, 0xff, 0x09, 0x09, 0x09,
+	0xff, 0x02, 0x0f, 0xff, 0x0a, 0xff, 0xff, 0x09,
+	0x08, 0x08, 0x08, 0xff, 0x08, 0xff, 0xff, 0x09,
+	0x08, 0xff, 0xff, 0x0b, 0xff, 0x0e, 0x03, 0xff,
+	0xff, 0x0c, 0x0f, 0xff, 0x04, 0xff, 0xff, 0x09,
+	0x0f, 0xff, 0x0f, 0x0f, 0xff, 0x0e, 0x0f, 0xff,
+	0x08, 0xff, 0xff, 0x05, 0xff, 0x0e, 0x0d, 0xff,
+	0xff, 0x0e, 0x0f, 0xff, 0x0e, 0x0e, 0xff, 0x0e
+]
+
+# The same as bytes, for bytes.translate()
+ham_8_4_decode_table = bytes(ham_8_4_decode)
 
+def decode(e):
 	return(ham_8_4_decode[e])
+
+def decode_bytes(data):
+	'''
+	Decodes every byte of data, which can be bytes, a bytearray or a
+	memoryview, at once. Returns bytes of the decoded values, with 0xff for
+	each byte that has a double bit error.
+	'''
+	return bytes(data).translate(ham_8_4_decode_table)
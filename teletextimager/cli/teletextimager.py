@@ -8,7 +8,7 @@ import tempfile
 
 from PIL import Image
 
-from teletextimager import teletextdecoder, teletextrenderpil
+from teletextimager import teletextdecodecache, teletextdecoder, teletextrenderpil, teletextrendertext
 from teletextimager.reader import *
 
 def reader_from_extension(ext):
@@ -24,6 +24,19 @@ def reader_from_extension(ext):
 	else:
 		return None
 
+def text_render_from_extension(ext):
+	'''
+	Returns a text renderer based on the file extension, or None to render an image
+	'''
+	if ext.lower() == '.txt':
+		return teletextrendertext.TeletextRenderText()
+	elif ext.lower() == '.ans':
+		return teletextrendertext.TeletextRenderANSI()
+	elif ext.lower() == '.html' or ext.lower() == '.htm':
+		return teletextrendertext.TeletextRenderHTML()
+	else:
+		return None
+
 def main():
 	parser = argparse.ArgumentParser()
 
@@ -33,14 +46,25 @@ def main():
 		except:
 			raise argparse.ArgumentTypeError('Not a valid decoding level')
 
+	def page_valid(value):
+		try:
+			number = int(value, 16)
+		except ValueError:
+			raise argparse.ArgumentTypeError('Not a valid page number')
+		if number < 0x100 or number > 0x8ff:
+			raise argparse.ArgumentTypeError('Not a valid page number')
+		return number
+
 	parser.add_argument('infile', help='input TTI file')
 	parser.add_argument('-o', '--outfile', help='output image filename')
+	parser.add_argument('-p', '--page', type=page_valid, help='select page in T42 file')
 	parser.add_argument('-s', '--subpage', type=int, help='select subpage in TTI file')
 	parser.add_argument('-l', '--level', default='2.5', type=level_valid, help='set decoding level')
 	parser.add_argument('-c', '--classic', action='store_true', help='disable black foreground and double width')
 	parser.add_argument('--conceal', action='store_true', help='hide concealed text')
 	parser.add_argument('--no-header', action='store_true', help='remove header row')
 	parser.add_argument('--no-flof', action='store_true', help='remove row 24')
+	parser.add_argument('--cache', metavar='DIR', help='cache decoded pages in directory')
 	args = parser.parse_args()
 
 	if args.level == '1':
@@ -65,21 +89,46 @@ def main():
 
 	# The reader reads in a file and returns a list, one item per subpage
 	# Each item is a dictionary holding the packets of the subpage
-	my_pages = my_reader.read(args.infile)
+	if args.page != None and in_ext.lower() == '.t42':
+		# Go straight to the page using an index of the capture, which is
+		# kept in a sidecar file so later runs don't have to scan it again
+		my_pages = indext42.TeletextIndexT42.open(args.infile).read(args.page)
+		if not my_pages:
+			sys.exit('Page {0:03x} not found in input file'.format(args.page))
+	else:
+		if args.page != None:
+			print('Warning: page selection only implemented for .t42', file=sys.stderr)
+		if hasattr(my_reader, 'read_lazy'):
+			# Only the subpages that are rendered are converted
+			my_pages = my_reader.read_lazy(args.infile)
+		else:
+			my_pages = my_reader.read(args.infile)
 
-	# Remove header and FLOF rows if we were asked to
-	if args.no_header:
-		for s in my_pages:
-			s.pop(0)
+	my_decoder = teletextdecoder.TeletextDecode()
 
-	if args.no_flof:
-		for s in my_pages:
-			s.pop(24)
+	if args.cache != None:
+		my_cache = teletextdecodecache.TeletextDecodeCache(directory=args.cache)
+	else:
+		my_cache = None
 
-	my_decoder = teletextdecoder.TeletextDecode()
+	def decode_page(page):
+		# Remove header and FLOF rows if we were asked to. This is done to each
+		# subpage as it is decoded so that lazily read subpages that are not
+		# rendered are never converted
+		if args.no_header:
+			page.pop(0, None)
 
-	if args.subpage != None and in_ext.lower() == '.t42':
-		print('Warning: subpage selection not implemented for .t42', file=sys.stderr)
+		if args.no_flof:
+			page.pop(24, None)
+
+		if my_cache != None:
+			return my_cache.decode(my_decoder, page, level = level, black_foreground = not args.classic, double_width = not args.classic)
+		else:
+			my_decoder.decode(page, level = level, black_foreground = not args.classic, double_width = not args.classic)
+			return my_decoder
+
+	if args.subpage != None and in_ext.lower() == '.t42' and args.page == None:
+		print('Warning: subpage selection not implemented for .t42 without a page', file=sys.stderr)
 
 	# If the '-o' option isn't given try to show the subpage using Image.show()
 	# This behaviour may not be kept
@@ -92,17 +141,16 @@ def main():
 		else:
 			subpage = args.subpage - 1
 
-		my_decoder.decode(my_pages[subpage], level = level, black_foreground = not args.classic, double_width = not args.classic)
+		my_page = decode_page(my_pages[subpage])
 		my_pil_render = teletextrenderpil.TeletextRenderPIL()
-		im = my_pil_render.render(my_decoder, reveal = not args.conceal, border=(24, 20))
-		im = im.resize((int(im.width * 1.2), im.height))
+		im = my_pil_render.render(my_page, reveal = not args.conceal, border=(24, 20), hscale=1.2)
 		im.show()
 		sys.exit(0)
 
 	percent_p = args.outfile.find('%p') != -1
 	percent_s = args.outfile.find('%s') != -1
 
-	if args.subpage != None and in_ext.lower() != '.t42':
+	if args.subpage != None and (in_ext.lower() != '.t42' or args.page != None):
 		if args.subpage > len(my_pages):
 			print('Warning: selected subpage {0} not found in input file'.format(args.subpage), file=sys.stderr)
 			subpage_range = [len(my_pages) - 1]
@@ -149,39 +197,37 @@ def main():
 			print('Cannot write output file \'{0}\': error {1} {2}'.format(outfile, e.errno, e.strerror), file=sys.stderr)
 			sys.exit(os.EX_OSFILE)
 
-		# Pass the subpage packets to the decoder object which will hold the results
+		# Pass the subpage packets to the decoder object which will return the results
 		# as an agnostic grid of characters, colours, enlarged fragments etc
-		my_decoder.decode(my_pages[s], level = level, black_foreground = not args.classic, double_width = not args.classic)
+		my_page = decode_page(my_pages[s])
 
 		# and then pass that result to the render which will give us the final image
 		my_pil_render = teletextrenderpil.TeletextRenderPIL()
-		im = my_pil_render.render(my_decoder, reveal = not args.conceal, border=(24, 20))
 
 		out_ext = os.path.splitext(outfile)[1]
-		if out_ext.lower() == '.gif':
-			im = im.resize((int(im.width * 1.2), im.height))
-			if my_decoder.flash_present == 0:
-				im.save(outfile_obj, format='gif')
-			else:
-				fl_im = [ ]
-
-				if my_decoder.flash_present == 1: 
-					render_frames = [3]
-					durations = 500
-				elif my_decoder.flash_present == 2:
-					render_frames = [1, 2]
-					durations = [167, 167, 166]
-				elif my_decoder.flash_present == 3:
-					render_frames = [1, 2, 3, 4, 5]
-					durations = [167, 167, 166, 167, 167, 166]
-
-				for f in render_frames:
-					fl_im.append(my_pil_render.render(my_decoder, reveal = not args.conceal, border=(24, 20), flash_phase=f))
-					fl_im[-1] = fl_im[-1].resize((int(fl_im[-1].width * 1.2), fl_im[-1].height), resample = Image.Resampling.NEAREST)
-
-				im.save(outfile_obj, format='gif', save_all=True, append_images=fl_im, transparency=8, disposal=2, duration=durations, loop=0, palette=my_decoder.get_palette())
+		my_text_render = text_render_from_extension(out_ext)
+		if my_text_render != None:
+			for chunk in my_text_render.render_stream(my_page, reveal = not args.conceal):
+				outfile_obj.write(chunk.encode('utf-8'))
+		elif out_ext.lower() == '.gif' and my_page.flash_present != 0:
+			if my_page.flash_present == 1: 
+				render_frames = [0, 3]
+				durations = 500
+			elif my_page.flash_present == 2:
+				render_frames = [0, 1, 2]
+				durations = [167, 167, 166]
+			elif my_page.flash_present == 3:
+				render_frames = [0, 1, 2, 3, 4, 5]
+				durations = [167, 167, 166, 167, 167, 166]
+
+			# The page is only rendered once, and the cells that flash drawn again for each frame
+			fl_im = [ ]
+			for f, fl_frame, fl_bbox in my_pil_render.render_flash_frames(my_page, render_frames, reveal = not args.conceal, border=(24, 20), hscale=1.2):
+				fl_im.append(fl_frame)
+
+			fl_im[0].save(outfile_obj, format='gif', save_all=True, append_images=fl_im[1:], transparency=8, disposal=2, duration=durations, loop=0, palette=my_page.get_palette())
 		else:
-			im = im.resize((int(im.width * 1.2), im.height))
+			im = my_pil_render.render(my_page, reveal = not args.conceal, border=(24, 20), hscale=1.2)
 			im.save(outfile_obj, format=out_ext[1:])
 
 		outfile_obj.close()
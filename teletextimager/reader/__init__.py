@@ -1,4 +1,6 @@
 __all__ = [
+	'indext42',
+	'parallelt42',
 	'readep1',
 	'readt42',
 	'readtti',
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+from array import array
+import mmap
+import os
+import struct
+import sys
+
+from teletextimager import atomicfile
+from teletextimager.bits import hamming_8_4
+from teletextimager.reader import readt42
+
+class TeletextIndexT42:
+	'''
+	Index of where the pages of a T42 capture are, so that a page can be read
+	without scanning the capture from the start.
+
+	For each transmission of a page the index holds the positions, counted in
+	42 byte packets, of its X/0 header and of the packet that ended it, and
+	of the packets of the page that a reader would keep. Transmissions are
+	looked up by page number and subcode, so a page is read by mapping the
+	capture and picking out only its own packets.
+
+	The index can be saved as a sidecar file next to the capture, which also
+	records the size and modification time of the capture so an index of a
+	capture that has since changed is not used.
+	'''
+	# Bump this if the layout of the sidecar file changes
+	version = 2
+
+	# Magic, version, capture size, capture modification time, number of
+	# page number and subcode pairs, number of transmissions and number of packets
+	_header_struct = struct.Struct('<4sHQqIII')
+	# Page number, subcode, first transmission and number of transmissions
+	_key_struct = struct.Struct('<HHII')
+
+	def __init__(self, capture, capture_size, capture_mtime, keys, spans, packets):
+		self.capture = capture
+		self.capture_size = capture_size
+		self.capture_mtime = capture_mtime
+		# (page number, subcode): (first transmission, number of transmissions)
+		self._keys = keys
+		# Start packet, end packet, first of its packets and number of its
+		# packets of each transmission, grouped by page number and subcode
+		self._spans = spans
+		# Positions of the packets of each transmission other than its X/0 header
+		self._packets = packets
+		# Page number: sorted list of its subcodes
+		self._subcodes = {}
+		for number, subcode in sorted(keys):
+			self._subcodes.setdefault(number, []).append(subcode)
+
+	@staticmethod
+	def sidecar_path(capture):
+		'''
+		Returns the filename of the sidecar file of a capture.
+		'''
+		return os.fspath(capture) + '.idx'
+
+	@classmethod
+	def build(cls, capture):
+		'''
+		Scans a capture file once and returns its index.
+		'''
+		with open(capture, 'rb') as f:
+			stat = os.fstat(f.fileno())
+			transmissions = {}
+
+			if stat.st_size != 0:
+				with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as map_obj:
+					view = memoryview(map_obj)
+					ham_8_4 = hamming_8_4.ham_8_4_decode
+					for mag_no, received, end in readt42.TeletextReadT42MMap.walk(view, offsets=True):
+						start = received[0]
+						number = (mag_no << 8) | (ham_8_4[view[start + 3]] << 4) | ham_8_4[view[start + 2]]
+						if mag_no == 0:
+							number |= 0x800
+						# Subcode bits that fail to decode are taken as zero, as readers do
+						s1, s2, s3, s4 = (0 if n == 0xff else n for n in hamming_8_4.decode_bytes(view[start + 4:start + 8]))
+						subcode = ((s4 & 0x3) << 12) | (s3 << 8) | ((s2 & 0x7) << 4) | s1
+						transmissions.setdefault((number, subcode), []).append((start // 42, end // 42, [offset // 42 for offset in received[1].values()]))
+					view.release()
+
+		keys = {}
+		spans = array('I')
+		packets = array('I')
+		for key in sorted(transmissions):
+			keys[key] = (len(spans) // 4, len(transmissions[key]))
+			for start, end, page_packets in transmissions[key]:
+				spans.extend((start, end, len(packets), len(page_packets)))
+				packets.extend(page_packets)
+
+		return cls(capture, stat.st_size, stat.st_mtime_ns, keys, spans, packets)
+
+	@classmethod
+	def load(cls, capture, path=None):
+		'''
+		Reads the index of a capture from its sidecar file, or from path if
+		given. Raises ValueError if the file is not a valid index or if the
+		capture has changed since it was indexed.
+		'''
+		if path == None:
+			path = cls.sidecar_path(capture)
+
+		stat = os.stat(capture)
+
+		with open(path, 'rb') as f:
+			header = f.read(cls._header_struct.size)
+			if len(header) != cls._header_struct.size:
+				raise ValueError('Index is truncated')
+			magic, version, capture_size, capture_mtime, key_count, span_count, packet_count = cls._header_struct.unpack(header)
+			if magic != b'T42X' or version != cls.version:
+				raise ValueError('Not an index or from an incompatible version')
+			if capture_size != stat.st_size or capture_mtime != stat.st_mtime_ns:
+				raise ValueError('Capture has changed since it was indexed')
+
+			key_data = f.read(key_count * cls._key_struct.size)
+			if len(key_data) != key_count * cls._key_struct.size:
+				raise ValueError('Index is truncated')
+			keys = {}
+			for number, subcode, first, count in cls._key_struct.iter_unpack(key_data):
+				keys[(number, subcode)] = (first, count)
+
+			spans = array('I')
+			packets = array('I')
+			try:
+				spans.fromfile(f, span_count * 4)
+				packets.fromfile(f, packet_count)
+			except EOFError:
+				raise ValueError('Index is truncated')
+			if sys.byteorder == 'big':
+				spans.byteswap()
+				packets.byteswap()
+
+		return cls(capture, capture_size, capture_mtime, keys, spans, packets)
+
+	def save(self, path=None):
+		'''
+		Writes the index to the sidecar file of its capture, or to path if given.
+		'''
+		if path == None:
+			path = self.sidecar_path(self.capture)
+
+		spans = array('I', self._spans)
+		packets = array('I', self._packets)
+		if sys.byteorder == 'big':
+			spans.byteswap()
+			packets.byteswap()
+
+		# Write to a temporary file first so a partially written index is never read
+		with atomicfile.atomic_write(path) as f:
+			f.write(self._header_struct.pack(b'T42X', self.version, self.capture_size, self.capture_mtime, len(self._keys), len(self._spans) // 4, len(self._packets)))
+			for (number, subcode), (first, count) in self._keys.items():
+				f.write(self._key_struct.pack(number, subcode, first, count))
+			spans.tofile(f)
+			packets.tofile(f)
+
+	@classmethod
+	def open(cls, capture, path=None):
+		'''
+		Returns the index of a capture, read from its sidecar file if that is
+		valid or otherwise built by scanning the capture and then saved. If the
+		sidecar file can't be written the index is still returned.
+		'''
+		try:
+			return cls.load(capture, path)
+		except (OSError, ValueError):
+			pass
+
+		index = cls.build(capture)
+		try:
+			index.save(path)
+		except OSError:
+			# The sidecar file is only an optimisation
+			pass
+		return index
+
+	def page_numbers(self):
+		'''
+		Returns a sorted list of the page numbers in the capture.
+		'''
+		return sorted(self._subcodes)
+
+	def subcodes(self, number):
+		'''
+		Returns a sorted list of the subcodes transmitted with a page number.
+		'''
+		return list(self._subcodes.get(number, []))
+
+	def transmissions(self, number, subcode):
+		'''
+		Returns a list of the start and end packets of each transmission of a
+		page number and subcode, in the order they are in the capture.
+		'''
+		if (number, subcode) not in self._keys:
+			return []
+
+		first, count = self._keys[(number, subcode)]
+		return [(self._spans[i * 4], self._spans[i * 4 + 1]) for i in range(first, first + count)]
+
+	def page(self, number, subcode, transmission=-1):
+		'''
+		Reads one transmission of a page number and subcode from the capture,
+		by default the last, and returns it as a dictionary like
+		readt42.TeletextReadT42.pages() yields. Returns None if the page
+		number and subcode are not in the capture.
+		'''
+		if (number, subcode) not in self._keys:
+			return None
+		first, count = self._keys[(number, subcode)]
+		i = range(first, first + count)[transmission]
+		start, end, first_packet, packet_count = self._spans[i * 4:i * 4 + 4]
+
+		ham_8_4 = hamming_8_4.ham_8_4_decode
+		with open(self.capture, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as map_obj:
+			view = memoryview(map_obj)
+			# Views of the packets of the page, as TeletextReadT42MMap.walk() keeps them
+			packets = {}
+			try:
+				for packet in self._packets[first_packet:first_packet + packet_count]:
+					offset = packet * 42
+					pkt_no = (ham_8_4[view[offset]] >> 3) | (ham_8_4[view[offset + 1]] << 1)
+					if pkt_no < 26:
+						packets[pkt_no] = view[offset + 2:offset + 42]
+					else:
+						packets[(pkt_no, ham_8_4[view[offset + 2]])] = view[offset + 3:offset + 42]
+				return readt42.TeletextReadT42MMap.page(view, (number >> 8) & 0x07, (start * 42, packets))
+			finally:
+				# The views into the map have to be let go before it can be closed
+				packets = None
+				view.release()
+
+	def read(self, number):
+		'''
+		Returns a list of the subpages of a page number, like readtti.TeletextReadTTI.read()
+		does, with the last transmission of each subcode in order of subcode.
+		'''
+		return [self.page(number, subcode) for subcode in self.subcodes(number)]
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import mmap
+import os
+
+from teletextimager.bits import hamming_8_4
+from teletextimager.reader import readt42
+
+# What read_chunk() returns. Each field apart from events is a list with an
+# item for each magazine.
+#
+# events - in the order they happened, a tuple of the magazine number and
+#   either None where an X/0 header would complete the page carried into the
+#   chunk, or a page completed within the chunk and whether it is the first
+#   page in its magazine that may turn out to continue the carried page
+# prefixes - packets of the magazine before its first X/0 header in the
+#   chunk, which belong to the page carried into the chunk
+# prefix_rows - whether there were any such packets
+# first_page_nos - page number of the first X/0 header of the magazine in
+#   the chunk, or None if there wasn't one
+# tentative - whether that header came before any other packets of the
+#   magazine, so it is ignored if it repeats the header of the carried page
+# open_pages - the page still being received at the end of the chunk
+# open_first - whether that is the first page in its magazine, see tentative
+# pkt_0_page_nos - page number of the last X/0 header if no other packets
+#   of the magazine came after it, see TeletextReadT42.pkt_0_page_no
+Chunk = namedtuple('Chunk', ['events', 'prefixes', 'prefix_rows', 'first_page_nos', 'tentative', 'open_pages', 'open_first', 'pkt_0_page_nos'])
+
+# Keys of a page dictionary that come from its X/0 header
+_header_keys = ('control_bits', 'number', 'subcode', 0)
+
+def read_chunk(capture, start, end):
+	'''
+	Reads the packets of a capture file from byte start up to byte end, which
+	are multiples of 42, without knowing what was received before them.
+	Returns a Chunk, for TeletextReadT42Parallel to join up with the chunks
+	before and after it.
+	'''
+	with open(capture, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as map_obj:
+		view = memoryview(map_obj)
+		try:
+			return _read_view(view, start, end)
+		finally:
+			view.release()
+
+def _read_view(view, start, end):
+	ham_8_4 = hamming_8_4.ham_8_4_decode
+	page = readt42.TeletextReadT42MMap.page
+	add_packets = readt42.TeletextReadT42MMap.add_packets
+
+	events = []
+	prefixes = [{} for _ in range(8)]
+	prefix_rows = [False] * 8
+	first_page_nos = [None] * 8
+	tentative = [False] * 8
+	# The X/0 header offset and packets of the page being received, see TeletextReadT42MMap.walk()
+	received = [None] * 8
+	first = [False] * 8
+	pkt_0_page_nos = [None] * 8
+
+	for offset in range(start, end, 42):
+		mag_pkt = ham_8_4[view[offset]]
+		pkt_high = ham_8_4[view[offset + 1]]
+		if mag_pkt == 0xff or pkt_high == 0xff:
+			continue
+
+		mag_no = mag_pkt & 0x07
+		pkt_no = (mag_pkt >> 3) | (pkt_high << 1)
+
+		if pkt_no == 0:
+			page_units = ham_8_4[view[offset + 2]]
+			page_tens = ham_8_4[view[offset + 3]]
+			if page_units == 0xff or page_tens == 0xff:
+				continue
+
+			page_no = (page_tens << 4) | page_units
+			if page_no == 0xff or page_no == pkt_0_page_nos[mag_no]:
+				continue
+			pkt_0_page_nos[mag_no] = page_no
+
+			if received[mag_no] != None:
+				events.append((mag_no, page(view, mag_no, received[mag_no]), first[mag_no]))
+				first[mag_no] = False
+			else:
+				events.append((mag_no, None, False))
+				first_page_nos[mag_no] = page_no
+				tentative[mag_no] = not prefix_rows[mag_no]
+				first[mag_no] = tentative[mag_no]
+
+			received[mag_no] = (offset, {})
+			continue
+
+		if pkt_no > 28:
+			continue
+
+		if received[mag_no] == None:
+			packets = prefixes[mag_no]
+			prefix_rows[mag_no] = True
+		else:
+			packets = received[mag_no][1]
+			pkt_0_page_nos[mag_no] = None
+
+		if pkt_no < 26:
+			packets[pkt_no] = view[offset + 2:offset + 42]
+			continue
+
+		desig_no = ham_8_4[view[offset + 2]]
+		if desig_no == 0xff or (pkt_no == 27 and desig_no < 4):
+			continue
+
+		packets[(pkt_no, desig_no)] = view[offset + 3:offset + 42]
+
+	prefix_pages = []
+	for mag_no in range(8):
+		prefix_pages.append({})
+		add_packets(prefix_pages[-1], prefixes[mag_no])
+
+	open_pages = [page(view, mag_no, received[mag_no]) if received[mag_no] != None else None for mag_no in range(8)]
+
+	return Chunk(events, prefix_pages, prefix_rows, first_page_nos, tentative, open_pages, first, pkt_0_page_nos)
+
+class TeletextReadT42Parallel:
+	'''
+	Reads the pages of a T42 capture file like TeletextReadT42.pages(), but
+	splits the capture into chunks that are read by a pool of worker
+	processes. The pages completed within each chunk are then joined up with
+	the pages carried between chunks so that exactly the same pages are
+	yielded, in the same order, as reading the capture in one go.
+	'''
+	def __init__(self, max_workers=None, chunk_size=1 << 24):
+		self.max_workers = max_workers
+		# Chunks start on packet boundaries
+		self.chunk_size = max(chunk_size - chunk_size % 42, 42)
+
+	def pages(self, capture):
+		'''
+		Yields each page in a capture file, given by its filename. Only a few
+		chunks more than there are workers are read ahead of the pages being
+		yielded, so the memory used doesn't depend on the size of the capture.
+		'''
+		size = os.path.getsize(capture)
+		size -= size % 42
+		chunk_starts = iter(range(0, size, self.chunk_size))
+
+		# The page being received in each magazine, carried from one chunk to the next
+		received = [None] * 8
+		pkt_0_page_no = [None] * 8
+
+		with ProcessPoolExecutor(self.max_workers) as executor:
+			pending = deque()
+
+			def submit():
+				start = next(chunk_starts, None)
+				if start != None:
+					pending.append(executor.submit(read_chunk, capture, start, min(start + self.chunk_size, size)))
+
+			for _ in range((self.max_workers or os.cpu_count() or 1) * 2):
+				submit()
+
+			while pending:
+				chunk = pending.popleft().result()
+				submit()
+				yield from self.join(chunk, received, pkt_0_page_no)
+
+		for mag_no in range(8):
+			if received[mag_no] != None:
+				yield received[mag_no]
+
+	@staticmethod
+	def join(chunk, received, pkt_0_page_no):
+		'''
+		Yields the pages completed in a chunk given the pages received and
+		pkt_0_page_no of each magazine before it, which are updated for the
+		chunk after it.
+		'''
+		repeat = [False] * 8
+		for mag_no in range(8):
+			if received[mag_no] != None:
+				received[mag_no].update(chunk.prefixes[mag_no])
+				if chunk.prefix_rows[mag_no]:
+					pkt_0_page_no[mag_no] = None
+			# A consecutive X/0 with the same page number doesn't start a new page
+			repeat[mag_no] = chunk.tentative[mag_no] and received[mag_no] != None and pkt_0_page_no[mag_no] == chunk.first_page_nos[mag_no]
+
+		def carried_on(mag_no, page):
+			# The packets after the repeated header belong to the carried page
+			for key, value in page.items():
+				if key not in _header_keys:
+					received[mag_no][key] = value
+			return received[mag_no]
+
+		for mag_no, page, first in chunk.events:
+			if page == None:
+				if received[mag_no] != None and not repeat[mag_no]:
+					yield received[mag_no]
+			elif first and repeat[mag_no]:
+				yield carried_on(mag_no, page)
+			else:
+				yield page
+
+		for mag_no in range(8):
+			if chunk.first_page_nos[mag_no] != None:
+				if chunk.open_first[mag_no] and repeat[mag_no]:
+					received[mag_no] = carried_on(mag_no, chunk.open_pages[mag_no])
+				else:
+					received[mag_no] = chunk.open_pages[mag_no]
+				pkt_0_page_no[mag_no] = chunk.pkt_0_page_nos[mag_no]
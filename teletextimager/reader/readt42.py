@@ -1,9 +1,51 @@
 #!/usr/bin/env python3
 
-import copy
+import mmap
+import os
 
 from teletextimager.bits import hamming_8_4, hamming_24_18
 
+# Clears the parity bit of each byte with bytes.translate()
+unparity_table = bytes(b & 0x7f for b in range(256))
+
+def _start_page(page, mag_no, page_no, t42_packet):
+	'''
+	Stores the page address, control bits and header row of an X/0 packet,
+	whose bytes 2-9 have been Hamming decoded, in an empty page.
+	'''
+	page['control_bits'] = set()
+
+	page['number'] = (mag_no << 8) | page_no
+	if mag_no == 0:
+		page['number'] |= 0x800
+
+	page['subcode'] = ((t42_packet[7] & 0x3) << 12) | (t42_packet[6] << 8) | ((t42_packet[5] & 0x7) << 4) | t42_packet[4]
+
+	# Get bits C4-C6
+	if (t42_packet[5] & 0x08) == 0x08:
+		page['control_bits'].add(4)
+	if (t42_packet[7] & 0x04) == 0x04:
+		page['control_bits'].add(5)
+	if (t42_packet[7] & 0x08) == 0x08:
+		page['control_bits'].add(6)
+	# Get bits C7-C10
+	for b in range(0, 4):
+		t = 1 << b
+		if (t42_packet[8] & t) == t:
+			page['control_bits'].add(b + 7)
+	# Get bits C11-C14
+	if (t42_packet[9] & 0x01) == 0x01:
+		page['control_bits'].add(11)
+	if (t42_packet[9] & 0x08) == 0x08:
+		page['control_bits'].add(12)
+	if (t42_packet[9] & 0x04) == 0x04:
+		page['control_bits'].add(13)
+	if (t42_packet[9] & 0x02) == 0x02:
+		page['control_bits'].add(14)
+
+	# "Unparity" the text in the header row
+	page[0] = b'        ' + bytes(t42_packet[10:42]).translate(unparity_table)
+
 class TeletextReadT42:
 	def __init__(self):
 		# Eight pages, one for each magazine
@@ -21,6 +63,7 @@ class TeletextReadT42:
 		read_something = False
 
 		mag_no = None
+		result_page = None
 
 		while True:
 			t42_packet = bytearray(source.read(42))
@@ -31,152 +74,334 @@ class TeletextReadT42:
 
 			read_something = True
 
-			# Magazine and packet number
-			t42_packet[0] = hamming_8_4.decode(t42_packet[0])
-			t42_packet[1] = hamming_8_4.decode(t42_packet[1])
-			if t42_packet[0] == 0xff or t42_packet[1] == 0xff:
-				# Error decoding magazine or packet number
-				continue
+			packet_mag_no, completed_page = self.add_packet(t42_packet)
+			if packet_mag_no != None:
+				mag_no = packet_mag_no
+			if completed_page != None:
+				result_page = completed_page
+				break
 
-			mag_no = t42_packet[0] & 0x07
-			pkt_no = (t42_packet[0] >> 3) | (t42_packet[1] << 1)
+		if source_is_file:
+			source.close()
 
-			cur_page = self.page[mag_no]
+		# Nothing was read, or only packets that couldn't be decoded
+		if not read_something or result_page == None:
+			return None
 
-			if pkt_no == 0:
-				# Hamming decode page number, subcodes and control bits
-				for b in range(2, 10):
-					t42_packet[b] = hamming_8_4.decode(t42_packet[b])
-					# Neutralise decoding-failed bits to zero apart from page number
-					if t42_packet[b] == 0xff and b > 3:
-						t42_packet[b] = 0x00
-
-				# See if the page number decoded
-				if t42_packet[2] == 0xff or t42_packet[3] == 0xff:
-					# Error decoding page number
-					continue
+		# Return page within a single entry list
+		pages = []
+		pages.append(result_page)
 
-				page_no = (t42_packet[3] << 4) | t42_packet[2]
+		return pages
 
-				if page_no == 0xff:
-					# Time filling header
-					continue
+	def pages(self, source, block_size=1 << 20):
+		'''
+		Reads every packet of a capture, from a filename or a file object,
+		and yields each page as a dictionary like those returned by read().
 
-				if page_no == self.pkt_0_page_no[mag_no]:
-					# Consecutive X/0's with same page number
-					continue
-				# Take a note of page number in case of consecutive X/0's
-				self.pkt_0_page_no[mag_no] = page_no
+		A page is yielded as soon as the X/0 header of the next page in the
+		same magazine completes it, with the pages of all eight magazines
+		being received at once. The pages still being received at the end of
+		the capture are yielded last, in magazine order.
 
-				first_page_in_mag = not self.page[mag_no]
+		The capture is read block_size bytes at a time, so the memory used
+		doesn't depend on the size of the capture.
+		'''
+		source_is_file = False
+		if not hasattr(source, 'read'):
+			source = open(source, 'rb')
+			source_is_file = True
 
-				if not first_page_in_mag:
-					# A full page has been previously stored before this X/0
-					# Take a copy of this page to return later; we're about to wipe it
-					# so we can store the page address and control bits of the upcoming page
-					result_page = copy.deepcopy(self.page[mag_no])
+		block_size = max(block_size - block_size % 42, 42)
 
-				self.page[mag_no].clear()
+		try:
+			leftover = b''
+			while True:
+				block = source.read(block_size)
+				if not block:
+					break
+				if leftover:
+					block = leftover + block
+
+				# Streams such as pipes may return part of a packet at the end of a block
+				end = len(block) - len(block) % 42
+				for offset in range(0, end, 42):
+					completed_page = self.add_packet(bytearray(block[offset:offset + 42]))[1]
+					if completed_page != None:
+						yield completed_page
+				leftover = block[end:]
+
+			for mag_no in range(8):
+				if self.page[mag_no]:
+					result_page = self.page[mag_no]
+					self.page[mag_no] = {}
+					self.pkt_0_page_no[mag_no] = None
+					yield result_page
+		finally:
+			if source_is_file:
+				source.close()
+
+	def add_packet(self, t42_packet):
+		'''
+		Adds one 42 byte packet, as a bytearray which is decoded in place, to
+		the page being received in its magazine.
+
+		Returns the magazine number, or None if it couldn't be decoded, and
+		the page that the packet completed, or None if it didn't complete one.
+		'''
+		# Magazine and packet number
+		t42_packet[0] = hamming_8_4.decode(t42_packet[0])
+		t42_packet[1] = hamming_8_4.decode(t42_packet[1])
+		if t42_packet[0] == 0xff or t42_packet[1] == 0xff:
+			# Error decoding magazine or packet number
+			return (None, None)
+
+		mag_no = t42_packet[0] & 0x07
+		pkt_no = (t42_packet[0] >> 3) | (t42_packet[1] << 1)
+
+		cur_page = self.page[mag_no]
+
+		if pkt_no == 0:
+			# Hamming decode page number, subcodes and control bits
+			t42_packet[2:10] = hamming_8_4.decode_bytes(t42_packet[2:10])
+			# Neutralise decoding-failed bits to zero apart from page number
+			t42_packet[4:10] = t42_packet[4:10].replace(b'\xff', b'\x00')
+
+			# See if the page number decoded
+			if t42_packet[2] == 0xff or t42_packet[3] == 0xff:
+				# Error decoding page number
+				return (mag_no, None)
+
+			page_no = (t42_packet[3] << 4) | t42_packet[2]
+
+			if page_no == 0xff:
+				# Time filling header
+				return (mag_no, None)
+
+			if page_no == self.pkt_0_page_no[mag_no]:
+				# Consecutive X/0's with same page number
+				return (mag_no, None)
+			# Take a note of page number in case of consecutive X/0's
+			self.pkt_0_page_no[mag_no] = page_no
+
+			first_page_in_mag = not self.page[mag_no]
+
+			if not first_page_in_mag:
+				# A full page has been previously stored before this X/0
+				# Hand it over to be returned and start a new page in its place
+				# for the page address and control bits of the upcoming page
+				result_page = self.page[mag_no]
+				self.page[mag_no] = {}
 
-				cur_page = self.page[mag_no]
+			cur_page = self.page[mag_no]
 
-				cur_page['control_bits'] = set()
+			_start_page(cur_page, mag_no, page_no, t42_packet)
 
-				cur_page['number'] = (mag_no << 8) | page_no
-				if mag_no == 0:
-					cur_page['number'] |= 0x800
-
-				cur_page['subcode'] = ((t42_packet[7] & 0x3) << 12) | (t42_packet[6] << 8) | ((t42_packet[5] & 0x7) << 4) | t42_packet[4]
-
-				# Get bits C4-C6
-				if (t42_packet[5] & 0x08) == 0x08:
-					cur_page['control_bits'].add(4)
-				if (t42_packet[7] & 0x04) == 0x04:
-					cur_page['control_bits'].add(5)
-				if (t42_packet[7] & 0x08) == 0x08:
-					cur_page['control_bits'].add(6)
-				# Get bits C7-C10
-				for b in range(0, 4):
-					t = 1 << b
-					if (t42_packet[8] & t) == t:
-						cur_page['control_bits'].add(b + 7)
-				# Get bits C11-C14
-				if (t42_packet[9] & 0x01) == 0x01:
-					cur_page['control_bits'].add(11)
-				if (t42_packet[9] & 0x08) == 0x08:
-					cur_page['control_bits'].add(12)
-				if (t42_packet[9] & 0x04) == 0x04:
-					cur_page['control_bits'].add(13)
-				if (t42_packet[9] & 0x02) == 0x02:
-					cur_page['control_bits'].add(14)
-
-				# "Unparity" the text in the header row
-				for b in range(10, 42):
-					t42_packet[b] &= 0x7f
-
-				cur_page[0] = b'        ' + t42_packet[10:]
-
-				if not first_page_in_mag:
-					break
+			if not first_page_in_mag:
+				return (mag_no, result_page)
 
-				continue
+			return (mag_no, None)
 
-			# Disregard whole magazine packets for now
-			if pkt_no > 28:
-				continue
+		# Disregard whole magazine packets for now
+		if pkt_no > 28:
+			return (mag_no, None)
 
-			# This will "continue" if X/0 didn't occur before this packet
-			if not self.page[mag_no]:
-				continue
+		# Ignore the packet if X/0 didn't occur before it
+		if not self.page[mag_no]:
+			return (mag_no, None)
 
-			# Not a consecutive X/0 now
-			self.pkt_0_page_no[mag_no] = None
+		# Not a consecutive X/0 now
+		self.pkt_0_page_no[mag_no] = None
 
-			if pkt_no < 26:
-				# X/1-25, assumes page is 7-bit odd parity coded!
-				for b in range(2, 42):
-					t42_packet[b] &= 0x7f
+		if pkt_no < 26:
+			# X/1-25, assumes page is 7-bit odd parity coded!
+			cur_page[pkt_no] = t42_packet[2:].translate(unparity_table)
+			return (mag_no, None)
 
-				cur_page[pkt_no] = t42_packet[2:]
-				continue
+		# X/26, X/27 or X/28
+		desig_no = hamming_8_4.decode(t42_packet[2])
 
-			# X/26, X/27 or X/28
-			desig_no = hamming_8_4.decode(t42_packet[2])
+		if desig_no == 0xff:
+			# Error decoding designation code
+			return (mag_no, None)
 
-			if desig_no == 0xff:
-				# Error decoding designation code
+		# X/27/0-3 is hamming 8/4 encoded
+		# We're just displaying a page so we don't need FLOF links
+		if pkt_no == 27 and desig_no < 4:
+			return (mag_no, None)
+
+		# Packet is 13 hamming 24/18 encoded triplets
+		triplets = [None if (d & 0x80000000) == 0x80000000 else d for d in hamming_24_18.decode_triplets(t42_packet[3:42])]
+
+		cur_page[(pkt_no, desig_no)] = triplets
+
+		return (mag_no, None)
+
+class TeletextReadT42MMap:
+	'''
+	Reads the pages of a T42 capture like TeletextReadT42.pages(), but
+	walks the capture in place through a memory map instead of reading it
+	into packets. Packets are kept as views into the capture and are only
+	decoded and copied when the page they belong to is yielded.
+	'''
+	def pages(self, source, magazines=None, page_numbers=None):
+		'''
+		Yields each page in a capture, which can be a filename, a file object
+		opened in binary mode or a bytes-like object, as a dictionary the same
+		as TeletextReadT42.pages() yields.
+
+		If magazines, a collection of magazine numbers 1-8, or page_numbers,
+		a collection of page numbers such as 0x100, are given only those
+		pages are yielded. Packets of other magazines are skipped without
+		decoding them, as are packets of other pages after decoding only
+		their magazine and packet numbers.
+		'''
+		source_is_file = False
+		if isinstance(source, (str, os.PathLike)):
+			source = open(source, 'rb')
+			source_is_file = True
+
+		map_obj = None
+		if hasattr(source, 'getbuffer'):
+			view = source.getbuffer()
+		elif hasattr(source, 'fileno'):
+			if os.fstat(source.fileno()).st_size != 0:
+				map_obj = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+				view = memoryview(map_obj)
+			else:
+				view = memoryview(b'')
+		else:
+			view = memoryview(source)
+
+		walker = self.walk(view, magazines, page_numbers)
+		try:
+			# The views kept for each page stay within the generator expression,
+			# so none are left in this frame when the map is closed
+			yield from (self.page(view, mag_no, received) for mag_no, received, end in walker)
+		finally:
+			# The views into the map have to be let go before it can be closed
+			walker.close()
+			view.release()
+			if map_obj != None:
+				map_obj.close()
+			if source_is_file:
+				source.close()
+
+	@staticmethod
+	def walk(view, magazines=None, page_numbers=None, keep_packets=True, offsets=False):
+		'''
+		Walks the packets of a capture held in a memoryview, choosing pages as
+		pages() does. For each page yields its magazine number, what was
+		received of it and the offset of the packet that ended it, which is
+		the X/0 header of the next page in the magazine or the end of the
+		capture.
+
+		What was received is a tuple of the offset of the X/0 header of the
+		page and a dictionary of views of its other packets, which is left
+		empty if keep_packets is False. If offsets is True the dictionary
+		holds the offsets of the packets instead of views of them.
+		'''
+		if page_numbers != None:
+			page_numbers = set(page_numbers)
+			if magazines == None:
+				magazines = set(n >> 8 for n in page_numbers)
+		if magazines != None:
+			mag_nos = set(m & 0x07 for m in magazines)
+		else:
+			mag_nos = set(range(8))
+
+		# Which first bytes of a packet are for a wanted magazine
+		ham_8_4 = hamming_8_4.ham_8_4_decode
+		wanted_mag = bytes(1 if ham_8_4[b] != 0xff and (ham_8_4[b] & 0x07) in mag_nos else 0 for b in range(256))
+
+		# For each magazine, the X/0 header offset and packets of the page
+		# being received, or None if no page has been started in the magazine
+		received = [None] * 8
+		# and whether that page was asked for
+		wanted_page = [False] * 8
+		pkt_0_page_no = [None] * 8
+
+		end = len(view) - len(view) % 42
+		for offset in range(0, end, 42):
+			if not wanted_mag[view[offset]]:
 				continue
 
-			# X/27/0-3 is hamming 8/4 encoded
-			# We're just displaying a page so we don't need FLOF links
-			if pkt_no == 27 and desig_no < 4:
+			mag_pkt = ham_8_4[view[offset]]
+			pkt_high = ham_8_4[view[offset + 1]]
+			if pkt_high == 0xff:
 				continue
 
-			# Packet is 13 hamming 24/18 encoded triplets
-			triplets = []
+			mag_no = mag_pkt & 0x07
+			pkt_no = (mag_pkt >> 3) | (pkt_high << 1)
 
-			for t in range(3, 41, 3):
-				p0 = t42_packet[t]
-				p1 = t42_packet[t + 1]
-				p2 = t42_packet[t + 2]
+			if pkt_no == 0:
+				page_units = ham_8_4[view[offset + 2]]
+				page_tens = ham_8_4[view[offset + 3]]
+				if page_units == 0xff or page_tens == 0xff:
+					continue
 
-				d = hamming_24_18.decode(p0, p1, p2)
+				page_no = (page_tens << 4) | page_units
+				if page_no == 0xff or page_no == pkt_0_page_no[mag_no]:
+					continue
+				pkt_0_page_no[mag_no] = page_no
 
-				if (d & 0x80000000) == 0x80000000:
-					triplets.append(None)
-				else:
-					triplets.append(d)
+				if wanted_page[mag_no]:
+					yield (mag_no, received[mag_no], offset)
 
-			cur_page[(pkt_no, desig_no)] = triplets
+				number = (mag_no << 8) | page_no
+				if mag_no == 0:
+					number |= 0x800
+				received[mag_no] = (offset, {})
+				wanted_page[mag_no] = page_numbers == None or number in page_numbers
+				continue
 
-		if source_is_file:
-			source.close()
+			if pkt_no > 28 or received[mag_no] == None:
+				continue
 
-		if not read_something:
-			return None
+			# Not a consecutive X/0 now
+			pkt_0_page_no[mag_no] = None
 
-		# Return page within a single entry list
-		pages = []
-		pages.append(result_page)
+			if not wanted_page[mag_no] or not keep_packets:
+				continue
 
-		return pages
+			if pkt_no < 26:
+				received[mag_no][1][pkt_no] = offset if offsets else view[offset + 2:offset + 42]
+				continue
+
+			desig_no = ham_8_4[view[offset + 2]]
+			if desig_no == 0xff or (pkt_no == 27 and desig_no < 4):
+				continue
+
+			received[mag_no][1][(pkt_no, desig_no)] = offset if offsets else view[offset + 3:offset + 42]
+
+		for mag_no in range(8):
+			if wanted_page[mag_no]:
+				yield (mag_no, received[mag_no], end)
+
+	@staticmethod
+	def page(view, mag_no, received):
+		'''
+		Decodes and copies the packets of a received page into a page dictionary.
+		'''
+		header_offset, packets = received
+
+		t42_packet = bytearray(view[header_offset:header_offset + 42])
+		t42_packet[2:10] = hamming_8_4.decode_bytes(t42_packet[2:10])
+		t42_packet[4:10] = t42_packet[4:10].replace(b'\xff', b'\x00')
+
+		page = {}
+		_start_page(page, mag_no, (t42_packet[3] << 4) | t42_packet[2], t42_packet)
+		TeletextReadT42MMap.add_packets(page, packets)
+
+		return page
+
+	@staticmethod
+	def add_packets(page, packets):
+		'''
+		Decodes and copies the views of packets kept by walk() into a page dictionary.
+		'''
+		for key, packet in packets.items():
+			if type(key) is int:
+				page[key] = bytearray(packet).translate(unparity_table)
+			else:
+				page[key] = [None if (d & 0x80000000) == 0x80000000 else d for d in hamming_24_18.decode_triplets(packet)]
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+from collections.abc import Sequence
+
 class TeletextReadTTI:
 	def convert_7bit_packet(self, line_pkt):
 		'''
@@ -53,125 +55,203 @@ class TeletextReadTTI:
 		return result
 
 	def read(self, source):
+		'''
+		Reads a TTI file, from a filename or a file object, and returns a list
+		with a page dictionary for each subpage.
+		'''
+		return list(self.read_lazy(source))
+
+	def read_lazy(self, source):
+		'''
+		Reads a TTI file like read(), but only finds where each subpage is in
+		the file. Returns a TeletextSubpagesTTI sequence whose subpages are
+		converted into page dictionaries when they are first accessed.
+		'''
 		source_is_file = False
 		if not hasattr(source, 'read'):
 			source = open(source)
 			source_is_file = True
 
-		pages = [ ]
-		# Pre-create the first page in case a PS command comes before the first PN
-		pages.append( { } )
-		cur_page = pages[-1]
-		cur_page['control_bits'] = set()
+		# The lines of each subpage. The first subpage is there already in
+		# case a command comes before the first PN
+		subpage_lines = [ [ ] ]
+		# The last PS command before each subpage, as status bits are carried
+		# from one subpage to the next in case only the first has a PS command
+		inherited_ps = [ None ]
+		last_ps = None
 		first_pn = False
 
 		for cur_line in source:
-			if cur_line.startswith('DE,'):
-				cur_page.setdefault('metadata', {})
-				cur_page['metadata']['title'] = cur_line.partition(',')[2].rstrip()
-
-			if cur_line.startswith('PN,'):
+			command = cur_line[:3]
+			if command == 'PN,':
 				if not first_pn:
 					first_pn = True
 				else:
-					pages.append( { } )
-					cur_page = pages[-1]
-					# Copy status bits from previous page in case only the first
-					# page has a PS command
-					cur_page['control_bits'] = pages[-2]['control_bits'].copy()
-				ps_value = cur_line.rpartition(',')[-1]
-				cur_page['number'] = int(ps_value[:3], 16)
-				cur_page['subcode'] = int(ps_value[3:], 16)
-
-			if cur_line.startswith('SC,'):
-				cur_page['subcode'] = int(cur_line.rpartition(',')[-1], 16)
-
-			if cur_line.startswith('PS,'):
-				status_bits = int(cur_line.rpartition(',')[-1], 16)
-				# Create an empty set
-				cur_page['control_bits'].clear()
-				# Get bits C5 to C11
-				for b in range(0, 7):
-					t = 1 << b
-					if (status_bits & t) == t:
-						cur_page['control_bits'].add(b + 5)
-				# Get bit C4
-				if (status_bits & 0x4000) == 0x4000:
-					cur_page['control_bits'].add(4)
-				# Get bits C12-C14 as they seem to be stored backwards in TTI
-				if (status_bits & 0x200) == 0x200:
-					cur_page['control_bits'].add(12)
-				if (status_bits & 0x100) == 0x100:
-					cur_page['control_bits'].add(13)
-				if (status_bits & 0x80) == 0x80:
-					cur_page['control_bits'].add(14)
-
-			if cur_line.startswith('RE,'):
-				cur_page['region'] = int(cur_line[3], 16)
-
-			if cur_line.startswith('OL,'):
-				# Fiddly way of extracting the line number as an integer
-				if cur_line[4] == ',':
-					pkt_no = ord(cur_line[3]) - 48
-					line_pkt = cur_line[5:]
-				else:
-					pkt_no = (ord(cur_line[3]) - 48) * 10 + ord(cur_line[4]) - 48
-					line_pkt = cur_line[6:]
-
-				desig_no = None
-
-				if pkt_no >= 26 and pkt_no <= 29:
-					desig_no = ord(line_pkt[0]) & 0xf
-					if pkt_no == 27 and desig_no < 4:
-						convert_packet = self.convert_4bit_packet
-					else:
-						convert_packet = self.convert_18bit_packet
-				elif pkt_no >= 0 and pkt_no <= 25:
-					# TODO deal with packet encodings
-					convert_packet = self.convert_7bit_packet
-
-				if desig_no == None:
-					cur_page[pkt_no] = convert_packet(line_pkt)
-				else:
-					cur_page[(pkt_no, desig_no)] = convert_packet(line_pkt)
-
-			if cur_line.startswith('FL,'):
-				links = cur_line.split(',')
-				if len(links) == 7:
-					# Init packet to mostly 0xf's as page xFF:3F7F means no page is specified
-					fl_packet = bytearray([0xf] * 40)
-					fl_packet[0] = 0x0  # Designation code
-					fl_packet[38] = 0x0 # CRC word
-					fl_packet[39] = 0x0 # CRC word
-
-					# Page numbers in FL command reference absolute magazine number
-					# Convert to relative by XORing with page magazine number
-					if 'number' in cur_page:
-						mag_flip = cur_page['number'] & 0x700
-					else:
-						mag_flip = 0
-
-					for i in range(6):
-						link_rel = (int(links[i+1], 16) & 0x7ff) ^ mag_flip
-						fl_packet[i*6+1] = link_rel & 0x00f
-						fl_packet[i*6+2] = (link_rel & 0x0f0) >> 4
-						fl_packet[i*6+4] = 0x7 | ((link_rel & 0x100) >> 5)
-						fl_packet[i*6+6] = 0x3 | ((link_rel & 0x600) >> 7)
-
-					cur_page[(27, 0)] = fl_packet
-
-			if cur_line.startswith('CT,'):
-				cycle = cur_line.split(',')
-				if len(cycle) == 3 and cycle[1].isdigit():
-					cycle_type = cycle[2].rstrip()
-					if cycle_type == 'C':
-						cur_page.setdefault('metadata', {})
-						cur_page['metadata']['cycle_cycles'] = int(cycle[1])
-					elif cycle_type == 'T':
-						cur_page.setdefault('metadata', {})
-						cur_page['metadata']['cycle_seconds'] = int(cycle[1])
+					subpage_lines.append( [ ] )
+					inherited_ps.append(last_ps)
+			elif command == 'PS,':
+				last_ps = cur_line
+			subpage_lines[-1].append(cur_line)
 
 		if source_is_file:
 			source.close()
 
-		return pages
+		return TeletextSubpagesTTI(self, subpage_lines, inherited_ps)
+
+	def convert_subpage(self, lines, inherited_ps=None):
+		'''
+		Converts the lines of one subpage into a page dictionary. inherited_ps
+		is the last PS command before the subpage.
+		'''
+		cur_page = { }
+		cur_page['control_bits'] = set()
+		if inherited_ps != None:
+			self.command_ps(cur_page, inherited_ps)
+
+		commands = self.commands
+		for cur_line in lines:
+			if cur_line[2:3] == ',':
+				command = commands.get(cur_line[:2])
+				if command != None:
+					command(self, cur_page, cur_line)
+
+		return cur_page
+
+	def command_de(self, cur_page, cur_line):
+		cur_page.setdefault('metadata', {})
+		cur_page['metadata']['title'] = cur_line.partition(',')[2].rstrip()
+
+	def command_pn(self, cur_page, cur_line):
+		ps_value = cur_line.rpartition(',')[-1]
+		cur_page['number'] = int(ps_value[:3], 16)
+		cur_page['subcode'] = int(ps_value[3:], 16)
+
+	def command_sc(self, cur_page, cur_line):
+		cur_page['subcode'] = int(cur_line.rpartition(',')[-1], 16)
+
+	def command_ps(self, cur_page, cur_line):
+		status_bits = int(cur_line.rpartition(',')[-1], 16)
+		# Create an empty set
+		cur_page['control_bits'].clear()
+		# Get bits C5 to C11
+		for b in range(0, 7):
+			t = 1 << b
+			if (status_bits & t) == t:
+				cur_page['control_bits'].add(b + 5)
+		# Get bit C4
+		if (status_bits & 0x4000) == 0x4000:
+			cur_page['control_bits'].add(4)
+		# Get bits C12-C14 as they seem to be stored backwards in TTI
+		if (status_bits & 0x200) == 0x200:
+			cur_page['control_bits'].add(12)
+		if (status_bits & 0x100) == 0x100:
+			cur_page['control_bits'].add(13)
+		if (status_bits & 0x80) == 0x80:
+			cur_page['control_bits'].add(14)
+
+	def command_re(self, cur_page, cur_line):
+		cur_page['region'] = int(cur_line[3], 16)
+
+	def command_ol(self, cur_page, cur_line):
+		# Fiddly way of extracting the line number as an integer
+		if cur_line[4] == ',':
+			pkt_no = ord(cur_line[3]) - 48
+			line_pkt = cur_line[5:]
+		else:
+			pkt_no = (ord(cur_line[3]) - 48) * 10 + ord(cur_line[4]) - 48
+			line_pkt = cur_line[6:]
+
+		desig_no = None
+
+		if pkt_no >= 26 and pkt_no <= 29:
+			desig_no = ord(line_pkt[0]) & 0xf
+			if pkt_no == 27 and desig_no < 4:
+				convert_packet = self.convert_4bit_packet
+			else:
+				convert_packet = self.convert_18bit_packet
+		elif pkt_no >= 0 and pkt_no <= 25:
+			# TODO deal with packet encodings
+			convert_packet = self.convert_7bit_packet
+
+		if desig_no == None:
+			cur_page[pkt_no] = convert_packet(line_pkt)
+		else:
+			cur_page[(pkt_no, desig_no)] = convert_packet(line_pkt)
+
+	def command_fl(self, cur_page, cur_line):
+		links = cur_line.split(',')
+		if len(links) == 7:
+			# Init packet to mostly 0xf's as page xFF:3F7F means no page is specified
+			fl_packet = bytearray([0xf] * 40)
+			fl_packet[0] = 0x0  # Designation code
+			fl_packet[38] = 0x0 # CRC word
+			fl_packet[39] = 0x0 # CRC word
+
+			# Page numbers in FL command reference absolute magazine number
+			# Convert to relative by XORing with page magazine number
+			if 'number' in cur_page:
+				mag_flip = cur_page['number'] & 0x700
+			else:
+				mag_flip = 0
+
+			for i in range(6):
+				link_rel = (int(links[i+1], 16) & 0x7ff) ^ mag_flip
+				fl_packet[i*6+1] = link_rel & 0x00f
+				fl_packet[i*6+2] = (link_rel & 0x0f0) >> 4
+				fl_packet[i*6+4] = 0x7 | ((link_rel & 0x100) >> 5)
+				fl_packet[i*6+6] = 0x3 | ((link_rel & 0x600) >> 7)
+
+			cur_page[(27, 0)] = fl_packet
+
+	def command_ct(self, cur_page, cur_line):
+		cycle = cur_line.split(',')
+		if len(cycle) == 3 and cycle[1].isdigit():
+			cycle_type = cycle[2].rstrip()
+			if cycle_type == 'C':
+				cur_page.setdefault('metadata', {})
+				cur_page['metadata']['cycle_cycles'] = int(cycle[1])
+			elif cycle_type == 'T':
+				cur_page.setdefault('metadata', {})
+				cur_page['metadata']['cycle_seconds'] = int(cycle[1])
+
+	# Handlers of each TTI command, by the two letters of the command
+	commands = {
+		'DE': command_de,
+		'PN': command_pn,
+		'SC': command_sc,
+		'PS': command_ps,
+		'RE': command_re,
+		'OL': command_ol,
+		'FL': command_fl,
+		'CT': command_ct
+	}
+
+class TeletextSubpagesTTI(Sequence):
+	'''
+	The subpages of a TTI file returned by TeletextReadTTI.read_lazy(). Each
+	subpage is converted into a page dictionary the first time it is
+	accessed, and the same dictionary is returned after that.
+	'''
+	def __init__(self, reader, subpage_lines, inherited_ps):
+		self._reader = reader
+		self._subpage_lines = subpage_lines
+		self._inherited_ps = inherited_ps
+		self._subpages = [None] * len(subpage_lines)
+
+	def __len__(self):
+		return len(self._subpages)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [self[i] for i in range(*index.indices(len(self)))]
+
+		if index < 0:
+			index += len(self._subpages)
+		if index < 0 or index >= len(self._subpages):
+			raise IndexError('subpage index out of range')
+
+		if self._subpages[index] == None:
+			self._subpages[index] = self._reader.convert_subpage(self._subpage_lines[index], self._inherited_ps[index])
+			# The lines aren't needed any more
+			self._subpage_lines[index] = None
+		return self._subpages[index]
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+
+from teletextimager import atomicfile
+from teletextimager.teletextdecoder import DecodedPage
+
+class TeletextDecodeCache:
+	'''
+	Cache of decoded pages, keyed by a hash of the packets that the decoder uses
+	along with the decoding options.
+
+	Serialized decoded pages are held in an in-memory LRU of up to maxsize
+	entries and, if a directory is given, also in files within that directory
+	so they can be shared between runs and processes.
+	'''
+	# Bump this if the decoder would decode the same packets differently,
+	# so pages cached on disk by an earlier version are not used
+	version = 1
+
+	def __init__(self, maxsize=256, directory=None):
+		self.maxsize = maxsize
+		self.directory = directory
+		self._memory = OrderedDict()
+		self._lock = threading.Lock()
+
+	@classmethod
+	def key(cls, page, level='3.5', black_foreground=True, double_width=True):
+		'''
+		Returns a stable hash of the parts of a page that affect how it is decoded:
+		the rows, the X/26 and X/28 triplets, region and control bits, together
+		with the decoding options.
+		'''
+		h = hashlib.blake2b(digest_size=20)
+
+		h.update(repr((cls.version, level, bool(black_foreground), bool(double_width), page.get('region', 0), sorted(page.get('control_bits', ())))).encode())
+
+		for r in range(25):
+			if r in page:
+				h.update(b'R%d,%d:' % (r, len(page[r])))
+				h.update(bytes(page[r]))
+
+		for k in sorted(k for k in page if type(k) is tuple and (k[0] == 26 or k[0] == 28)):
+			h.update(b'X%d/%d,%d:' % (k[0], k[1], len(page[k])))
+			for t in page[k]:
+				# Triplets are 18 bits, so this can't clash with a triplet that decoded
+				if t == None:
+					t = 0xffffffff
+				h.update(t.to_bytes(4, 'little'))
+
+		return h.hexdigest()
+
+	def _path(self, key):
+		return os.path.join(self.directory, key[:2], key + '.ttd')
+
+	def get(self, key):
+		'''
+		Returns the serialized decoded page stored under key, or None if not cached.
+		'''
+		with self._lock:
+			if key in self._memory:
+				self._memory.move_to_end(key)
+				return self._memory[key]
+
+		if self.directory == None:
+			return None
+
+		try:
+			with open(self._path(key), 'rb') as f:
+				data = f.read()
+		except OSError:
+			return None
+
+		self._remember(key, data)
+		return data
+
+	def put(self, key, data):
+		'''
+		Stores a serialized decoded page under key.
+		'''
+		self._remember(key, data)
+
+		if self.directory == None:
+			return
+
+		# Write to a temporary file first so other processes never see
+		# a partially written file
+		path = self._path(key)
+		try:
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			with atomicfile.atomic_write(path) as f:
+				f.write(data)
+		except OSError:
+			# The on-disk cache is only an optimisation
+			pass
+
+	def _remember(self, key, data):
+		with self._lock:
+			self._memory[key] = data
+			self._memory.move_to_end(key)
+			while len(self._memory) > self.maxsize:
+				self._memory.popitem(last=False)
+
+	def clear(self):
+		'''
+		Empties the in-memory cache. Files in the directory are left alone.
+		'''
+		with self._lock:
+			self._memory.clear()
+
+	def decode(self, decoder, page, level='3.5', black_foreground=True, double_width=True):
+		'''
+		Decodes a page with the supplied TeletextDecode instance in the same way as
+		TeletextDecode.decode(), but restores the result from the cache if the
+		same page has been decoded with the same options before, in which case
+		the decoder is left as it was.
+		Returns the decoded page as a DecodedPage, with the status bits of the decoder.
+		'''
+		key = self.key(page, level, black_foreground, double_width)
+		data = self.get(key)
+
+		if data != None:
+			try:
+				result = DecodedPage(data)
+				if result.status_bits != decoder.status_bits:
+					result = result.with_status_bits(decoder.status_bits)
+				return result
+			except ValueError:
+				# Corrupt or from an incompatible version, decode it again
+				pass
+
+		result = decoder.decode(page, level=level, black_foreground=black_foreground, double_width=double_width, snapshot=True)
+		self.put(key, result.to_bytes())
+		return result
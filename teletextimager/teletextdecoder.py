@@ -1,16 +1,15 @@
 #!/usr/bin/env python3
 
-import copy
-from enum import Enum
-
-class TeletextDecode:
-	def __init__(self):
-		self.level = 3
-		self.status_bits = 0
-		self.cells = [[self.Cell() for c in range(72)] for r in range(25)]
-#		self.clear_page()
-
-	class Frag(Enum):
+from collections import namedtuple
+from enum import IntEnum
+import struct
+
+class TeletextPage:
+	'''
+	Getters shared by TeletextDecode and DecodedPage for reading a decoded page
+	held as planes of 25 rows of 72 columns, indexed by r * 72 + c.
+	'''
+	class Frag(IntEnum):
 		NORMALSIZE = 0
 		DH_TOPHALF = 1
 		DH_BOTTOMHALF = 2
@@ -21,98 +20,79 @@ class TeletextDecode:
 		DS_BOTTOMLEFTQUARTER = 7
 		DS_BOTTOMRIGHTQUARTER = 8
 
-	class FlashAttr:
-		def __init__(self):
-			self.fl_mode = 0
-			self.fl_rate_phase = 0
-			self.fl_phase_shown = 0
-
-	class DisplayAttr:
-		def __init__(self):
-			self.dheight = False
-			self.dwidth = False
-			self.box_win = False
-			self.conceal = False
-			self.invert = False
-			self.und_sep = False
-
-	class FontStyleAttr:
-		def __init__(self):
-			self.prop = False
-			self.bold = False
-			self.italic = False
-
-	class Attribute:
-		def __init__(self):
-			self.foreground = 7
-			self.background = 0
-			self.flash = TeletextDecode.FlashAttr()
-			self.display = TeletextDecode.DisplayAttr()
-			self.font_style = TeletextDecode.FontStyleAttr()
-
-	class CellChar:
-		def __init__(self):
-			self.ch_code = 0x20
-			self.ch_set = 0
-			self.ch_diacritic = 0
-
-	class Cell:
-		def __init__(self):
-			self.ch = TeletextDecode.CellChar()
-			self.attr = TeletextDecode.Attribute()
-			self.frag = TeletextDecode.Frag.NORMALSIZE
+	# Frag members indexed by their value, as stored in the frag plane
+	_frag_members = tuple(Frag)
+
+	# Bits of the display plane and the display field of Attribute,
+	# matching the bits of the X/26 "display attributes" triplet data
+	DISP_DHEIGHT = 0x01
+	DISP_BOX_WIN = 0x02
+	DISP_CONCEAL = 0x04
+	DISP_INVERT = 0x10
+	DISP_UND_SEP = 0x20
+	DISP_DWIDTH = 0x40
+
+	# Names of the planes of the cell grid, in the order they are serialized
+	plane_names = (
+		'ch_code', 'ch_set', 'ch_diacritic',
+		'foreground', 'background',
+		'fl_mode', 'fl_rate_phase', 'fl_phase_shown',
+		'display', 'frag'
+	)
+
+	# Names of the planes of colours shown in each cell, see resolve_colours(),
+	# which are serialized after the planes of the cell grid
+	res_plane_names = ('res_foreground', 'res_background', 'res_flash_foreground')
+
+	# Maps a foreground colour to the colour shown in the other flash phase
+	_flash_table = bytes(i ^ 8 for i in range(256))
+
+	# Page-wide properties at the start of a serialized page: status bits, full
+	# screen colour, side panel columns, flash present, full row colours and the palette
+	_header_struct = struct.Struct('<5B25B32H')
+
+	# Length of a serialized page
+	_serialized_size = _header_struct.size + (len(plane_names) + len(res_plane_names)) * 25 * 72
 
 	# Getters for character cells
 	def get_char_code(self, r, c):
-		return self.cells[r][c].ch.ch_code
+		return self.ch_code[r * 72 + c]
 
 	def get_char_set(self, r, c):
-		return self.cells[r][c].ch.ch_set
+		return self.ch_set[r * 72 + c]
 
 	def get_char_diacritic(self, r, c):
-		return self.cells[r][c].ch.ch_diacritic
+		return self.ch_diacritic[r * 72 + c]
 
 	def get_foreground(self, r, c):
-		result = self.cells[r][c].attr.foreground
-		if result == 8:
-			return(self.transparent(r, c))
-		else:
-			return result
+		return self.res_foreground[r * 72 + c]
 
 	def get_background(self, r, c):
-		result = self.cells[r][c].attr.background
-		if result == 8:
-			return(self.transparent(r, c))
-		else:
-			return result
+		return self.res_background[r * 72 + c]
 
 	def get_flash_foreground(self, r, c):
-		result = self.cells[r][c].attr.foreground ^ 8
-		if result == 8:
-			return(self.transparent(r, c))
-		else:
-			return result
+		return self.res_flash_foreground[r * 72 + c]
 
 	def get_fragment(self, r, c):
-		return self.cells[r][c].frag
+		return self._frag_members[self.frag[r * 72 + c]]
 
 	def get_flash_mode(self, r, c):
-		return self.cells[r][c].attr.flash.fl_mode
+		return self.fl_mode[r * 72 + c]
 
 	def get_flash_rate_phase(self, r, c):
-		return self.cells[r][c].attr.flash.fl_rate_phase
+		return self.fl_rate_phase[r * 72 + c]
 
 	def get_flash_phase_shown(self, r, c):
-		return self.cells[r][c].attr.flash.fl_phase_shown
+		return self.fl_phase_shown[r * 72 + c]
 
 	def get_conceal(self, r, c):
-		return self.cells[r][c].attr.display.conceal
+		return (self.display[r * 72 + c] & self.DISP_CONCEAL) != 0
 
 	def get_invert(self, r, c):
-		return self.cells[r][c].attr.display.invert
+		return (self.display[r * 72 + c] & self.DISP_INVERT) != 0
 
 	def get_und_sep(self, r, c):
-		return self.cells[r][c].attr.display.und_sep
+		return (self.display[r * 72 + c] & self.DISP_UND_SEP) != 0
 
 	# Getters for whole page properties
 	def get_flash_present(self):
@@ -129,6 +109,142 @@ class TeletextDecode:
 			result.append((b << 4) | b)
 		return result
 
+	def transparent(self, r, c):
+		'''
+		Find which colour of a cell that results from CLUT 1:0 "transparent"
+		using the logic table in C.1 of the ETSI spec.
+		Returns either the colour index, or 8 if video will show through.
+		'''
+		transparent_page = (self.status_bits & 0x03) != 0x00
+
+		i = r * 72 + c
+
+		if ((self.display[i] & self.DISP_BOX_WIN) != 0) != transparent_page:
+			return 8
+
+		if self.frag[i] == self.Frag.DH_BOTTOMHALF or self.frag[i] == self.Frag.DS_BOTTOMLEFTQUARTER or self.frag[i] == self.Frag.DS_BOTTOMRIGHTQUARTER:
+			row_colour = self.full_row[r-1]
+		else:
+			row_colour = self.full_row[r]
+
+		return row_colour
+
+	def resolve_colours(self):
+		'''
+		Works out the foreground, background and flash foreground colours shown
+		in every cell of the page at once, resolving CLUT 1:0 "transparent" with
+		transparent() only for the cells that use it.
+		Returns the three colour planes.
+		'''
+		foreground = bytearray(self.foreground)
+		background = bytearray(self.background)
+		flash_foreground = foreground.translate(self._flash_table)
+
+		for plane in (foreground, background, flash_foreground):
+			i = plane.find(8)
+			while i != -1:
+				plane[i] = self.transparent(i // 72, i % 72)
+				i = plane.find(8, i + 1)
+
+		return foreground, background, flash_foreground
+
+class TeletextDecode(TeletextPage):
+	def __init__(self):
+		self.level = 3
+		self._status_bits = 0
+		# The decoded page is held as a struct-of-arrays grid: one plane per cell
+		# field, each plane holding 25 rows of 72 columns indexed by r * 72 + c
+		self.ch_code = bytearray(25 * 72)
+		self.ch_set = bytearray(25 * 72)
+		self.ch_diacritic = bytearray(25 * 72)
+		self.foreground = bytearray(25 * 72)
+		self.background = bytearray(25 * 72)
+		self.fl_mode = bytearray(25 * 72)
+		self.fl_rate_phase = bytearray(25 * 72)
+		self.fl_phase_shown = bytearray(25 * 72)
+		self.display = bytearray(25 * 72)
+		self.frag = bytearray(25 * 72)
+		self._planes = tuple(getattr(self, n) for n in self.plane_names)
+		# Colours shown in each cell, see resolve_colours()
+		self.res_foreground = bytearray(25 * 72)
+		self.res_background = bytearray(25 * 72)
+		self.res_flash_foreground = bytearray(25 * 72)
+		# Intern table of attribute values, see intern_attr()
+		self._attr_intern = {}
+		# State at the start of each row and flashing found on each row,
+		# kept so that rows can be decoded again incrementally
+		self._row_state = [None] * 25
+		self._row_flash = [0] * 25
+		# What the last page was decoded from, see decode()
+		self._last_options = None
+		self._last_inputs = None
+		self._last_rows = None
+		self.adp_invoc = []
+		self.pas_invoc = []
+#		self.clear_page()
+
+	@property
+	def status_bits(self):
+		'''
+		The page status bits. Bits 0 and 1 make the page transparent so they
+		are used to resolve the colours shown in each cell. The colours of the
+		decoded page are resolved again when this is set, so it can be set
+		either before or after decode().
+		'''
+		return self._status_bits
+
+	@status_bits.setter
+	def status_bits(self, value):
+		changed = (value ^ self._status_bits) & 0x03
+		self._status_bits = value
+		if changed:
+			self.res_foreground, self.res_background, self.res_flash_foreground = self.resolve_colours()
+
+	# Attributes are immutable and hashable so that every cell and every copy of
+	# the row state can share one value. Changing an attribute makes a new value,
+	# see attr_replace().
+	Attribute = namedtuple('Attribute', [
+		'foreground', 'background',
+		'fl_mode', 'fl_rate_phase', 'fl_phase_shown',
+		'display', 'font_style'
+	], defaults=[7, 0, 0, 0, 0, 0, 0])
+
+	# When given a character set Region and NOS, these dictionaries are used
+	# to look up which row of the character bitmap to use.
+	l1_char_map = {
+		(0, 0): 12, (0, 1): 15, (0, 2): 22, (0, 3): 16, (0, 4): 14, (0, 5): 19, (0, 6): 11,
+		(1, 0): 18, (1, 1): 15, (1, 2): 22, (1, 3): 16, (1, 4): 14,             (1, 6): 19,
+		(2, 0): 12, (2, 1): 15, (2, 2): 22, (2, 3): 16, (2, 4): 14, (2, 5): 19, (2, 6): 23,
+		(3, 5): 21, (3, 7): 20,
+		(4, 0):  1, (4, 1): 15, (4, 2): 13, (4, 3): 17, (4, 4):  2, (4, 5):  3, (4, 6): 11,
+		(6, 6): 23, (6, 7): 4,
+		(8, 0): 12, (8, 4): 14, (8, 7): 5,
+		(10, 5): 6, (10, 7): 5
+	}
+	g0_char_map = {
+		(4, 0): 1, (4, 4): 2, (4, 5): 3,
+		(6, 7): 4,
+		(8, 7): 5,
+		(10, 5): 6, (10, 7): 5
+	}
+	g2_char_map = {
+		(4, 0): 8, (4, 4): 8, (4, 5): 8,
+		(6, 7): 9,
+		(8, 0): 10, (8, 4): 10, (8, 7): 10,
+		(10, 5): 10, (10, 7): 10
+	}
+
+	# Page-wide settings worked out by decode_setup() before decoding the rows
+	PageSettings = namedtuple('PageSettings', [
+		'allow_black_foreground', 'allow_double_width', 'bbcs', 'fground_map', 'bground_map', 'start_attr',
+		'default_region', 'default_nos', 'second_region', 'second_nos',
+		'l1_default_char_set', 'l1_second_char_set', 'g0_default_char_set', 'g2_default_char_set',
+		'enh_rows'
+	])
+
+	# State carried from one row to the next by decode_row()
+	RowState = namedtuple('RowState', ['full_row_down', 'l1_bottom_half', 'second_g0g2_region', 'second_g0g2_nos'])
+
 	@staticmethod
 	def triplet_split(triplet):
 		'''
@@ -215,6 +331,20 @@ class TeletextDecode:
 			else:
 				return address - 40
 
+		def row_index(self):
+			'''
+			Returns the enhancements indexed by row: a Python dictionary with row
+			numbers as keys and a list of (column, enhancements) tuples sorted by
+			column as value.
+			'''
+			result = {}
+			for l, e in self.enhancements.items():
+				r, c = l
+				result.setdefault(r, []).append((c, e))
+			for cols in result.values():
+				cols.sort(key=lambda x: x[0])
+			return result
+
 	class Invocation1p5(Invocation):
 		def map_triplet(self, t_address, t_mode, t_data):
 			if t_mode == 0x04:  # Set Active Position
@@ -288,14 +418,29 @@ class TeletextDecode:
 
 			self.enhancements.setdefault((self.org_r + self.act_r, self.org_c + self.act_c), []).append((t_mode, t_data))
 
+	def clear_cells(self, start, end):
+		'''
+		Resets the cells in rows start to end-1 to spaces with default attributes.
+		'''
+		cells = slice(start * 72, end * 72)
+		n = (end - start) * 72
+		self.ch_code[cells] = b'\x20' * n
+		self.ch_set[cells] = bytes(n)
+		self.ch_diacritic[cells] = bytes(n)
+		self.foreground[cells] = b'\x07' * n
+		self.background[cells] = bytes(n)
+		self.fl_mode[cells] = bytes(n)
+		self.fl_rate_phase[cells] = bytes(n)
+		self.fl_phase_shown[cells] = bytes(n)
+		self.display[cells] = bytes(n)
+		self.frag[cells] = bytes(n)
+
 	def clear_page(self):
-		for r in range(25):
-			for c in range(72):
-				self.cells[r][c].ch.ch_code = 0x20
-				self.cells[r][c].ch.ch_set = 0
-				self.cells[r][c].ch.ch_diacritic = 0
-				self.cells[r][c].attr = self.Attribute()
-				self.cells[r][c].frag = self.Frag.NORMALSIZE
+		self.clear_cells(0, 25)
+		# Attribute values are few in practice, but don't let the intern table
+		# grow without limit over a long run of different pages
+		if len(self._attr_intern) > 4096:
+			self._attr_intern.clear()
 		self._palette = [
 			0x000, 0xf00, 0x0f0, 0xff0, 0x00f, 0xf0f, 0x0ff, 0xfff,
 			0x000, 0x700, 0x070, 0x770, 0x007, 0x707, 0x077, 0x777,
@@ -307,6 +452,32 @@ class TeletextDecode:
 		self.left_side_panel = 0
 		self.right_side_panel = 0
 
+	def copy_cell(self, i, j):
+		'''
+		Copies the character, attributes and fragment of grid index j to grid index i.
+		'''
+		for p in self._planes:
+			p[i] = p[j]
+
+	def set_attr(self, i, attr):
+		'''
+		Stores the supplied attribute into the planes of grid index i.
+		'''
+		self.foreground[i], self.background[i], self.fl_mode[i], self.fl_rate_phase[i], self.fl_phase_shown[i], self.display[i], _ = attr
+
+	def intern_attr(self, value):
+		'''
+		Returns the shared instance of an attribute value.
+		'''
+		return self._attr_intern.setdefault(value, value)
+
+	def attr_replace(self, attr, **changes):
+		'''
+		Returns the shared attribute value that results from changing some
+		fields of the supplied attribute, which itself is left untouched.
+		'''
+		return self.intern_attr(attr._replace(**changes))
+
 	def find_objects(self, invoc, page, obj_type = 0):
 		'''
 		Find any "Invoke ... Object" triplets within an Invocation.
@@ -347,6 +518,21 @@ class TeletextDecode:
 					elif it_mode == 0x13:
 						self.pas_invoc.append(self.Invocation2p5(page, obj_def_y, obj_def_d, obj_def_t, org_r, org_c))
 
+	@staticmethod
+	def merge_row_index(invocs):
+		'''
+		Merges the row indexes of a list of Invocations into one, in the same form
+		as Invocation.row_index(). Where more than one Invocation has enhancements
+		in the same cell they are concatenated in the order of the list.
+		'''
+		merged = {}
+		for inv in invocs:
+			for r, cols in inv.row_index().items():
+				row = merged.setdefault(r, {})
+				for c, e in cols:
+					row.setdefault(c, []).extend(e)
+		return { r: sorted(row.items(), key=lambda x: x[0]) for r, row in merged.items() }
+
 	def parse_char_enhancements(self, enhances):
 		'''
 		Parses a triplet list for character-based enhancements and returns
@@ -374,9 +560,9 @@ class TeletextDecode:
 
 	def parse_attr_enhancements(self, enhances, attr):
 		'''
-		Parses a triplet list for attribute-based enhancements and modifies
-		the supplied attribute parameter. Returns which attributes have been
-		altered, if any.
+		Parses a triplet list for attribute-based enhancements applied on top of
+		the supplied attribute. Returns the resulting attribute along with which
+		attributes have been altered, if any.
 		'''
 		changes = set()
 
@@ -384,29 +570,24 @@ class TeletextDecode:
 			t_mode, t_data = e
 
 			if t_mode == 0x20 and t_data < 0x20:  # Foreground colour
-				attr.foreground = t_data
+				attr = self.attr_replace(attr, foreground=t_data)
 				changes.add(0x20)
 			elif t_mode == 0x23 and t_data < 0x20:  # Background colour
-				attr.background = t_data
+				attr = self.attr_replace(attr, background=t_data)
 				changes.add(0x23)
 			elif t_mode == 0x27:  # Additional flash functions
-				attr.flash.fl_mode = t_data & 0x03
-				attr.flash.fl_rate_phase = t_data >> 2
-				if attr.flash.fl_rate_phase == 4 or attr.flash.fl_rate_phase == 5:
-					attr.flash.fl_phase_shown = 0
+				fl_rate_phase = t_data >> 2
+				if fl_rate_phase == 4 or fl_rate_phase == 5:
+					fl_phase_shown = 0
 				else:
-					attr.flash.fl_phase_shown = attr.flash.fl_rate_phase
+					fl_phase_shown = fl_rate_phase
+				attr = self.attr_replace(attr, fl_mode=t_data & 0x03, fl_rate_phase=fl_rate_phase, fl_phase_shown=fl_phase_shown)
 				changes.add(0x27)
 			elif t_mode == 0x2c:  # Display attributes
-				attr.display.dheight = (t_data & 0x01) == 0x01
-				attr.display.box_win = (t_data & 0x02) == 0x02
-				attr.display.conceal = (t_data & 0x04) == 0x04
-				attr.display.invert = (t_data & 0x10) == 0x10
-				attr.display.und_sep = (t_data & 0x20) == 0x20
-				attr.display.dwidth = (t_data & 0x40) == 0x40
+				attr = self.attr_replace(attr, display=t_data & (self.DISP_DHEIGHT | self.DISP_BOX_WIN | self.DISP_CONCEAL | self.DISP_INVERT | self.DISP_UND_SEP | self.DISP_DWIDTH))
 				changes.add(0x2c)
 
-		return changes
+		return attr, changes
 
 	def parse_g0g2_enhancements(self, enhances):
 		'''
@@ -427,99 +608,182 @@ class TeletextDecode:
 		the character by spreading it into the neighbouring cells.
 		Used when overlaying Adaptive and Passive Objects.
 		'''
+		i = r * 72 + c
+
 		if r > 22:
 			dheight = False
 		else:
-			dheight = self.cells[r][c].attr.display.dheight
+			dheight = (self.display[i] & self.DISP_DHEIGHT) != 0
 
 		# TODO side panel edges
 		if c == 39:
 			dwidth = False
 		else:
-			dwidth = self.cells[r][c].attr.display.dwidth
+			dwidth = (self.display[i] & self.DISP_DWIDTH) != 0
 
 		# Set the fragment of the origin cell
 		if dheight:
 			if dwidth:
-				self.cells[r][c].frag = self.Frag.DS_TOPLEFTQUARTER
+				self.frag[i] = self.Frag.DS_TOPLEFTQUARTER
 			else:
-				self.cells[r][c].frag = self.Frag.DH_TOPHALF
+				self.frag[i] = self.Frag.DH_TOPHALF
 		elif dwidth:
-			self.cells[r][c].frag = self.Frag.DW_LEFTHALF
+			self.frag[i] = self.Frag.DW_LEFTHALF
 		else:
-			self.cells[r][c].frag = self.Frag.NORMALSIZE
+			self.frag[i] = self.Frag.NORMALSIZE
 
 		# Now spread the character and its attributes into the neighbouring cells
 		# and take a note of which cells have been covered as a result
-		if self.cells[r][c].frag == self.Frag.DH_TOPHALF:
-			self.cells[r+1][c] = copy.deepcopy(self.cells[r][c])
-			self.cells[r+1][c].frag = self.Frag.DH_BOTTOMHALF
+		if self.frag[i] == self.Frag.DH_TOPHALF:
+			self.copy_cell(i + 72, i)
+			self.frag[i + 72] = self.Frag.DH_BOTTOMHALF
 			covered.add((r+1, c))
-		elif self.cells[r][c].frag == self.Frag.DW_LEFTHALF:
-			self.cells[r][c+1] = copy.deepcopy(self.cells[r][c])
-			self.cells[r][c+1].frag = self.Frag.DW_RIGHTHALF
+		elif self.frag[i] == self.Frag.DW_LEFTHALF:
+			self.copy_cell(i + 1, i)
+			self.frag[i + 1] = self.Frag.DW_RIGHTHALF
 			covered.add((r, c+1))
-		elif self.cells[r][c].frag == self.Frag.DS_TOPLEFTQUARTER:
-			self.cells[r][c+1] = copy.deepcopy(self.cells[r][c])
-			self.cells[r+1][c] = copy.deepcopy(self.cells[r][c])
-			self.cells[r+1][c+1] = copy.deepcopy(self.cells[r][c])
-			self.cells[r][c+1].frag = self.Frag.DS_TOPRIGHTQUARTER
-			self.cells[r+1][c].frag = self.Frag.DS_BOTTOMLEFTQUARTER
-			self.cells[r+1][c+1].frag = self.Frag.DS_BOTTOMRIGHTQUARTER
+		elif self.frag[i] == self.Frag.DS_TOPLEFTQUARTER:
+			self.copy_cell(i + 1, i)
+			self.copy_cell(i + 72, i)
+			self.copy_cell(i + 73, i)
+			self.frag[i + 1] = self.Frag.DS_TOPRIGHTQUARTER
+			self.frag[i + 72] = self.Frag.DS_BOTTOMLEFTQUARTER
+			self.frag[i + 73] = self.Frag.DS_BOTTOMRIGHTQUARTER
 			covered.add((r, c+1))
 			covered.add((r+1, c))
 			covered.add((r+1, c+1))
 
-	def rotate_flash(self, flash, c):
+	def rotate_flash(self, attr, c):
 		'''
-		Rotates the flash phase during incremental and decremental flash.
+		Rotates the flash phase during incremental and decremental flash,
+		returning the attribute with the phase shown at this column.
 		Also takes a note of which flash phases have been encountered in the page.
 		'''
-		if flash.fl_mode == 0:
-			return
+		if attr.fl_mode == 0:
+			return attr
 
-		if flash.fl_rate_phase == 4 or flash.fl_rate_phase == 5:
-			if flash.fl_phase_shown == 0:
+		if attr.fl_rate_phase == 4 or attr.fl_rate_phase == 5:
+			if attr.fl_phase_shown == 0:
 				self.flash_origin_c = c
-			if flash.fl_rate_phase == 4:
-				flash.fl_phase_shown = ((c - self.flash_origin_c) % 3) + 1
-			else:  # elif flash.fl_rate_phase == 5:
-				flash.fl_phase_shown = 3 - ((c + 2 - self.flash_origin_c) % 3)
+			if attr.fl_rate_phase == 4:
+				attr = self.attr_replace(attr, fl_phase_shown=((c - self.flash_origin_c) % 3) + 1)
+			else:  # elif attr.fl_rate_phase == 5:
+				attr = self.attr_replace(attr, fl_phase_shown=3 - ((c + 2 - self.flash_origin_c) % 3))
 
-		if flash.fl_rate_phase == 0:
+		if attr.fl_rate_phase == 0:
 			self.flash_present |= 1
-		elif flash.fl_rate_phase <= 5:
+		elif attr.fl_rate_phase <= 5:
 			self.flash_present |= 2
 
-	def decode(self, page, level='3.5', black_foreground=True, double_width=True):
-		self.clear_page()
-
-		# When given a character set Region and NOS, these dictionaries are used
-		# to look up which row of the character bitmap to use.
-		l1_char_map = {
-			(0, 0): 12, (0, 1): 15, (0, 2): 22, (0, 3): 16, (0, 4): 14, (0, 5): 19, (0, 6): 11,
-			(1, 0): 18, (1, 1): 15, (1, 2): 22, (1, 3): 16, (1, 4): 14,             (1, 6): 19,
-			(2, 0): 12, (2, 1): 15, (2, 2): 22, (2, 3): 16, (2, 4): 14, (2, 5): 19, (2, 6): 23,
-			(3, 5): 21, (3, 7): 20,
-			(4, 0):  1, (4, 1): 15, (4, 2): 13, (4, 3): 17, (4, 4):  2, (4, 5):  3, (4, 6): 11,
-			(6, 6): 23, (6, 7): 4,
-			(8, 0): 12, (8, 4): 14, (8, 7): 5,
-			(10, 5): 6, (10, 7): 5
-		}
-		g0_char_map = {
-			(4, 0): 1, (4, 4): 2, (4, 5): 3,
-			(6, 7): 4,
-			(8, 7): 5,
-			(10, 5): 6, (10, 7): 5
-		}
-		g2_char_map = {
-			(4, 0): 8, (4, 4): 8, (4, 5): 8,
-			(6, 7): 9,
-			(8, 0): 10, (8, 4): 10, (8, 7): 10,
-			(10, 5): 10, (10, 7): 10
-		}
-
-		start_attr = self.Attribute()
+		return attr
+
+	def decode(self, page, level='3.5', black_foreground=True, double_width=True, incremental=False, snapshot=False):
+		'''
+		Decodes the packets of a page into the cell grid. If snapshot is True the
+		result is also copied into a DecodedPage which is returned, otherwise
+		None is returned and the page can be read from this decoder.
+
+		If incremental is True and this decoder last decoded a page incrementally
+		too, with the same decoding options, X/26 and X/28 packets, region and
+		control bits, only the rows whose packets have changed since then are
+		decoded again, along with the rows below them that are affected by double
+		height characters or by state carried down from the rows above. The whole page is decoded if any
+		of those differ or if the page has Adaptive or Passive Objects.
+
+		The rows that were decoded are left in decoded_rows.
+
+		The colours shown in each cell are resolved using the status bits set
+		on this decoder, see status_bits.
+		'''
+		if incremental:
+			options = (level, black_foreground, double_width)
+			inputs = self.page_inputs(page)
+			rows = [bytes(page[r]) if r in page else None for r in range(25)]
+		else:
+			# What the page was decoded from is only kept for incremental decoding,
+			# so a later incremental decode starts by decoding the whole page
+			options = inputs = rows = None
+
+		if incremental and self._last_options == options and self._last_inputs == inputs and not self.adp_invoc and not self.pas_invoc:
+			self.decode_rows(page, set(r for r in range(25) if rows[r] != self._last_rows[r]))
+		else:
+			self.clear_page()
+			state = self.decode_setup(page, level, black_foreground, double_width)
+			for r in range(25):
+				self._row_state[r] = state
+				state = self.decode_row(page, r, state)
+			self.decode_overlays()
+			self.decoded_rows = set(range(25))
+
+		self._last_options = options
+		self._last_inputs = inputs
+		self._last_rows = rows
+
+		self.res_foreground, self.res_background, self.res_flash_foreground = self.resolve_colours()
+
+		if snapshot:
+			return self.decoded_page()
+
+	@staticmethod
+	def page_inputs(page):
+		'''
+		Returns a copy of everything in a page apart from the Level 1 rows that
+		affects how it is decoded, used to check if a page can be decoded incrementally.
+		'''
+		result = {}
+		for k, v in page.items():
+			if type(k) is tuple and (k[0] == 26 or k[0] == 28):
+				result[k] = list(v)
+		result['region'] = page.get('region', 0)
+		result['control_bits'] = frozenset(page.get('control_bits', ()))
+		return result
+
+	def decode_rows(self, page, changed):
+		'''
+		Decodes again the rows in the changed set on a page that has already been
+		decoded, carrying on down the page while the rows below are affected.
+		'''
+		# Full screen colour is only set by enhancements which haven't changed, and
+		# could otherwise be overwritten by a row above the one that last set it
+		full_screen = self.full_screen
+		self.flash_present = 0
+		self.decoded_rows = set()
+
+		cascade = False
+		for r in range(25):
+			if not cascade and not r in changed:
+				continue
+
+			had_top_halves = self.has_top_halves(r)
+			self.clear_cells(r, r + 1)
+			state = self.decode_row(page, r, self._row_state[r])
+			self.decoded_rows.add(r)
+
+			# Carry on to the row below if it has characters enlarged into it,
+			# or if what it inherits from this row has changed
+			cascade = had_top_halves or self.has_top_halves(r) or state.l1_bottom_half
+			if r < 24 and state != self._row_state[r + 1]:
+				self._row_state[r + 1] = state
+				cascade = True
+
+		self.full_screen = full_screen
+		self.flash_present = 0
+		for f in self._row_flash:
+			self.flash_present |= f
+
+	def has_top_halves(self, r):
+		'''
+		Returns True if a row has the top half of any double height or double size characters.
+		'''
+		row_frag = self.frag[r * 72:(r + 1) * 72]
+		return self.Frag.DH_TOPHALF in row_frag or self.Frag.DS_TOPLEFTQUARTER in row_frag or self.Frag.DS_TOPRIGHTQUARTER in row_frag
+
+	def decode_setup(self, page, level, black_foreground, double_width):
+		'''
+		Works out the page-wide settings from the page presentation and enhancement
+		packets, and finds the Objects on the page. Returns the state for the first row.
+		'''
+		start_attr = self.intern_attr(self.Attribute())
 
 		default_region = page.get('region', 0)
 		default_nos = 0
@@ -615,7 +879,7 @@ class TeletextDecode:
 				elif clut_remap == 7:
 					fground_map = 16
 					bground_map = 24
-				start_attr.foreground = fground_map | 7
+				start_attr = self.attr_replace(start_attr, foreground=fground_map | 7)
 
 				if pres[1] != None and (self.level == 3 or (pres[1] & 0x20) == 0x20):
 					side_panel_cols = (pres[1] >> 6) & 0xf
@@ -669,320 +933,343 @@ class TeletextDecode:
 			if self.level == 1 and (26, 0) in page:
 				local_enh = self.Invocation1p5(page, 26, 0, 0)
 
-		l1_default_char_set = l1_char_map.get((default_region, default_nos), 12)
-		l1_second_char_set = l1_char_map.get((second_region, second_nos), l1_default_char_set)
-		g0_default_char_set = g0_char_map.get((default_region, default_nos), 0)
-		g2_default_char_set = g2_char_map.get((default_region, default_nos), 7)
+		l1_default_char_set = self.l1_char_map.get((default_region, default_nos), 12)
+		l1_second_char_set = self.l1_char_map.get((second_region, second_nos), l1_default_char_set)
+		g0_default_char_set = self.g0_char_map.get((default_region, default_nos), 0)
+		g2_default_char_set = self.g2_char_map.get((default_region, default_nos), 7)
+
+		# Index of the cells where Active Objects and the Local Enhancement Data
+		# place enhancements, so the cell loop only parses triplets at those cells
+		if local_enh != None:
+			enh_rows = self.merge_row_index(self.act_invoc + [local_enh])
+		else:
+			enh_rows = self.merge_row_index(self.act_invoc)
+
+		self._settings = self.PageSettings(
+			allow_black_foreground, allow_double_width, bbcs, fground_map, bground_map, start_attr,
+			default_region, default_nos, second_region, second_nos,
+			l1_default_char_set, l1_second_char_set, g0_default_char_set, g2_default_char_set,
+			enh_rows
+		)
 
 		# Level 2.5 limits the "modified G0/G2 character set designation" triplet
-		# to two character sets. These variables are used to enforce that.
-		second_g0g2_region = None
-		second_g0g2_nos = None
+		# to two character sets, the second_g0g2 state is used to enforce that
+		return self.RowState(full_row_down=full_row_down, l1_bottom_half=False, second_g0g2_region=None, second_g0g2_nos=None)
 
-		# Used for covering the bottom half of double height rows
+	def decode_row(self, page, r, state):
+		'''
+		Decodes one row of the page from the Level 1 packet, Active Objects and
+		Local Enhancement Data. Takes the state carried down from the row above
+		and returns the state for the row below.
+		'''
+		allow_black_foreground, allow_double_width, bbcs, fground_map, bground_map, start_attr, default_region, default_nos, second_region, second_nos, l1_default_char_set, l1_second_char_set, g0_default_char_set, g2_default_char_set, enh_rows = self._settings
+		full_row_down, l1_bottom_half, second_g0g2_region, second_g0g2_nos = state
 		l1_dheight_found = False
-		l1_bottom_half = False
 
-		for r in range(25):
-			pkt = page.get(r, bytes(b'\x20' * 40))
+		# Keep track of flashing found on this row separately
+		page_flash_present = self.flash_present
+		self.flash_present = 0
 
-			self.full_row[r] = full_row_down
-			if bbcs:
-				start_attr.background = full_row_down
-			else:
-				start_attr.background = bground_map
-
-			current_attr = copy.deepcopy(start_attr)
-
-			l1_fground_col = 7
-			l1_mosaics = False
-			l1_sep_mosaics = False
-			l1_hold_mosaics = False
-			l1_hold_mosaic_ch = 0x20
-			l1_hold_mosaic_sep = False
-			l1_escape_switch = False
-
-			l1_char_set = l1_default_char_set
-			g0_char_set = g0_default_char_set
-			g2_char_set = g2_default_char_set
-
-			# Which column incremental or decremental flash was applied so we can
-			# calculate the phase
-			self.flash_origin_c = None
-
-			for c in range(72):
-				# Get any Local Enhancements and/or Active Objects at this cell
-				enhances = []
-				for inv in self.act_invoc:
-					if (r, c) in inv.enhancements:
-						enhances.extend(inv.enhancements[(r, c)])
-				if local_enh != None:
-					if (r, c) in local_enh.enhancements:
-						enhances.extend(local_enh.enhancements[(r, c)])
-
-				# When starting this row, deal with X/26 attributes that affect the entire row
-				if c == 0:
-					for e in enhances:
-						t_mode, t_data = e
-
-						if t_mode == 0x00 and (t_data & 0x60) == 0x00:  # Full screen colour
-							self.full_screen = t_data
-							full_row_down = t_data
-							self.full_row[r] = t_data
-							if bbcs:
-								start_attr.background = t_data
-						elif t_mode == 0x01 or (t_mode == 0x07 and r == 0):  # Full row colour or addr row 0
-							self.full_row[r] = t_data & 0x1f
-							if bbcs:
-								start_attr.background = t_data & 0x1f
-							if (t_data & 0x60) == 0x60:
-								full_row_down = t_data & 0x1f
-
-				# Reset attributes at start of row
-				if c == 0:
-					current_attr = copy.deepcopy(start_attr)
-				# and when crossing into side panels, except background is full row colour
-				elif c == 40 or c == 56:
-					current_attr = copy.deepcopy(start_attr)
-					current_attr.background = self.full_row[r]
-
-				if c < 40 and r in page and c < len(pkt):
-					l1_byte = pkt[c]
-				else:
-					l1_byte = 0x20
-
-				# Level 1 set-at and "set-between" attributes
-				if c < 40 and (not l1_bottom_half):
-					if l1_byte == 0x09:  # Steady
-						current_attr.flash.fl_mode = 0
-						current_attr.flash.fl_rate_phase = 0
-					elif l1_byte == 0x0a:  # End box
-						# "Set-between" - requires two consecutive "end box" codes
-						if c > 0 and pkt[c-1] == 0x0a:
-							current_attr.display.box_win = False
-					elif l1_byte == 0x0b:  # Start box
-						# "Set-between" - requires two consecutive "start box" codes
-						if c > 0 and pkt[c-1] == 0x0b:
-							current_attr.display.box_win = True
-					elif l1_byte == 0x0c:  # Normal size
-						if current_attr.display.dheight or current_attr.display.dwidth:
-							# Change of size resets held mosaic character
-							l1_hold_mosaic_ch = 0x20
-							l1_hold_mosaic_sep = False
-						current_attr.display.dheight = False
-						current_attr.display.dwidth = False
-					elif l1_byte == 0x18:  # Conceal
-						current_attr.display.conceal = True
-					elif l1_byte == 0x19:  # Contiguous mosaics
-						# This spacing attribute cannot cancel an X/26 underlined/separated attribute
-						if not current_attr.display.und_sep:
-							l1_sep_mosaics = False
-					elif l1_byte == 0x1a:  # Separated mosaics
-						l1_sep_mosaics = True
-					elif l1_byte == 0x1c:  # Black background
-						current_attr.background = start_attr.background
-					elif l1_byte == 0x1d:  # New background
-						current_attr.background = l1_fground_col | bground_map
-					elif l1_byte == 0x1e:  # Hold mosaics
-						l1_hold_mosaics = True
+		pkt = page.get(r, bytes(b'\x20' * 40))
+
+		self.full_row[r] = full_row_down
+		if bbcs:
+			start_attr = self.attr_replace(start_attr, background=full_row_down)
+		else:
+			start_attr = self.attr_replace(start_attr, background=bground_map)
+
+		current_attr = start_attr
+
+		l1_fground_col = 7
+		l1_mosaics = False
+		l1_sep_mosaics = False
+		l1_hold_mosaics = False
+		l1_hold_mosaic_ch = 0x20
+		l1_hold_mosaic_sep = False
+		l1_escape_switch = False
+
+		l1_char_set = l1_default_char_set
+		g0_char_set = g0_default_char_set
+		g2_char_set = g2_default_char_set
+
+		# Which column incremental or decremental flash was applied so we can
+		# calculate the phase
+		self.flash_origin_c = None
 
+		# Columns in this row that have enhancements and the next one to reach
+		row_enh = enh_rows.get(r, [])
+		next_enh = 0
+
+		for c in range(72):
+			i = r * 72 + c
+
+			# Get any Local Enhancements and/or Active Objects at this cell
+			if next_enh < len(row_enh) and row_enh[next_enh][0] == c:
+				enhances = row_enh[next_enh][1]
+				next_enh += 1
+			else:
+				enhances = None
+
+			# When starting this row, deal with X/26 attributes that affect the entire row
+			if c == 0 and enhances != None:
+				for e in enhances:
+					t_mode, t_data = e
+
+					if t_mode == 0x00 and (t_data & 0x60) == 0x00:  # Full screen colour
+						self.full_screen = t_data
+						full_row_down = t_data
+						self.full_row[r] = t_data
+						if bbcs:
+							start_attr = self.attr_replace(start_attr, background=t_data)
+					elif t_mode == 0x01 or (t_mode == 0x07 and r == 0):  # Full row colour or addr row 0
+						self.full_row[r] = t_data & 0x1f
+						if bbcs:
+							start_attr = self.attr_replace(start_attr, background=t_data & 0x1f)
+						if (t_data & 0x60) == 0x60:
+							full_row_down = t_data & 0x1f
+
+			# Reset attributes at start of row
+			if c == 0:
+				current_attr = start_attr
+			# and when crossing into side panels, except background is full row colour
+			elif c == 40 or c == 56:
+				current_attr = self.attr_replace(start_attr, background=self.full_row[r])
+
+			if c < 40 and r in page and c < len(pkt):
+				l1_byte = pkt[c]
+			else:
+				l1_byte = 0x20
+
+			# Level 1 set-at and "set-between" attributes
+			if c < 40 and (not l1_bottom_half):
+				if l1_byte == 0x09:  # Steady
+					current_attr = self.attr_replace(current_attr, fl_mode=0, fl_rate_phase=0)
+				elif l1_byte == 0x0a:  # End box
+					# "Set-between" - requires two consecutive "end box" codes
+					if c > 0 and pkt[c-1] == 0x0a:
+						current_attr = self.attr_replace(current_attr, display=current_attr.display & ~self.DISP_BOX_WIN)
+				elif l1_byte == 0x0b:  # Start box
+					# "Set-between" - requires two consecutive "start box" codes
+					if c > 0 and pkt[c-1] == 0x0b:
+						current_attr = self.attr_replace(current_attr, display=current_attr.display | self.DISP_BOX_WIN)
+				elif l1_byte == 0x0c:  # Normal size
+					if current_attr.display & (self.DISP_DHEIGHT | self.DISP_DWIDTH):
+						# Change of size resets held mosaic character
+						l1_hold_mosaic_ch = 0x20
+						l1_hold_mosaic_sep = False
+					current_attr = self.attr_replace(current_attr, display=current_attr.display & ~(self.DISP_DHEIGHT | self.DISP_DWIDTH))
+				elif l1_byte == 0x18:  # Conceal
+					current_attr = self.attr_replace(current_attr, display=current_attr.display | self.DISP_CONCEAL)
+				elif l1_byte == 0x19:  # Contiguous mosaics
+					# This spacing attribute cannot cancel an X/26 underlined/separated attribute
+					if not current_attr.display & self.DISP_UND_SEP:
+						l1_sep_mosaics = False
+				elif l1_byte == 0x1a:  # Separated mosaics
+					l1_sep_mosaics = True
+				elif l1_byte == 0x1c:  # Black background
+					current_attr = self.attr_replace(current_attr, background=start_attr.background)
+				elif l1_byte == 0x1d:  # New background
+					current_attr = self.attr_replace(current_attr, background=l1_fground_col | bground_map)
+				elif l1_byte == 0x1e:  # Hold mosaics
+					l1_hold_mosaics = True
+
+			if enhances != None:
 				# X/26 attributes
-				changes = self.parse_attr_enhancements(enhances, current_attr)
+				current_attr, changes = self.parse_attr_enhancements(enhances, current_attr)
 				# Cancelling separated mosaics with X/26 attribute
 				# also cancels the Level 1 separated mosaic attribute
-				if 0x2c in changes and not current_attr.display.und_sep:
+				if 0x2c in changes and not current_attr.display & self.DISP_UND_SEP:
 					l1_sep_mosaics = False
 
 				# Deal with "modified G0/G2 character set" triplet here
 				mod_g0g2 = self.parse_g0g2_enhancements(enhances)
-				if mod_g0g2 != None:
-					change_region, change_nos = mod_g0g2
-					new_region = None
-					new_nos = None
-
-					if self.level == 3 or (change_region == default_region and change_nos == default_nos) or (change_region == second_region and change_nos == second_nos):
-						new_region = change_region
-						new_nos = change_nos
-					elif second_g0g2_region == None:
-						new_region = change_region
-						new_nos = change_nos
-						second_g0g2_region = new_region
-						second_g0g2_nos = new_nos
-					if new_region != None:
-						g0_char_set = g0_char_map.get((new_region, new_nos), 0)
-						g2_char_set = g2_char_map.get((new_region, new_nos), 7)
-
-				# Level 1 character
-				if c < 40 and (not l1_bottom_half):
-					self.cells[r][c].ch.ch_diacritic = 0  # could de-duplicate
-					if l1_byte >= 0x20:
-						self.cells[r][c].ch.ch_code = l1_byte
-						# true on mosaic character - not on blast through alphanumerics
-						if l1_mosaics and (l1_byte & 0x20) == 0x20:
-							self.cells[r][c].ch.ch_set = 24 + int(l1_sep_mosaics or current_attr.display.und_sep)
-							l1_hold_mosaic_ch = l1_byte
-							l1_hold_mosaic_sep = l1_sep_mosaics
-						else:
-							self.cells[r][c].ch.ch_set = l1_char_set
-					elif l1_hold_mosaics:
-						self.cells[r][c].ch.ch_code = l1_hold_mosaic_ch
-						self.cells[r][c].ch.ch_set = 24 + int(l1_hold_mosaic_sep)
-						self.cells[r][c].ch.ch_diacritic = 0  # could de-duplicate
+			else:
+				mod_g0g2 = None
+
+			if mod_g0g2 != None:
+				change_region, change_nos = mod_g0g2
+				new_region = None
+				new_nos = None
+
+				if self.level == 3 or (change_region == default_region and change_nos == default_nos) or (change_region == second_region and change_nos == second_nos):
+					new_region = change_region
+					new_nos = change_nos
+				elif second_g0g2_region == None:
+					new_region = change_region
+					new_nos = change_nos
+					second_g0g2_region = new_region
+					second_g0g2_nos = new_nos
+				if new_region != None:
+					g0_char_set = self.g0_char_map.get((new_region, new_nos), 0)
+					g2_char_set = self.g2_char_map.get((new_region, new_nos), 7)
+
+			# Level 1 character
+			self.ch_diacritic[i] = 0
+			if c < 40 and (not l1_bottom_half):
+				if l1_byte >= 0x20:
+					self.ch_code[i] = l1_byte
+					# true on mosaic character - not on blast through alphanumerics
+					if l1_mosaics and (l1_byte & 0x20) == 0x20:
+						self.ch_set[i] = 24 + int(l1_sep_mosaics or (current_attr.display & self.DISP_UND_SEP) != 0)
+						l1_hold_mosaic_ch = l1_byte
+						l1_hold_mosaic_sep = l1_sep_mosaics
 					else:
-						self.cells[r][c].ch.ch_code = 0x20
-						self.cells[r][c].ch.ch_set = 0
-						self.cells[r][c].ch.ch_diacritic = 0  # could de-duplicate
+						self.ch_set[i] = l1_char_set
+				elif l1_hold_mosaics:
+					self.ch_code[i] = l1_hold_mosaic_ch
+					self.ch_set[i] = 24 + int(l1_hold_mosaic_sep)
 				else:
-					# In side panel or on bottom half of Level 1 double height row, no Level 1 characters here
-					self.cells[r][c].ch.ch_code = 0x20
-					self.cells[r][c].ch.ch_set = 0
-					self.cells[r][c].ch.ch_diacritic = 0  # could de-duplicate
+					self.ch_code[i] = 0x20
+					self.ch_set[i] = 0
+			else:
+				# In side panel or on bottom half of Level 1 double height row, no Level 1 characters here
+				self.ch_code[i] = 0x20
+				self.ch_set[i] = 0
 
-				# X/26 character
+			# X/26 character
+			if enhances != None:
 				x26_character = self.parse_char_enhancements(enhances)
-				if x26_character != None:
-					x26_ch_code, x26_ch_set, x26_ch_diacritic = x26_character
-					# We'd modify x26_ch_set while in the middle of the if/elif
-					# Assign it to another variable just in case...
-					ch_set_if = x26_ch_set
-					if ch_set_if == 0:
-						x26_ch_set = g0_char_set
-					elif ch_set_if == 2:
-						x26_ch_set = g2_char_set
-					elif ch_set_if == 24 and current_attr.display.und_sep == True:
-						x26_ch_set = 25
+			else:
+				x26_character = None
+			if x26_character != None:
+				x26_ch_code, x26_ch_set, x26_ch_diacritic = x26_character
+				# We'd modify x26_ch_set while in the middle of the if/elif
+				# Assign it to another variable just in case...
+				ch_set_if = x26_ch_set
+				if ch_set_if == 0:
+					x26_ch_set = g0_char_set
+				elif ch_set_if == 2:
+					x26_ch_set = g2_char_set
+				elif ch_set_if == 24 and current_attr.display & self.DISP_UND_SEP:
+					x26_ch_set = 25
+
+				self.ch_code[i] = x26_ch_code
+				self.ch_set[i] = x26_ch_set
+				if x26_ch_diacritic != None:
+					self.ch_diacritic[i] = x26_ch_diacritic
+
+			# Becomes true if this cell is covered by non-origin part of
+			# enlarged character
+			covered = False
+
+			# Check for the left half of a double-width or double-size character
+			# to the left and stretch it into this cell
+			if c > 0:
+				if self.frag[i-1] == self.Frag.DW_LEFTHALF:
+					self.copy_cell(i, i-1)
+					self.frag[i] = self.Frag.DW_RIGHTHALF
+					covered = True
+				elif self.frag[i-1] == self.Frag.DS_TOPLEFTQUARTER:
+					self.copy_cell(i, i-1)
+					self.frag[i] = self.Frag.DS_TOPRIGHTQUARTER
+					covered = True
 
-					self.cells[r][c].ch.ch_code = x26_ch_code
-					self.cells[r][c].ch.ch_set = x26_ch_set
-					if x26_ch_diacritic != None:
-						self.cells[r][c].ch.ch_diacritic = x26_ch_diacritic
-
-				# Becomes true if this cell is covered by non-origin part of
-				# enlarged character
-				covered = False
-
-				# Check for the left half of a double-width or double-size character
-				# to the left and stretch it into this cell
-				if c > 0:
-					if self.cells[r][c-1].frag == self.Frag.DW_LEFTHALF:
-						self.cells[r][c] = copy.deepcopy(self.cells[r][c-1])
-						self.cells[r][c].frag = self.Frag.DW_RIGHTHALF
-						covered = True
-					elif self.cells[r][c-1].frag == self.Frag.DS_TOPLEFTQUARTER:
-						self.cells[r][c] = copy.deepcopy(self.cells[r][c-1])
-						self.cells[r][c].frag = self.Frag.DS_TOPRIGHTQUARTER
-						covered = True
-
-				# Check for the top half of a double-height or double-size character
-				# above and stretch it into this cell
-				if (not covered) and r > 0:
-					prev_dheight = self.cells[r][c].attr.display.dheight
-					prev_dwidth = self.cells[r][c].attr.display.dwidth
-
-					if self.cells[r-1][c].frag == self.Frag.DH_TOPHALF:
-						self.cells[r][c] = copy.deepcopy(self.cells[r-1][c])
-						self.cells[r][c].frag = self.Frag.DH_BOTTOMHALF
-						covered = True
-					elif self.cells[r-1][c].frag == self.Frag.DS_TOPLEFTQUARTER:
-						self.cells[r][c] = copy.deepcopy(self.cells[r-1][c])
-						self.cells[r][c].frag = self.Frag.DS_BOTTOMLEFTQUARTER
-						covered = True
-					elif self.cells[r-1][c].frag == self.Frag.DS_TOPRIGHTQUARTER:
-						self.cells[r][c] = copy.deepcopy(self.cells[r-1][c])
-						self.cells[r][c].frag = self.Frag.DS_BOTTOMRIGHTQUARTER
-						covered = True
-
-					if covered:
-						self.cells[r][c].attr.display.dheight = prev_dheight
-						self.cells[r][c].attr.display.dwidth = prev_dwidth
-
-				# Handle bottom half of a Level 1 double height row
-				# where the character on the top half is single height
-				# X/26 characters can "punch through" this
-				if (not covered) and l1_bottom_half and x26_character == None:
-					self.cells[r][c] = copy.deepcopy(self.cells[r-1][c])
-					self.cells[r][c].frag = self.Frag.NORMALSIZE
-					self.cells[r][c].attr.display.dheight = False
-					self.cells[r][c].attr.display.dwidth = False
-					self.cells[r][c].ch.ch_code = 0x20
-					self.cells[r][c].ch.ch_set = 0
-					self.cells[r][c].ch.ch_diacritic = 0
+			# Check for the top half of a double-height or double-size character
+			# above and stretch it into this cell
+			if (not covered) and r > 0:
+				prev_size = self.display[i] & (self.DISP_DHEIGHT | self.DISP_DWIDTH)
+
+				if self.frag[i-72] == self.Frag.DH_TOPHALF:
+					self.copy_cell(i, i-72)
+					self.frag[i] = self.Frag.DH_BOTTOMHALF
+					covered = True
+				elif self.frag[i-72] == self.Frag.DS_TOPLEFTQUARTER:
+					self.copy_cell(i, i-72)
+					self.frag[i] = self.Frag.DS_BOTTOMLEFTQUARTER
+					covered = True
+				elif self.frag[i-72] == self.Frag.DS_TOPRIGHTQUARTER:
+					self.copy_cell(i, i-72)
+					self.frag[i] = self.Frag.DS_BOTTOMRIGHTQUARTER
 					covered = True
 
-				self.rotate_flash(current_attr.flash, c)
-
-				if not covered:
-					# Cell is NOT covered by enlarged character, so apply the attributes
-					self.cells[r][c].attr = copy.deepcopy(current_attr)
-					# If this character is the origin of an enlarged character
-					# adjust the size - the other cells of the enlarged character
-					# will be filled in on the next row or column loop
-					if current_attr.display.dheight:
-						if current_attr.display.dwidth:
-							self.cells[r][c].frag = self.Frag.DS_TOPLEFTQUARTER
-						else:
-							self.cells[r][c].frag = self.Frag.DH_TOPHALF
-					elif current_attr.display.dwidth:
-						self.cells[r][c].frag = self.Frag.DW_LEFTHALF
-
-				# Level 1 set-after spacing attributes
-				if c < 40 and (not l1_bottom_half):
-					if (l1_byte == 0x00 and allow_black_foreground) or (l1_byte >= 0x01 and l1_byte <= 0x07):  # Alphanumeric and foreground colour
-						l1_mosaics = False
-						l1_fground_col = l1_byte
-						current_attr.foreground = l1_fground_col | fground_map
-						current_attr.display.conceal = False
-						# Switch from mosaics to alpha resets held mosaic character
+				if covered:
+					self.display[i] = (self.display[i] & ~(self.DISP_DHEIGHT | self.DISP_DWIDTH)) | prev_size
+
+			# Handle bottom half of a Level 1 double height row
+			# where the character on the top half is single height
+			# X/26 characters can "punch through" this
+			if (not covered) and l1_bottom_half and x26_character == None:
+				self.copy_cell(i, i-72)
+				self.frag[i] = self.Frag.NORMALSIZE
+				self.display[i] &= ~(self.DISP_DHEIGHT | self.DISP_DWIDTH)
+				self.ch_code[i] = 0x20
+				self.ch_set[i] = 0
+				self.ch_diacritic[i] = 0
+				covered = True
+
+			current_attr = self.rotate_flash(current_attr, c)
+
+			if not covered:
+				# Cell is NOT covered by enlarged character, so apply the attributes
+				self.set_attr(i, current_attr)
+				# If this character is the origin of an enlarged character
+				# adjust the size - the other cells of the enlarged character
+				# will be filled in on the next row or column loop
+				if current_attr.display & self.DISP_DHEIGHT:
+					if current_attr.display & self.DISP_DWIDTH:
+						self.frag[i] = self.Frag.DS_TOPLEFTQUARTER
+					else:
+						self.frag[i] = self.Frag.DH_TOPHALF
+				elif current_attr.display & self.DISP_DWIDTH:
+					self.frag[i] = self.Frag.DW_LEFTHALF
+
+			# Level 1 set-after spacing attributes
+			if c < 40 and (not l1_bottom_half):
+				if (l1_byte == 0x00 and allow_black_foreground) or (l1_byte >= 0x01 and l1_byte <= 0x07):  # Alphanumeric and foreground colour
+					l1_mosaics = False
+					l1_fground_col = l1_byte
+					current_attr = self.attr_replace(current_attr, foreground=l1_fground_col | fground_map, display=current_attr.display & ~self.DISP_CONCEAL)
+					# Switch from mosaics to alpha resets held mosaic character
+					l1_hold_mosaic_ch = 0x20
+					l1_hold_mosaic_sep = False
+				elif (l1_byte == 0x10 and allow_black_foreground) or (l1_byte >= 0x11 and l1_byte <= 0x17):  # Mosaic and foreground colour
+					l1_mosaics = True
+					l1_fground_col = l1_byte & 0x07
+					current_attr = self.attr_replace(current_attr, foreground=l1_fground_col | fground_map, display=current_attr.display & ~self.DISP_CONCEAL)
+				elif l1_byte == 0x08:  # Flashing
+					current_attr = self.attr_replace(current_attr, fl_mode=1, fl_rate_phase=0)
+				elif l1_byte == 0x0d:  # Double height
+					if (current_attr.display & (self.DISP_DHEIGHT | self.DISP_DWIDTH)) != self.DISP_DHEIGHT:
+						# Change of size resets held mosaic character
 						l1_hold_mosaic_ch = 0x20
 						l1_hold_mosaic_sep = False
-					elif (l1_byte == 0x10 and allow_black_foreground) or (l1_byte >= 0x11 and l1_byte <= 0x17):  # Mosaic and foreground colour
-						l1_mosaics = True
-						l1_fground_col = l1_byte & 0x07
-						current_attr.foreground = l1_fground_col | fground_map
-						current_attr.display.conceal = False
-					elif l1_byte == 0x08:  # Flashing
-						current_attr.flash.fl_mode = 1
-						current_attr.flash.fl_rate_phase = 0
-					elif l1_byte == 0x0d:  # Double height
-						if (not current_attr.display.dheight) or current_attr.display.dwidth:
-							# Change of size resets held mosaic character
-							l1_hold_mosaic_ch = 0x20
-							l1_hold_mosaic_sep = False
-						current_attr.display.dheight = True
-						current_attr.display.dwidth = False
-						l1_dheight_found = True
-					elif l1_byte == 0x0e and allow_double_width:  # Double width
-						if current_attr.display.dheight or (not current_attr.display.dwidth):
-							# Change of size resets held mosaic character
-							l1_hold_mosaic_ch = 0x20
-							l1_hold_mosaic_sep = False
-						current_attr.display.dheight = False
-						current_attr.display.dwidth = True
-					elif l1_byte == 0x0f and allow_double_width:  # Double size
-						if (not current_attr.display.dheight) or (not current_attr.display.dwidth):
-							# Change of size resets held mosaic character
-							l1_hold_mosaic_ch = 0x20
-							l1_hold_mosaic_sep = False
-						current_attr.display.dheight = True
-						current_attr.display.dwidth = True
-						l1_dheight_found = True
-					elif l1_byte == 0x1b:  # ESC/switch
-						l1_escape_switch = not l1_escape_switch
-						if l1_escape_switch:
-							l1_char_set = l1_second_char_set
-						else:
-							l1_char_set = l1_default_char_set
-					elif l1_byte == 0x1f:  # Release mosaics
-						l1_hold_mosaics = False
+					current_attr = self.attr_replace(current_attr, display=(current_attr.display & ~self.DISP_DWIDTH) | self.DISP_DHEIGHT)
+					l1_dheight_found = True
+				elif l1_byte == 0x0e and allow_double_width:  # Double width
+					if (current_attr.display & (self.DISP_DHEIGHT | self.DISP_DWIDTH)) != self.DISP_DWIDTH:
+						# Change of size resets held mosaic character
+						l1_hold_mosaic_ch = 0x20
+						l1_hold_mosaic_sep = False
+					current_attr = self.attr_replace(current_attr, display=(current_attr.display & ~self.DISP_DHEIGHT) | self.DISP_DWIDTH)
+				elif l1_byte == 0x0f and allow_double_width:  # Double size
+					if (current_attr.display & (self.DISP_DHEIGHT | self.DISP_DWIDTH)) != (self.DISP_DHEIGHT | self.DISP_DWIDTH):
+						# Change of size resets held mosaic character
+						l1_hold_mosaic_ch = 0x20
+						l1_hold_mosaic_sep = False
+					current_attr = self.attr_replace(current_attr, display=current_attr.display | self.DISP_DHEIGHT | self.DISP_DWIDTH)
+					l1_dheight_found = True
+				elif l1_byte == 0x1b:  # ESC/switch
+					l1_escape_switch = not l1_escape_switch
+					if l1_escape_switch:
+						l1_char_set = l1_second_char_set
+					else:
+						l1_char_set = l1_default_char_set
+				elif l1_byte == 0x1f:  # Release mosaics
+					l1_hold_mosaics = False
+
+		self._row_flash[r] = self.flash_present
+		self.flash_present |= page_flash_present
 
-			if l1_bottom_half:
-				l1_bottom_half = False
-			if l1_dheight_found:
-				l1_bottom_half = True
-				l1_dheight_found = False
+		# The row below is the bottom half of a double height row if a
+		# double height attribute was found on this row
+		return self.RowState(full_row_down, l1_dheight_found, second_g0g2_region, second_g0g2_nos)
 
-		# At this point the Level 1 page, Active Objects and the Local Enhancement data
-		# has been fully rendered.
+
+	def decode_overlays(self):
+		'''
+		Overlays Adaptive and Passive Objects on top of the decoded rows.
+		'''
+		g2_default_char_set = self._settings.g2_default_char_set
 
 		# Overlay Adaptive Objects
 		for i in self.adp_invoc:
@@ -999,13 +1286,15 @@ class TeletextDecode:
 			covered = set()
 			for r in col_left:
 				# Each row in the Object does not influence any attributes to start with
-				adp_attr = self.Attribute()
+				adp_attr = self.intern_attr(self.Attribute())
 				# This will store which attribute types have changed so far in this row
 				changes = set()
 
 				for c in range(col_left[r], col_right[r] + 1):
+					g = r * 72 + c
 					if (r, c) in i.enhancements.keys():
-						changes.update(self.parse_attr_enhancements(i.enhancements[(r, c)], adp_attr))
+						adp_attr, adp_changes = self.parse_attr_enhancements(i.enhancements[(r, c)], adp_attr)
+						changes.update(adp_changes)
 						x26_character = self.parse_char_enhancements(i.enhancements[(r, c)])
 					else:
 						x26_character = None
@@ -1014,24 +1303,26 @@ class TeletextDecode:
 					# Otherwise it can only change an enlarged character by overwriting
 					# a character on the origin cell only
 					if 0x2c in changes:
-						self.cells[r][c].attr.display = copy.deepcopy(adp_attr.display)
+						self.display[g] = adp_attr.display
 						if not (r, c) in covered:
 							self.enlarge_char(r, c, covered)
-					elif self.cells[r][c].frag == self.Frag.DW_RIGHTHALF or self.cells[r][c].frag == self.Frag.DS_TOPRIGHTQUARTER:
+					elif self.frag[g] == self.Frag.DW_RIGHTHALF or self.frag[g] == self.Frag.DS_TOPRIGHTQUARTER:
 						covered.add((r, c))
 
 					if not (r, c) in covered:
 						# Apply attributes that the Object has changed in this row so far
 						any_change = False
 						if 0x20 in changes:  # Foreground colour
-							self.cells[r][c].attr.foreground = adp_attr.foreground
+							self.foreground[g] = adp_attr.foreground
 							any_change = True
 						if 0x23 in changes:  # Background colour
-							self.cells[r][c].attr.background = adp_attr.background
+							self.background[g] = adp_attr.background
 							any_change = True
 						if 0x27 in changes:  # Additional flash functions
-							self.rotate_flash(adp_attr.flash, c)
-							self.cells[r][c].attr.flash = copy.deepcopy(adp_attr.flash)
+							adp_attr = self.rotate_flash(adp_attr, c)
+							self.fl_mode[g] = adp_attr.fl_mode
+							self.fl_rate_phase[g] = adp_attr.fl_rate_phase
+							self.fl_phase_shown[g] = adp_attr.fl_phase_shown
 							any_change = True
 						if any_change:
 							# Spread attributes to neighbouring cells of enlarged character
@@ -1042,14 +1333,14 @@ class TeletextDecode:
 						x26_ch_code, x26_ch_set, x26_ch_diacritic = x26_character
 						if x26_ch_set == 2:
 							x26_ch_set = g2_default_char_set
-						elif x26_ch_set == 24 and adp_attr.display.und_sep:
+						elif x26_ch_set == 24 and adp_attr.display & self.DISP_UND_SEP:
 							x26_ch_set = 25
-						self.cells[r][c].ch.ch_code = x26_ch_code
-						self.cells[r][c].ch.ch_set = x26_ch_set
+						self.ch_code[g] = x26_ch_code
+						self.ch_set[g] = x26_ch_set
 						if x26_ch_diacritic != None:
-							self.cells[r][c].ch.ch_diacritic = x26_ch_diacritic
+							self.ch_diacritic[g] = x26_ch_diacritic
 						else:
-							self.cells[r][c].ch_ch_diacritic = 0
+							self.ch_diacritic[g] = 0
 						self.enlarge_char(r, c, covered)
 
 				del adp_attr
@@ -1060,45 +1351,149 @@ class TeletextDecode:
 			# covered by non-origin parts of all enlarged characters in this Object
 			covered = set()
 			# Passive Objects always start with default attributes
-			pas_attr = self.Attribute()
+			pas_attr = self.intern_attr(self.Attribute())
 			for l, e in i.enhancements.items():
-				self.parse_attr_enhancements(e, pas_attr)
+				pas_attr, _ = self.parse_attr_enhancements(e, pas_attr)
 				x26_character = self.parse_char_enhancements(e)
 				if x26_character != None and not l in covered:
 					x26_ch_code, x26_ch_set, x26_ch_diacritic = x26_character
 					if x26_ch_set == 2:
 						x26_ch_set = g2_default_char_set
-					elif x26_ch_set == 24 and pas_attr.display.und_sep:
+					elif x26_ch_set == 24 and pas_attr.display & self.DISP_UND_SEP:
 						x26_ch_set = 25
 					r, c = l
+					g = r * 72 + c
 					# Attributes in a Passive Object are always parsed but are only
 					# applied to cells where the Object places a character
-					self.rotate_flash(pas_attr.flash, c)
-					self.cells[r][c].attr = copy.deepcopy(pas_attr)
-					self.cells[r][c].ch.ch_code = x26_ch_code
-					self.cells[r][c].ch.ch_set = x26_ch_set
+					pas_attr = self.rotate_flash(pas_attr, c)
+					self.set_attr(g, pas_attr)
+					self.ch_code[g] = x26_ch_code
+					self.ch_set[g] = x26_ch_set
 					if x26_ch_diacritic != None:
-						self.cells[r][c].ch.ch_diacritic = x26_ch_diacritic
+						self.ch_diacritic[g] = x26_ch_diacritic
 					else:
-						self.cells[r][c].ch_ch_diacritic = 0
+						self.ch_diacritic[g] = 0
 					self.enlarge_char(r, c, covered)
 
 			del pas_attr
 
-	def transparent(self, r, c):
+	def to_bytes(self):
 		'''
-		Find which colour of a cell that results from CLUT 1:0 "transparent"
-		using the logic table in C.1 of the ETSI spec.
-		Returns either the colour index, or 8 if video will show through.
+		Serializes the decoded page into bytes which can be restored with from_bytes().
 		'''
-		transparent_page = (self.status_bits & 0x03) != 0x00
+		header = self._header_struct.pack(self.status_bits, self.full_screen, self.left_side_panel, self.right_side_panel, self.flash_present, *self.full_row, *self._palette)
+		return header + b''.join(self._planes + (self.res_foreground, self.res_background, self.res_flash_foreground))
 
-		if self.cells[r][c].attr.display.box_win != transparent_page:
-			return 8
+	def decoded_page(self):
+		'''
+		Returns a DecodedPage holding a copy of the page in this decoder.
+		'''
+		return DecodedPage(self.to_bytes())
 
-		if self.cells[r][c].frag == self.Frag.DH_BOTTOMHALF or self.cells[r][c].frag == self.Frag.DS_BOTTOMLEFTQUARTER or self.cells[r][c].frag == self.Frag.DS_BOTTOMRIGHTQUARTER:
-			row_colour = self.full_row[r-1]
+	def from_bytes(self, data):
+		'''
+		Restores a decoded page serialized by to_bytes() into this decoder, as if
+		the page had been decoded. The status bits of this decoder are kept, and
+		not taken from the data. Raises ValueError if the data is not valid.
+		'''
+		if len(data) != self._serialized_size:
+			raise ValueError('Serialized page has wrong length')
+
+		header = self._header_struct.unpack_from(data)
+		self.full_screen, self.left_side_panel, self.right_side_panel, self.flash_present = header[1:5]
+		self.full_row = list(header[5:30])
+		self._palette = list(header[30:62])
+
+		offset = self._header_struct.size
+		for p in self._planes:
+			p[:] = data[offset:offset + 25 * 72]
+			offset += 25 * 72
+
+		# There are no packets or Objects behind this page to decode incrementally from
+		self.act_invoc = []
+		self.adp_invoc = []
+		self.pas_invoc = []
+		self._last_options = None
+		self.decoded_rows = set(range(25))
+
+		# The colours in the data were resolved with its status bits, so can
+		# only be used if they make the page transparent in the same way
+		if (header[0] ^ self.status_bits) & 0x03:
+			self.res_foreground, self.res_background, self.res_flash_foreground = self.resolve_colours()
 		else:
-			row_colour = self.full_row[r]
+			for n in self.res_plane_names:
+				setattr(self, n, bytearray(data[offset:offset + 25 * 72]))
+				offset += 25 * 72
+
+class DecodedPage(TeletextPage):
+	'''
+	An immutable decoded page as returned by TeletextDecode.decode() with
+	snapshot=True, which can be passed to a renderer in place of the decoder.
+
+	The page is held in one bytes buffer in the same form as TeletextDecode.to_bytes(),
+	so it pickles cheaply and the planes are read-only memoryviews into the buffer.
+	'''
+	def __init__(self, data):
+		data = bytes(data)
+		if len(data) != self._serialized_size:
+			raise ValueError('Serialized page has wrong length')
+
+		header = self._header_struct.unpack_from(data)
+		view = memoryview(data)
+		offset = self._header_struct.size
+		planes = []
+		for n in self.plane_names:
+			planes.append(view[offset:offset + 25 * 72])
+			object.__setattr__(self, n, planes[-1])
+			offset += 25 * 72
+		# The colours were resolved when the page was decoded
+		for n in self.res_plane_names:
+			object.__setattr__(self, n, view[offset:offset + 25 * 72])
+			offset += 25 * 72
+
+		object.__setattr__(self, '_data', data)
+		object.__setattr__(self, 'planes', tuple(planes))
+		object.__setattr__(self, 'status_bits', header[0])
+		object.__setattr__(self, 'full_screen', header[1])
+		object.__setattr__(self, 'left_side_panel', header[2])
+		object.__setattr__(self, 'right_side_panel', header[3])
+		object.__setattr__(self, 'flash_present', header[4])
+		object.__setattr__(self, 'full_row', header[5:30])
+		object.__setattr__(self, '_palette', header[30:62])
+
+	def __setattr__(self, name, value):
+		raise AttributeError('DecodedPage is immutable')
+
+	def __delattr__(self, name):
+		raise AttributeError('DecodedPage is immutable')
+
+	def __reduce__(self):
+		return (DecodedPage, (self._data,))
+
+	def __eq__(self, other):
+		if not isinstance(other, DecodedPage):
+			return NotImplemented
+		return self._data == other._data
+
+	def __hash__(self):
+		return hash(self._data)
+
+	def to_bytes(self):
+		'''
+		Returns the serialized page, which can be restored with TeletextDecode.from_bytes().
+		'''
+		return self._data
 
-		return row_colour
+	def with_status_bits(self, status_bits):
+		'''
+		Returns a copy of this page with other status bits. The colours shown in
+		each cell are resolved again if the status bits make the page transparent
+		in a different way.
+		'''
+		header = list(self._header_struct.unpack_from(self._data))
+		header[0] = status_bits
+		page = DecodedPage(self._header_struct.pack(*header) + self._data[self._header_struct.size:])
+		if (status_bits ^ self.status_bits) & 0x03:
+			grid_size = self._header_struct.size + len(self.plane_names) * 25 * 72
+			page = DecodedPage(page._data[:grid_size] + b''.join(page.resolve_colours()))
+		return page
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+# Fonts and rasterized glyphs shared by the renderers
+#
+# Fonts are loaded from teletextimager.font-etsi the first time they are needed
+# and kept for the life of the process, as are the 12x20 glyph masks made from
+# them. Call preload() to pay that cost up front, for example when a worker
+# process starts. Everything here is safe to use from several threads at once.
+
+from array import array
+from collections import OrderedDict
+import sys
+import threading
+if sys.version_info < (3, 10):
+	from importlib_resources import files
+else:
+	from importlib.resources import files
+from PIL import Image, ImageFont, ImageDraw
+
+from teletextimager import teletextdecoder
+
+font_width = 12
+font_height = 20
+
+font_filename = [
+	# 0 - Latin G0 character set placed by X/26 enhancement
+	'G0_latin',
+	# 1-6 - Non-Latin G0 character sets
+	'G0_sr_hr',  'G0_ru_bg', 'G0_uk', 'G0_el', 'G0_ar', 'G0_he',
+	# 7-10 - G2 character sets
+	'G2_latin', 'G2_cyr', 'G2_el', 'G2_ar',
+	# 11-23 - Latin G0 sets with NOS
+	'G0_NOS_cs_sk', 'G0_NOS_en', 'G0_NOS_et', 'G0_NOS_fr', 'G0_NOS_de', 'G0_NOS_it', 'G0_NOS_lv_lt',
+	'G0_NOS_pl', 'G0_NOS_pt_es', 'G0_NOS_ro', 'G0_NOS_sr_hr_sl', 'G0_NOS_sv_fi_hu', 'G0_NOS_tr',
+	# 24-26 - G1 and G3 mosaics sets
+	'G1_con', 'G1_sep', 'G3',
+	# 27 - G0 reduced height for diacriticals
+	'G0_reduced'
+]
+
+Frag = teletextdecoder.TeletextPage.Frag
+
+# For each fragment, the size to enlarge a character to and the
+# position of the fragment within the enlarged character
+fragment_crop = {
+	Frag.DH_TOPHALF: ((12, 40), (0, 0)),
+	Frag.DH_BOTTOMHALF: ((12, 40), (0, 20)),
+	Frag.DW_LEFTHALF: ((24, 20), (0, 0)),
+	Frag.DW_RIGHTHALF: ((24, 20), (12, 0)),
+	Frag.DS_TOPLEFTQUARTER: ((24, 40), (0, 0)),
+	Frag.DS_TOPRIGHTQUARTER: ((24, 40), (12, 0)),
+	Frag.DS_BOTTOMLEFTQUARTER: ((24, 40), (0, 20)),
+	Frag.DS_BOTTOMRIGHTQUARTER: ((24, 40), (12, 20))
+}
+
+# Most enlarged character fragments to keep, see fragment_glyph()
+fragment_cache_size = 4096
+# Most glyphs scaled by a pattern to keep, see glyph()
+scaled_glyph_cache_size = 4096
+# Most column maps to keep, see column_map()
+column_map_cache_size = 64
+
+# Shared by every glyph and fragment that has no pixels set, so renderers can
+# skip them by checking "mask is blank_mask". It must not be changed.
+blank_mask = Image.new(mode='L', size=(font_width, font_height))
+
+_fonts = [None] * len(font_filename)
+# Atlas of glyph masks, see glyph()
+_glyphs = {}
+# Recently used glyphs scaled by a pattern, see glyph()
+_scaled_glyphs = OrderedDict()
+# Recently used fragments of enlarged characters, see fragment_glyph()
+_fragments = OrderedDict()
+# Recently used column maps, see column_map()
+_column_maps = OrderedDict()
+# Translation tables to sixels, see sixel_table() and fragment_sixel_table()
+_sixel_tables = {}
+_fragment_sixel_tables = {}
+# Held while loading fonts and adding to the caches. Looking up a glyph that
+# is already in the atlas doesn't need it.
+_lock = threading.RLock()
+
+def load_font(n):
+	'''
+	Returns font n from font_filename, loading it if it hasn't been loaded yet.
+	'''
+	font = _fonts[n]
+	if font == None:
+		with _lock:
+			if _fonts[n] == None:
+				font_path = files('teletextimager.font-etsi').joinpath(font_filename[n] + '.pil')
+				_fonts[n] = ImageFont.load(font_path)
+			font = _fonts[n]
+	return font
+
+def _scale(mask, pattern):
+	'''
+	Returns a mask made of the columns of a 12x20 mask listed in pattern.
+	'''
+	if mask is blank_mask:
+		return mask
+
+	scaled_mask = Image.new(mode='L', size=(len(pattern), font_height))
+	# Copy each run of neighbouring columns at once
+	start = 0
+	for x in range(1, len(pattern) + 1):
+		if x == len(pattern) or pattern[x] != pattern[x - 1] + 1:
+			scaled_mask.paste(mask.crop((pattern[start], 0, pattern[x - 1] + 1, font_height)), (start, 0))
+			start = x
+	return scaled_mask
+
+def glyph(char_set, char_code, char_diacritic=0, underline=False, pattern=None):
+	'''
+	Returns a 12x20 mask of the pixels set in a character cell by a character,
+	with a G2 diacritical mark and underline if asked for. Each mask is
+	rasterized from the fonts once and then kept in the atlas.
+
+	If pattern is given the mask is made of the columns of the 12x20 mask
+	that it lists instead, for drawing a cell whose width has been scaled.
+	There can be any number of patterns so only the most recently used of
+	these masks are kept, as fragment_glyph() does.
+	'''
+	if pattern != None:
+		key = (char_set, char_code, char_diacritic, underline, pattern)
+		with _lock:
+			mask = _scaled_glyphs.get(key)
+			if mask != None:
+				_scaled_glyphs.move_to_end(key)
+				return mask
+
+			mask = _scale(glyph(char_set, char_code, char_diacritic, underline), pattern)
+			_scaled_glyphs[key] = mask
+			while len(_scaled_glyphs) > scaled_glyph_cache_size:
+				_scaled_glyphs.popitem(last=False)
+			return mask
+
+	key = (char_set, char_code, char_diacritic, underline)
+	mask = _glyphs.get(key)
+	if mask == None:
+		with _lock:
+			mask = _glyphs.get(key)
+			if mask == None:
+				mask = Image.new(mode='L', size=(font_width, font_height))
+				mask_draw = ImageDraw.Draw(mask)
+				if char_code != 0x00:
+					mask_draw.text((0, 0), chr(char_code), 255, font=load_font(char_set))
+				if char_diacritic != 0:
+					# Diacritical marks come from the G2 Latin set
+					mask_draw.text((0, 0), chr(char_diacritic + 0x40), 255, font=load_font(7))
+				if underline:
+					mask_draw.rectangle([0, font_height - 2, font_width - 1, font_height - 1], 255)
+				if mask.getbbox() == None:
+					mask = blank_mask
+				_glyphs[key] = mask
+	return mask
+
+def fragment_glyph(char_set, char_code, char_diacritic, fragment, underline=False, pattern=None):
+	'''
+	Returns a 12x20 mask of the part of an enlarged character that is shown
+	in one cell, given by a Frag fragment, scaled by pattern as glyph() does.
+
+	The masks don't depend on colour so they are shared by every cell, flash
+	phase and page showing the same fragment, and the most recently used of
+	them are kept.
+	'''
+	key = (char_set, char_code, char_diacritic, fragment, underline, pattern)
+	with _lock:
+		mask = _fragments.get(key)
+		if mask != None:
+			_fragments.move_to_end(key)
+			return mask
+
+		if pattern != None:
+			mask = _scale(fragment_glyph(char_set, char_code, char_diacritic, fragment, underline), pattern)
+			_fragments[key] = mask
+			while len(_fragments) > fragment_cache_size:
+				_fragments.popitem(last=False)
+			return mask
+
+		size, origin = fragment_crop[fragment]
+		mask = glyph(char_set, char_code, char_diacritic).resize(size, resample=Image.Resampling.NEAREST)
+		mask = mask.crop((origin[0], origin[1], origin[0] + font_width, origin[1] + font_height))
+
+		# The underline is not enlarged, and is thicker on the bottom half of
+		# double height characters
+		if underline and fragment != Frag.DH_TOPHALF and fragment != Frag.DS_TOPLEFTQUARTER and fragment != Frag.DS_TOPRIGHTQUARTER:
+			if fragment == Frag.DH_BOTTOMHALF or fragment == Frag.DS_BOTTOMLEFTQUARTER or fragment == Frag.DS_BOTTOMRIGHTQUARTER:
+				mask.paste(255, (0, font_height - 3, font_width, font_height))
+			else:
+				mask.paste(255, (0, font_height - 2, font_width, font_height))
+
+		if mask.getbbox() == None:
+			mask = blank_mask
+		_fragments[key] = mask
+		while len(_fragments) > fragment_cache_size:
+			_fragments.popitem(last=False)
+		return mask
+
+def column_map(width, scaled_width):
+	'''
+	Returns a tuple giving, for each column of an image that is width pixels
+	wide scaled to scaled_width pixels wide, the column of the unscaled image
+	that it shows. These are the same columns that a nearest neighbour resize
+	of the whole image would pick.
+
+	The widths come from whatever scale callers ask for, so only the most
+	recently used maps are kept.
+	'''
+	key = (width, scaled_width)
+	with _lock:
+		result = _column_maps.get(key)
+		if result != None:
+			_column_maps.move_to_end(key)
+			return result
+
+	# Let PIL resize an image of column numbers so its rounding is matched exactly
+	index_im = Image.frombytes('I', (width, 1), array('i', range(width)).tobytes())
+	index_im = index_im.resize((scaled_width, 1), resample=Image.Resampling.NEAREST)
+	result = tuple(array('i', index_im.tobytes()))
+	with _lock:
+		_column_maps[key] = result
+		while len(_column_maps) > column_map_cache_size:
+			_column_maps.popitem(last=False)
+	return result
+
+def sixel_table(char_set):
+	'''
+	Returns a table to translate the codes of characters in a character set
+	to which of the six sixels of a 2x3 block they set, as bits 0 to 5 for
+	the top left, top right, middle left, middle right, bottom left and
+	bottom right sixels.
+
+	Block mosaics set the sixels they are made of and smooth mosaics the
+	sixels they mostly cover. Other characters are shown as a bar across
+	the middle of the block.
+	'''
+	table = _sixel_tables.get(char_set)
+	if table == None:
+		with _lock:
+			if char_set == 24 or char_set == 25:
+				# Bits 0 to 4 and 6 of the character code, blast through characters as text
+				table = bytes((c & 0x1f) | ((c & 0x40) >> 1) if c & 0x20 else 0x0c if c >= 0x40 else 0x00 for c in range(256))
+			elif char_set == 26:
+				table = bytearray(256)
+				for c in range(0x20, 0x80):
+					pixels = glyph(char_set, c).tobytes()
+					for k in range(6):
+						y0, y1 = ((0, 7), (7, 14), (14, 20))[k >> 1]
+						x0 = (k & 1) * 6
+						covered = sum(1 for y in range(y0, y1) for x in range(x0, x0 + 6) if pixels[y * font_width + x])
+						if covered * 2 >= (y1 - y0) * 6:
+							table[c] |= 1 << k
+				table = bytes(table)
+			else:
+				table = bytes(0x00 if c == 0x00 or c == 0x20 else 0x0c for c in range(256))
+			_sixel_tables[char_set] = table
+	return table
+
+def fragment_sixel_table(fragment):
+	'''
+	Returns a table to translate the sixels of a character, see
+	sixel_table(), to the sixels of the part of it shown in one cell when it
+	is enlarged, given by a Frag fragment.
+	'''
+	table = _fragment_sixel_tables.get(fragment)
+	if table == None:
+		size, origin = fragment_crop[fragment]
+		table = bytearray(256)
+		for sixels in range(64):
+			for k in range(6):
+				x = k & 1
+				y = k >> 1
+				if size[0] == 24:
+					x = (x + origin[0] // 6) // 2
+				if size[1] == 40:
+					y = (y + origin[1] // 20 * 3) // 2
+				if sixels & (1 << (y * 2 + x)):
+					table[sixels] |= 1 << k
+		table = bytes(table)
+		with _lock:
+			_fragment_sixel_tables[fragment] = table
+	return table
+
+def preload(char_sets=None):
+	'''
+	Loads the fonts for the listed character sets, or all of them, and
+	rasterizes their printable characters into the glyph atlas.
+	'''
+	if char_sets == None:
+		char_sets = range(len(font_filename))
+
+	for char_set in char_sets:
+		load_font(char_set)
+		for char_code in range(0x20, 0x80):
+			glyph(char_set, char_code)
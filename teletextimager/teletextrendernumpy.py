@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict, namedtuple
+import threading
+
+import numpy as np
+from PIL import Image
+
+from teletextimager import teletextdecoder, teletextfonts
+
+Frag = teletextdecoder.TeletextPage.Frag
+
+# Most glyph masks to keep, see _mask()
+mask_cache_size = 4096
+
+# Recently used glyph masks as boolean arrays, keyed the same way as the
+# packed keys made in draw()
+_masks = OrderedDict()
+# Held while looking up and adding to _masks
+_lock = threading.Lock()
+
+def _mask(key):
+	with _lock:
+		mask = _masks.get(key)
+		if mask is not None:
+			_masks.move_to_end(key)
+			return mask
+
+		underline = (key & 1) != 0
+		fragment = (key >> 1) & 0xf
+		char_diacritic = (key >> 5) & 0xf
+		char_code = (key >> 9) & 0xff
+		char_set = key >> 17
+		if fragment != Frag.NORMALSIZE:
+			mask_im = teletextfonts.fragment_glyph(char_set, char_code, char_diacritic, Frag(fragment), underline)
+		else:
+			mask_im = teletextfonts.glyph(char_set, char_code, char_diacritic, underline)
+		mask = np.asarray(mask_im) != 0
+		_masks[key] = mask
+		while len(_masks) > mask_cache_size:
+			_masks.popitem(last=False)
+		return mask
+
+class TeletextRenderNumPy:
+	'''
+	Renders the same images as TeletextRenderPIL, but builds the whole page as
+	one NumPy array instead of drawing it cell by cell. Needs NumPy to be installed.
+	'''
+	# What render_into() returns: the size of the image written and the stride used
+	RenderInfo = namedtuple('RenderInfo', ['width', 'height', 'stride'])
+
+	def render(self, decoder, border=(80, 38), flash_phase=0, reveal=False, hscale=1):
+		'''
+		Renders a decoded page into a palette image. decoder can be either a
+		DecodedPage or a TeletextDecode instance that has decoded a page.
+		hscale scales the width of the image as TeletextRenderPIL.render() does.
+		'''
+		pixels = self.render_pixels(decoder, border, flash_phase, reveal, hscale)
+
+		im = Image.frombuffer('P', (pixels.shape[1], pixels.shape[0]), pixels.tobytes(), 'raw', 'P', 0, 1)
+
+		im.putpalette(decoder.get_palette(), rawmode='RGB')
+		im.info.update( { "transparency": 8 } )
+
+		return im
+
+	def render_into(self, decoder, buffer, stride=None, offset=0, border=(80, 38), flash_phase=0, reveal=False, hscale=1):
+		'''
+		Renders a decoded page as 8-bit palette indexes straight into a writable
+		buffer such as a bytearray, memoryview, mmap or NumPy array, for use
+		with the palette from decoder.get_palette().
+
+		Rows of the image start stride bytes apart from offset bytes into the
+		buffer. stride defaults to the width of the image, see image_size().
+		A two dimensional NumPy array is written to from its top left corner
+		and stride and offset are ignored.
+
+		The borders and cells are drawn into the buffer without building the
+		image anywhere else first. Returns a RenderInfo.
+		'''
+		width, height = self.image_size(decoder, border, hscale)
+
+		if isinstance(buffer, np.ndarray) and buffer.ndim == 2:
+			if buffer.shape[0] < height or buffer.shape[1] < width:
+				raise ValueError('Array is too small for the image')
+			view = buffer[:height, :width]
+			stride = buffer.strides[0]
+		else:
+			if stride == None:
+				stride = width
+			if stride < width:
+				raise ValueError('Stride is less than the width of the image')
+			flat = np.frombuffer(buffer, dtype=np.uint8)
+			if offset < 0 or offset + (height - 1) * stride + width > flat.size:
+				raise ValueError('Buffer is too small for the image')
+			view = np.lib.stride_tricks.as_strided(flat[offset:], shape=(height, width), strides=(stride, 1))
+
+		if not view.flags.writeable:
+			raise ValueError('Buffer is not writable')
+
+		self.draw(decoder, view, border, flash_phase, reveal, hscale)
+		return self.RenderInfo(width, height, stride)
+
+	@staticmethod
+	def image_size(decoder, border=(80, 38), hscale=1):
+		'''
+		Returns the width and height of the image that a decoded page renders to.
+		'''
+		if type(border) is tuple:
+			border_lr, border_tb = border
+		else:
+			border_lr = border
+			border_tb = border
+
+		return (int((teletextfonts.font_width * (40 + decoder.left_side_panel + decoder.right_side_panel) + border_lr * 2) * hscale), teletextfonts.font_height * 25 + border_tb * 2)
+
+	def render_pixels(self, decoder, border=(80, 38), flash_phase=0, reveal=False, hscale=1):
+		'''
+		Renders a decoded page into a two dimensional NumPy array of palette indexes.
+		'''
+		width, height = self.image_size(decoder, border, hscale)
+		pixels = np.empty((height, width), dtype=np.uint8)
+		self.draw(decoder, pixels, border, flash_phase, reveal, hscale)
+		return pixels
+
+	def draw(self, decoder, view, border=(80, 38), flash_phase=0, reveal=False, hscale=1):
+		'''
+		Draws a decoded page into view, a two dimensional NumPy array of palette
+		indexes the size given by image_size(), one block at a time: the top and
+		bottom borders, the left and right borders and then the cells.
+		'''
+		font_width = teletextfonts.font_width
+		font_height = teletextfonts.font_height
+
+		if type(border) is tuple:
+			border_lr, border_tb = border
+		else:
+			border_lr = border
+			border_tb = border
+
+		def plane(p):
+			return np.frombuffer(p, dtype=np.uint8).reshape(25, 72)
+
+		ch_code = plane(decoder.ch_code).astype(np.int32)
+		ch_set = plane(decoder.ch_set).astype(np.int32)
+		ch_diacritic = plane(decoder.ch_diacritic).astype(np.int32)
+		fl_mode = plane(decoder.fl_mode)
+		fl_rate_phase = plane(decoder.fl_rate_phase)
+		fl_phase_shown = plane(decoder.fl_phase_shown).astype(np.int32)
+		display = plane(decoder.display)
+		frag = plane(decoder.frag).astype(np.int32)
+		und_sep = (display & decoder.DISP_UND_SEP) != 0
+
+		# Concealed characters are shown as spaces
+		if not reveal:
+			conceal = (display & decoder.DISP_CONCEAL) != 0
+			ch_code = np.where(conceal, 0x20, ch_code)
+			ch_set = np.where(conceal, 0, ch_set)
+			ch_diacritic = np.where(conceal, 0, ch_diacritic)
+
+		invert = (display & decoder.DISP_INVERT) != 0
+		foreground = np.where(invert, plane(decoder.res_background), plane(decoder.res_foreground))
+		background = np.where(invert, plane(decoder.res_foreground), plane(decoder.res_background))
+
+		# Decide if the flashing cells are on or off in this phase
+		flash_phon = np.where(
+			fl_rate_phase == 0,
+			flash_phase < 3,
+			(fl_phase_shown - 1 == flash_phase) | (fl_phase_shown + 2 == flash_phase)
+		) ^ (fl_mode == 2)
+		flash_off = (fl_mode != 0) & ~flash_phon
+
+		# Flashing to adjacent CLUT selects the other foreground colour
+		foreground = np.where(flash_off & (fl_mode == 3), plane(decoder.res_flash_foreground), foreground)
+
+		# Flashing modes Normal and Invert draw a space without underline
+		blank = flash_off & ((fl_mode == 1) | (fl_mode == 2))
+		shown_code = np.where(blank, 0, ch_code)
+		shown_set = np.where(blank, 0, ch_set)
+		shown_diacritic = np.where(blank, 0, ch_diacritic)
+
+		# Cells that are enlarged or have diacritical marks are underlined
+		# according to their original character set, others according to the set shown
+		enlarged = (frag != Frag.NORMALSIZE) | (shown_diacritic != 0)
+		underline = (shown_code != 0) & und_sep & (np.where(enlarged, plane(decoder.ch_set), shown_set) < 24)
+
+		# Capital letters with G0 diacritical marks have a reduced height
+		shown_set = np.where((shown_diacritic != 0) & (shown_code >= 0x41) & (shown_code <= 0x5a), 27, shown_set)
+
+		# Which columns of the grid are shown, from left to right: the left side
+		# panel from columns 56-71, then the main page and the right side panel
+		columns = list(range(72 - decoder.left_side_panel, 72)) + list(range(40 + decoder.right_side_panel))
+
+		keys = (shown_set << 17) | (shown_code << 9) | (shown_diacritic << 5) | (frag << 1) | underline
+		keys = keys[:, columns]
+		unique_keys, inverse = np.unique(keys, return_inverse=True)
+		atlas = np.stack([_mask(int(k)) for k in unique_keys])
+		# From rows, columns, pixel rows, pixel columns to rows, pixel rows, columns, pixel columns
+		masks = atlas[inverse.reshape(keys.shape)].transpose(0, 2, 1, 3)
+
+		page_width = len(columns) * font_width
+		im_width = page_width + border_lr * 2
+		height, width = view.shape
+
+		# Scale the width by picking the columns a nearest neighbour resize would.
+		# The columns picked from the left border, page and right border are
+		# each a run of columns in view.
+		if width != im_width:
+			source = np.array(teletextfonts.column_map(im_width, width))
+		else:
+			source = np.arange(im_width)
+		page_start, page_end = np.searchsorted(source, (border_lr, border_lr + page_width))
+		page_start = int(page_start)
+		page_end = int(page_end)
+
+		# Top and bottom Full Screen Colours and left and right Full Row Colours
+		view[:border_tb] = decoder.full_screen
+		view[height - border_tb:] = decoder.full_screen
+		rows = view[border_tb:height - border_tb]
+		full_row = np.repeat(np.array(decoder.full_row, dtype=np.uint8), font_height)[:, None]
+		rows[:, :page_start] = full_row
+		rows[:, page_end:] = full_row
+
+		# The cells as rows, pixel rows and pixel columns, drawn with the
+		# background colour and then the foreground colour through the masks
+		cells = rows[:, page_start:page_end]
+		cells = np.lib.stride_tricks.as_strided(cells, shape=(25, font_height, cells.shape[1]), strides=(cells.strides[0] * font_height, cells.strides[0], cells.strides[1]))
+		x = source[page_start:page_end] - border_lr
+		cell_x = x // font_width
+		cell_columns = np.array(columns)[cell_x]
+		np.copyto(cells, background[:, None, cell_columns])
+		np.copyto(cells, foreground[:, None, cell_columns], where=masks[:, :, cell_x, x % font_width])
@@ -1,14 +1,10 @@
 #!/usr/bin/env python3
 
+from bisect import bisect_left
 from enum import Enum
-import sys
-if sys.version_info < (3, 10):
-	from importlib_resources import files
-else:
-	from importlib.resources import files
-from PIL import Image, ImageFont, ImageDraw
+from PIL import Image, ImageDraw
 
-from teletextimager import teletextdecoder
+from teletextimager import teletextdecoder, teletextfonts
 
 class TeletextRenderPIL:
 #	def __init__(self):
@@ -17,29 +13,24 @@ class TeletextRenderPIL:
 #		self.border_lr = 80
 #		self.border_tb = 38
 
-	def render(self, decoder, border=(80, 38), flash_phase=0, reveal=False):
-		self.tt_font = [None] * 28
-
-		def load_font(n):
-			font_filename = [
-				# 0 - Latin G0 character set placed by X/26 enhancement
-				'G0_latin',
-				# 1-6 - Non-Latin G0 character sets
-				'G0_sr_hr',  'G0_ru_bg', 'G0_uk', 'G0_el', 'G0_ar', 'G0_he',
-				# 7-10 - G2 character sets
-				'G2_latin', 'G2_cyr', 'G2_el', 'G2_ar',
-				# 11-23 - Latin G0 sets with NOS
-				'G0_NOS_cs_sk', 'G0_NOS_en', 'G0_NOS_et', 'G0_NOS_fr', 'G0_NOS_de', 'G0_NOS_it', 'G0_NOS_lv_lt',
-				'G0_NOS_pl', 'G0_NOS_pt_es', 'G0_NOS_ro', 'G0_NOS_sr_hr_sl', 'G0_NOS_sv_fi_hu', 'G0_NOS_tr',
-				# 24-26 - G1 and G3 mosaics sets
-				'G1_con', 'G1_sep', 'G3',
-				# 27 - G0 reduced height for diacriticals
-				'G0_reduced'
-			]
-			if self.tt_font[n] == None:
-				font_path = files('teletextimager.font-etsi').joinpath(font_filename[n] + '.pil')
-				self.tt_font[n] = ImageFont.load(font_path)
+	# Translation tables used by render_preview() to turn planes of a decoded
+	# page into masks of 0xff where something is true and 0x00 where it isn't
+	_equal_masks = tuple(bytes(0xff if i == n else 0x00 for i in range(256)) for n in range(32))
+	_nonzero_mask = bytes(0x00 if i == 0 else 0xff for i in range(256))
+	_flash_phase_masks = tuple(bytes(0xff if i - 1 == p or i + 2 == p else 0x00 for i in range(256)) for p in range(6))
+	_sixel_masks = tuple(bytes(0xff if i & (1 << k) else 0x00 for i in range(256)) for k in range(6))
+	_conceal_mask = bytes(0xff if i & teletextdecoder.TeletextPage.DISP_CONCEAL else 0x00 for i in range(256))
+	_invert_mask = bytes(0xff if i & teletextdecoder.TeletextPage.DISP_INVERT else 0x00 for i in range(256))
 
+	def render(self, decoder, border=(80, 38), flash_phase=0, reveal=False, hscale=1):
+		'''
+		Renders a decoded page into a palette image. decoder can be either a
+		DecodedPage or a TeletextDecode instance that has decoded a page.
+
+		hscale scales the width of the image, giving the same image as resizing
+		it with nearest neighbour resampling would, for example 1.2 to give
+		teletext's pixels their 4:3 aspect ratio.
+		'''
 		font_width = 12
 		font_height = 20
 
@@ -49,7 +40,8 @@ class TeletextRenderPIL:
 			border_lr = border
 			border_tb = border
 
-		im_width = font_width * (40 + decoder.left_side_panel + decoder.right_side_panel) + border_lr * 2
+		unscaled_width = font_width * (40 + decoder.left_side_panel + decoder.right_side_panel) + border_lr * 2
+		im_width = int(unscaled_width * hscale)
 		im_height = font_height * 25 + border_tb * 2
 
 		im = Image.new(mode='P', size=(im_width, im_height))
@@ -67,132 +59,286 @@ class TeletextRenderPIL:
 			[0, im_height - border_tb, im_width - 1, im_height - 1], fill=decoder.full_screen
 		)
 
+		column_map = teletextfonts.column_map(unscaled_width, im_width)
+		spans = self.column_spans(decoder, border_lr, column_map)
+		# Shown columns from left to right: left side panel, main page, right side panel
+		columns = sorted((c for c in range(72) if spans[c] != None), key=lambda c: spans[c][0])
+		left_border_x = bisect_left(column_map, border_lr)
+		right_border_x = bisect_left(column_map, unscaled_width - border_lr)
+
 		for r in range(25):
 			origin_y = border_tb + r * font_height;
 
 			# Draw the left and right Full Row Colour for this row
+			if left_border_x > 0:
+				im_draw.rectangle(
+					[0, origin_y, left_border_x - 1, origin_y + font_height - 1],
+					fill=decoder.full_row[r]
+				)
 			im_draw.rectangle(
-				[0, origin_y, border_lr - 1, origin_y + font_height - 1],
-				fill=decoder.full_row[r]
+				[bisect_left(column_map, unscaled_width - border_lr - 1), origin_y, im_width - 1, origin_y + font_height - 1], fill=decoder.full_row[r]
 			)
-			im_draw.rectangle(
-				[im_width - border_lr - 1, origin_y, im_width - 1, origin_y + font_height - 1], fill=decoder.full_row[r]
+
+			# Fill runs of cells with the same background colour at once, then put
+			# the foreground characters on top of them. Spaces draw nothing.
+			run_x = None
+			run_background = None
+			glyphs = []
+			for c in columns:
+				start_x, end_x, pattern = spans[c]
+				background, foreground, mask = self.paint_cell(decoder, r, c, flash_phase, reveal, pattern)
+				if background != run_background:
+					if run_x != None:
+						im.paste(run_background, (run_x, origin_y, start_x, origin_y + font_height))
+					run_x = start_x
+					run_background = background
+				if mask is not teletextfonts.blank_mask and end_x > start_x:
+					glyphs.append((foreground, start_x, end_x, mask))
+			im.paste(run_background, (run_x, origin_y, right_border_x, origin_y + font_height))
+
+			for foreground, start_x, end_x, mask in glyphs:
+				im.paste(foreground, (start_x, origin_y, end_x, origin_y + font_height), mask)
+
+		return im
+
+	def render_flash_frames(self, decoder, flash_phases, border=(80, 38), reveal=False, hscale=1):
+		'''
+		Renders a decoded page at each of the flash phases in the list, yielding
+		the flash phase, the image and the bounding box of the part of the image
+		that differs from the image at flash phase 0.
+
+		The page is rendered in full once, and each frame is made from a copy of
+		that by drawing again only the cells that flash. The bounding box is None
+		if no cells flash, and the whole image for flash phase 0.
+		'''
+		font_width = 12
+		font_height = 20
+
+		if type(border) is tuple:
+			border_lr, border_tb = border
+		else:
+			border_lr = border
+			border_tb = border
+
+		base_im = self.render(decoder, border, 0, reveal, hscale)
+
+		unscaled_width = font_width * (40 + decoder.left_side_panel + decoder.right_side_panel) + border_lr * 2
+		spans = self.column_spans(decoder, border_lr, teletextfonts.column_map(unscaled_width, base_im.width))
+		flash_cells = [(i // 72, i % 72) for i in range(25 * 72) if decoder.fl_mode[i] != 0 and spans[i % 72] != None]
+
+		if flash_cells:
+			bbox = (
+				min(spans[c][0] for r, c in flash_cells),
+				border_tb + min(r for r, c in flash_cells) * font_height,
+				max(spans[c][1] for r, c in flash_cells),
+				border_tb + (max(r for r, c in flash_cells) + 1) * font_height
 			)
+		else:
+			bbox = None
+
+		for flash_phase in flash_phases:
+			im = base_im.copy()
+			if flash_phase == 0:
+				yield flash_phase, im, (0, 0, im.width, im.height)
+				continue
+
+			for r, c in flash_cells:
+				self.draw_cell(im, decoder, r, c, spans[c], border_tb + r * font_height, flash_phase, reveal)
+			yield flash_phase, im, bbox
+
+	def render_preview(self, decoder, border=0, flash_phase=0, reveal=False):
+		'''
+		Renders a small preview of a decoded page into a palette image, with
+		each character cell drawn as a 2x3 block of pixels, one for each sixel.
+		Mosaic characters are drawn from their sixels and other characters as
+		a bar of foreground colour across the middle of the block, see
+		teletextfonts.sixel_table(). border is measured in preview pixels.
+
+		The page is worked out a whole plane at a time rather than cell by
+		cell, so this is much cheaper than render().
+		'''
+		if type(border) is tuple:
+			border_lr, border_tb = border
+		else:
+			border_lr = border
+			border_tb = border
 
-			for c in range(72):
-				if c < 56:
-					if c >= 40 + decoder.right_side_panel:
-						continue
-					origin_x = border_lr + (c + decoder.left_side_panel) * font_width
-				else:
-					dc = c - (72 - decoder.left_side_panel)
-					if dc < 0:
-						continue
-					origin_x = border_lr + dc * font_width
-
-				if decoder.get_conceal(r, c) and not reveal:
-					char_code = 0x20
-					char_set = 0
-					char_diacritic = 0
-				else:
-					# char_code may get changed to 0x00 on flash phase
-					char_code = decoder.get_char_code(r, c)
-					char_set = decoder.get_char_set(r, c)
-					char_diacritic = decoder.get_char_diacritic(r, c)
-
-				load_font(char_set)
-
-				if not decoder.get_invert(r, c):
-					foreground = decoder.get_foreground(r, c)
-					background = decoder.get_background(r, c)
-				else:
-					foreground = decoder.get_background(r, c)
-					background = decoder.get_foreground(r, c)
-
-				if decoder.get_flash_mode(r, c) != 0:
-					# Flashing cell, decide if phase in this cycle is on or off
-					if decoder.get_flash_rate_phase(r, c) == 0:
-						flash_phon = (flash_phase < 3) ^ (decoder.get_flash_mode(r, c) == 2)
-					else:
-						flash_phon = ((flash_phase == decoder.get_flash_phase_shown(r, c)-1) or (flash_phase == decoder.get_flash_phase_shown(r, c)+2)) ^ (decoder.get_flash_mode(r, c) == 2)
-
-				# If flashing to adjacent CLUT select the appropriate foreground colour
-				if decoder.get_flash_mode(r, c) == 3 and not flash_phon:
-					foreground = decoder.get_flash_foreground(r, c)
-
-				# If flashing mode is Normal or Invert, draw a space instead of a character on phase
-				# Character 0x00 draws space without underline
-				if (decoder.get_flash_mode(r, c) == 1 or decoder.get_flash_mode(r, c) == 2) and not flash_phon:
-					char_code = 0x00
-					char_set = 0
-					char_diacritic = 0
-
-				# This becomes a character-size image if we can't draw the text directly.
-				# This applies if...
-				# - the character will be enlarged
-				# - the character has a G0 diacritical mark added
-				char_im = None
-
-				diacritic_reduce = char_diacritic != 0 and char_code >= 0x41 and char_code <= 0x5a
-				# Capital letter with G0 diacritical mark has a reduced height
-				if diacritic_reduce:
-					load_font(27)
-
-				if char_diacritic != 0 or decoder.get_fragment(r, c) != decoder.Frag.NORMALSIZE:
-					# Draw cell rectangle in background colour and put the foreground character on top
-					char_im = Image.new(mode='P', size=(font_width, font_height))
-					char_im_draw = ImageDraw.Draw(char_im)
-					char_im_draw.rectangle([0, 0, font_width - 1, font_height - 1], background)
-					if diacritic_reduce:
-						char_set = 27
-					if char_code != 0x00:
-						char_im_draw.text((0, 0), chr(char_code), foreground, font=self.tt_font[char_set])
-					if char_diacritic != 0:
-						# Diacritical marks come from the G2 Latin set
-						load_font(7)
-						char_im_draw.text((0, 0), chr(char_diacritic + 0x40), foreground, font=self.tt_font[7])
-
-				if char_im == None:
-					# Draw cell rectangle in background colour and put the foreground character on top
-					im_draw.rectangle([origin_x, origin_y, origin_x + font_width - 1, origin_y + font_height - 1], background)
-					if char_code != 0x00:
-						im_draw.text((origin_x, origin_y), chr(char_code), fill=foreground, font=self.tt_font[char_set])
-						if decoder.get_und_sep(r, c) and char_set < 24:
-							im_draw.rectangle([origin_x, origin_y + font_height - 2, origin_x + font_width - 1, origin_y + font_height - 1], foreground)
-				else:
-					if decoder.get_fragment(r, c) == decoder.Frag.NORMALSIZE:
-						frag_im = char_im
-					elif decoder.get_fragment(r, c) == decoder.Frag.DH_TOPHALF:
-						enlarge_im = char_im.resize((font_width, font_height * 2))
-						frag_im = enlarge_im.crop((0, 0, font_width, font_height))
-					elif decoder.get_fragment(r, c) == decoder.Frag.DH_BOTTOMHALF:
-						enlarge_im = char_im.resize((font_width, font_height * 2))
-						frag_im = enlarge_im.crop((0, font_height, font_width, font_height * 2))
-					elif decoder.get_fragment(r, c) == decoder.Frag.DW_LEFTHALF:
-						enlarge_im = char_im.resize((font_width * 2, font_height))
-						frag_im = enlarge_im.crop((0, 0, font_width, font_height))
-					elif decoder.get_fragment(r, c) == decoder.Frag.DW_RIGHTHALF:
-						enlarge_im = char_im.resize((font_width * 2, font_height))
-						frag_im = enlarge_im.crop((font_width, 0, font_width * 2, font_height))
-					elif decoder.get_fragment(r, c) == decoder.Frag.DS_TOPLEFTQUARTER:
-						enlarge_im = char_im.resize((font_width * 2, font_height * 2))
-						frag_im = enlarge_im.crop((0, 0, font_width, font_height))
-					elif decoder.get_fragment(r, c) == decoder.Frag.DS_TOPRIGHTQUARTER:
-						enlarge_im = char_im.resize((font_width * 2, font_height * 2))
-						frag_im = enlarge_im.crop((font_width, 0, font_width * 2, font_height))
-					elif decoder.get_fragment(r, c) == decoder.Frag.DS_BOTTOMLEFTQUARTER:
-						enlarge_im = char_im.resize((font_width * 2, font_height * 2))
-						frag_im = enlarge_im.crop((0, font_height, font_width, font_height * 2))
-					elif decoder.get_fragment(r, c) == decoder.Frag.DS_BOTTOMRIGHTQUARTER:
-						enlarge_im = char_im.resize((font_width * 2, font_height * 2))
-						frag_im = enlarge_im.crop((font_width, font_height, font_width * 2, font_height * 2))
-
-					im.paste(frag_im, (origin_x, origin_y))
-
-					if char_code != 0x00 and decoder.get_und_sep(r, c) and decoder.get_char_set(r, c) < 24:
-						if decoder.get_fragment(r, c) == decoder.Frag.NORMALSIZE or decoder.get_fragment(r, c) == decoder.Frag.DW_LEFTHALF or decoder.get_fragment(r, c) == decoder.Frag.DW_RIGHTHALF:
-							im_draw.rectangle([origin_x, origin_y + font_height - 2, origin_x + font_width - 1, origin_y + font_height - 1], foreground)
-						elif decoder.get_fragment(r, c) == decoder.Frag.DH_BOTTOMHALF or decoder.get_fragment(r, c) == decoder.Frag.DS_BOTTOMLEFTQUARTER or decoder.get_fragment(r, c) == decoder.Frag.DS_BOTTOMRIGHTQUARTER:
-							im_draw.rectangle([origin_x, origin_y + font_height - 3, origin_x + font_width - 1, origin_y + font_height - 1], foreground)
+		size = 25 * 72
+
+		def select(mask, a, b):
+			# The bytes of a where mask is 0xff and of b where it is 0x00
+			m = int.from_bytes(mask, 'big')
+			return ((int.from_bytes(a, 'big') & m) | (int.from_bytes(b, 'big') & ~m)).to_bytes(size, 'big')
+
+		ch_code = bytes(decoder.ch_code)
+		ch_set = bytes(decoder.ch_set)
+		display = bytes(decoder.display)
+		frag = bytes(decoder.frag)
+		fl_mode = bytes(decoder.fl_mode)
+
+		sixels = ch_code.translate(teletextfonts.sixel_table(0))
+		for char_set in (24, 25, 26):
+			if char_set in ch_set:
+				sixels = select(ch_set.translate(self._equal_masks[char_set]), ch_code.translate(teletextfonts.sixel_table(char_set)), sixels)
+		if not reveal:
+			sixels = select(display.translate(self._conceal_mask), bytes(size), sixels)
+		for fragment in teletextdecoder.TeletextPage.Frag:
+			if fragment != 0 and fragment in frag:
+				sixels = select(frag.translate(self._equal_masks[fragment]), sixels.translate(teletextfonts.fragment_sixel_table(fragment)), sixels)
+
+		invert = display.translate(self._invert_mask)
+		foreground = select(invert, bytes(decoder.res_background), bytes(decoder.res_foreground))
+		background = select(invert, bytes(decoder.res_foreground), bytes(decoder.res_background))
+
+		if fl_mode.count(0) != size:
+			# Find the flashing cells that are off in this phase, as render() does
+			flash_on = select(
+				bytes(decoder.fl_rate_phase).translate(self._equal_masks[0]),
+				bytes((0xff if flash_phase < 3 else 0x00, )) * size,
+				bytes(decoder.fl_phase_shown).translate(self._flash_phase_masks[flash_phase])
+			)
+			# Flashing mode Invert is off when the others are on
+			flash_off = select(flash_on, bytes(size), fl_mode.translate(self._nonzero_mask))
+			flash_off = select(fl_mode.translate(self._equal_masks[2]), flash_on, flash_off)
+			# Flashing to adjacent CLUT shows the other foreground colour, other modes show nothing
+			adjacent = select(fl_mode.translate(self._equal_masks[3]), flash_off, bytes(size))
+			foreground = select(adjacent, bytes(decoder.res_flash_foreground), foreground)
+			sixels = select(select(adjacent, bytes(size), flash_off), bytes(size), sixels)
+
+		# One plane for each sixel of the cells, then put the left and right
+		# sixels of each row of sixels side by side
+		pixels = [select(sixels.translate(m), foreground, background) for m in self._sixel_masks]
+		lines = []
+		for y in range(3):
+			line = bytearray(size * 2)
+			line[0::2] = pixels[y * 2]
+			line[1::2] = pixels[y * 2 + 1]
+			lines.append(line)
+
+		im_width = 2 * (40 + decoder.left_side_panel + decoder.right_side_panel) + border_lr * 2
+		im_height = 3 * 25 + border_tb * 2
+
+		rows = [bytes((decoder.full_screen, )) * im_width] * border_tb
+		for r in range(25):
+			full_row = bytes((decoder.full_row[r], )) * border_lr
+			for line in lines:
+				row = line[r * 144:(r + 1) * 144]
+				# Left side panel, main page, right side panel
+				rows.append(full_row + row[144 - decoder.left_side_panel * 2:] + row[:(40 + decoder.right_side_panel) * 2] + full_row)
+		rows += [bytes((decoder.full_screen, )) * im_width] * border_tb
+
+		im = Image.frombytes('P', (im_width, im_height), b''.join(rows))
+
+		im.putpalette(decoder.get_palette(), rawmode='RGB')
+		im.info.update( { "transparency": 8 } )
 
 		return im
+
+	@staticmethod
+	def column_spans(decoder, border_lr, column_map):
+		'''
+		Returns where each of the 72 columns of a decoded page is drawn in an
+		image whose columns show the columns of the unscaled image listed in
+		column_map, see teletextfonts.column_map(). Each is the x coordinates
+		the column starts and ends at and which of its 12 pixels are shown, or
+		None if all of them are shown once. Columns that are not shown are
+		None. Columns 56 to 71 hold the left side panel and columns 40 to 55
+		the right side panel.
+		'''
+		font_width = 12
+		unscaled_pattern = tuple(range(font_width))
+
+		result = [None] * 72
+		for c in range(72):
+			if c < 56:
+				if c >= 40 + decoder.right_side_panel:
+					continue
+				origin_x = border_lr + (c + decoder.left_side_panel) * font_width
+			else:
+				dc = c - (72 - decoder.left_side_panel)
+				if dc < 0:
+					continue
+				origin_x = border_lr + dc * font_width
+			start_x = bisect_left(column_map, origin_x)
+			end_x = bisect_left(column_map, origin_x + font_width)
+			pattern = tuple(x - origin_x for x in column_map[start_x:end_x])
+			if pattern == unscaled_pattern:
+				pattern = None
+			result[c] = (start_x, end_x, pattern)
+		return result
+
+	def draw_cell(self, im, decoder, r, c, span, origin_y, flash_phase, reveal):
+		'''
+		Draws one cell of a decoded page into the image at the row origin_y and
+		the columns given by span, see column_spans().
+		'''
+		start_x, end_x, pattern = span
+		if end_x == start_x:
+			return
+		background, foreground, mask = self.paint_cell(decoder, r, c, flash_phase, reveal, pattern)
+		cell_box = (start_x, origin_y, end_x, origin_y + 20)
+
+		# Fill cell in background colour and put the foreground character on top
+		im.paste(background, cell_box)
+		if mask is not teletextfonts.blank_mask:
+			im.paste(foreground, cell_box, mask)
+
+	@staticmethod
+	def paint_cell(decoder, r, c, flash_phase, reveal, pattern=None):
+		'''
+		Returns the background colour, foreground colour and glyph mask that a
+		cell of a decoded page is drawn with. pattern is passed on to
+		teletextfonts.glyph() to scale the mask.
+		'''
+		if decoder.get_conceal(r, c) and not reveal:
+			char_code = 0x20
+			char_set = 0
+			char_diacritic = 0
+		else:
+			# char_code may get changed to 0x00 on flash phase
+			char_code = decoder.get_char_code(r, c)
+			char_set = decoder.get_char_set(r, c)
+			char_diacritic = decoder.get_char_diacritic(r, c)
+
+		if not decoder.get_invert(r, c):
+			foreground = decoder.get_foreground(r, c)
+			background = decoder.get_background(r, c)
+		else:
+			foreground = decoder.get_background(r, c)
+			background = decoder.get_foreground(r, c)
+
+		if decoder.get_flash_mode(r, c) != 0:
+			# Flashing cell, decide if phase in this cycle is on or off
+			if decoder.get_flash_rate_phase(r, c) == 0:
+				flash_phon = (flash_phase < 3) ^ (decoder.get_flash_mode(r, c) == 2)
+			else:
+				flash_phon = ((flash_phase == decoder.get_flash_phase_shown(r, c)-1) or (flash_phase == decoder.get_flash_phase_shown(r, c)+2)) ^ (decoder.get_flash_mode(r, c) == 2)
+
+		# If flashing to adjacent CLUT select the appropriate foreground colour
+		if decoder.get_flash_mode(r, c) == 3 and not flash_phon:
+			foreground = decoder.get_flash_foreground(r, c)
+
+		# If flashing mode is Normal or Invert, draw a space instead of a character on phase
+		# Character 0x00 draws space without underline
+		if (decoder.get_flash_mode(r, c) == 1 or decoder.get_flash_mode(r, c) == 2) and not flash_phon:
+			char_code = 0x00
+			char_set = 0
+			char_diacritic = 0
+
+		fragment = decoder.get_fragment(r, c)
+
+		if fragment != decoder.Frag.NORMALSIZE or char_diacritic != 0:
+			underline = char_code != 0x00 and decoder.get_und_sep(r, c) and decoder.get_char_set(r, c) < 24
+			# Capital letter with G0 diacritical mark has a reduced height
+			if char_diacritic != 0 and char_code >= 0x41 and char_code <= 0x5a:
+				char_set = 27
+			if fragment != decoder.Frag.NORMALSIZE:
+				mask = teletextfonts.fragment_glyph(char_set, char_code, char_diacritic, fragment, underline, pattern)
+			else:
+				mask = teletextfonts.glyph(char_set, char_code, char_diacritic, underline, pattern)
+		elif char_code != 0x00:
+			mask = teletextfonts.glyph(char_set, char_code, 0, decoder.get_und_sep(r, c) and char_set < 24, pattern)
+		else:
+			mask = teletextfonts.blank_mask
+
+		return background, foreground, mask
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+import codecs
+import html
+import re
+import unicodedata
+
+from teletextimager import teletextdecoder, teletextfonts
+
+Frag = teletextdecoder.TeletextPage.Frag
+
+# Unicode characters of codes 0x20 to 0x7f of the Latin G0 set without a
+# national option subset
+_latin_g0 = ' !"#¤%&\'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_`abcdefghijklmnopqrstuvwxyz{|}~■'
+
+def _national_option(chars):
+	# The Latin G0 set with the 13 characters of a national option subset put in
+	table = list(_latin_g0)
+	for code, char in zip((0x23, 0x24, 0x40, 0x5b, 0x5c, 0x5d, 0x5e, 0x5f, 0x60, 0x7b, 0x7c, 0x7d, 0x7e), chars):
+		table[code - 0x20] = char
+	return ''.join(table)
+
+def _g2(chars):
+	# A Latin, Cyrillic or Greek G2 set, which share their diacritical marks at 0x40 to 0x4f
+	return chars[:0x20] + ' `´ˆ˜¯˘˙¨.˚¸_˝˛ˇ' + chars[0x20:]
+
+def sextant(sixels):
+	'''
+	Returns the Unicode block sextant character with the given sixels set,
+	see teletextfonts.sixel_table().
+	'''
+	if sixels == 0x00:
+		return ' '
+	# Three of the blocks were in Unicode before the others
+	if sixels == 0x15:
+		return '▌'
+	if sixels == 0x2a:
+		return '▐'
+	if sixels == 0x3f:
+		return '█'
+	return chr(0x1fb00 + sixels - 1 - int(sixels > 0x15) - int(sixels > 0x2a))
+
+# Unicode characters of codes 0x20 to 0x7f of each character set, in the
+# order of teletextfonts.font_filename. Smooth mosaics are filled in by
+# unicode_char() when they are first needed.
+char_table = [
+	# 0 - Latin G0 character set placed by X/26 enhancement
+	_latin_g0,
+	# 1-6 - Non-Latin G0 character sets
+	' !"#$%&\'()*+,-./0123456789:;<=>?ЧАБЦДЕФГХИЈКЛМНОПЌРСТУВЃЉЊЗЋЖЂШЏчабцдефгхијклмнопќрстувѓљњзћжђш■',
+	' !"#$%ы\'()*+,-./0123456789:;<=>?ЮАБЦДЕФГХИЙКЛМНОПЯРСТУЖВЬЪЗШЭЩЧЫюабцдефгхийклмнопярстужвьъзшэщч■',
+	' !"#$%ї\'()*+,-./0123456789:;<=>?ЮАБЦДЕФГХИЙКЛМНОПЯРСТУЖВЬІЗШЄЩЧЇюабцдефгхийклмнопярстужвьізшєщч■',
+	' !"#$%&\'()*+,-./0123456789:;«=»?ΐΑΒΓΔΕΖΗΘΙΚΛΜΝΞΟΠΡ΄ΣΤΥΦΧΨΩΪΫάέήίΰαβγδεζηθικλμνξοπρςστυφχψωϊϋόύώ■',
+	' !"£$%ﻲﻱ)(*+،-./0123456789:؛>=<؟'
+		'ﺔءﺒبﺘتﺎاﺑﺓﺗﺛﺟﺣﺧﺩ'
+		'ﺫﺭﺯﺳﺷﺻﺿﻁﻅﻋﻏﺜﺠﺤﺨ#'
+		'ـﻓﻗﻛﻟﻣﻧﻫﻭﻯﻳﺙﺝﺡﺥﻴ'
+		'ﻰﻌﻐﻔﻑﻘﻕﻜﻠﻝﻤﻡﻨﻥﻻ■',
+	' !"£$%&\'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ←½→↑#אבגדהוזחטיךכלםמןנסעףפץצקרשת₪‖¾÷■',
+	# 7-10 - G2 character sets
+	_g2(' ¡¢£$¥#§¤‘“«←↑→↓°±²³×µ¶·÷’”»¼½¾¿―¹®©™♪€‰α   ⅛⅜⅝⅞ΩÆĐªĦ ĲĿŁØŒºÞŦŊŉĸæđðħıĳŀłøœßþŧŋ■'),
+	_g2(' ¡¢£$¥ § ‘“«←↑→↓°±²³×µ¶·÷’”»¼½¾¿―¹®©™♪€‰αŁłß⅛⅜⅝⅞DEFGIJKLNQRSUVWZdefgijklnqrsuvwz'),
+	_g2(' ab£ehi§:‘“k←↑→↓°±²³×mnp÷’”t¼½¾x?¹®©™♪€‰αΊΎΏ⅛⅜⅝⅞CDFGJLQRSUVWYZΆΉcdfgjlqrsuvwyzΈ■'),
+	' ﻉﺁﺃﺅﺇﺋﺉﭼﭽﭺﭘﭙﭖﮊﮔ'
+		'٠١٢٣٤٥٦٧٨٩ﻎﻍﻼﻬﻪﻩ'
+		'àABCDEFGHIJKLMNOPQRSTUVWXYZëêùîﻊéabcdefghijklmnopqrstuvwxyzâôûç ',
+	# 11-23 - Latin G0 sets with NOS
+	_national_option('#ůčťžýířéáěúš'),
+	_national_option('£$@←½→↑#―¼‖¾÷'),
+	_national_option('#õŠÄÖŽÜÕšäöžü'),
+	_national_option('éïàëêùî#èâôûç'),
+	_national_option('#$§ÄÖÜ^_°äöüß'),
+	_national_option('£$é°ç→↑#ùàòèì'),
+	_national_option('#$ŠėęŽčūšąųžį'),
+	_national_option('#ńąƵŚŁćóężśłź'),
+	_national_option('ç$¡áéíóú¿üñèà'),
+	_national_option('#¤ŢÂŞĂÎıţâşăî'),
+	_national_option('#ËČĆŽĐŠëčćžđš'),
+	_national_option('#¤ÉÄÖÅÜ_éäöåü'),
+	_national_option('₺ğİŞÖÇÜĞışöçü'),
+	# 24-26 - G1 and G3 mosaics sets, with blast through characters from Latin G0
+	''.join(sextant(teletextfonts.sixel_table(24)[c]) if c & 0x20 else _latin_g0[c - 0x20] for c in range(0x20, 0x80)),
+	''.join(sextant(teletextfonts.sixel_table(25)[c]) if c & 0x20 else _latin_g0[c - 0x20] for c in range(0x20, 0x80)),
+	None,
+	# 27 - G0 reduced height for diacriticals
+	_latin_g0
+]
+
+# Tables for codecs.charmap_decode(), see decoding_table()
+_decoding_tables = {}
+
+# Combining characters for the G2 diacritical marks 1 to 15
+_combining = '\u0300\u0301\u0302\u0303\u0304\u0306\u0307\u0308\u0323\u030a\u0327\u0332\u030b\u0328\u030c'
+
+def unicode_char(char_set, char_code, char_diacritic=0):
+	'''
+	Returns the Unicode character for a character code in one of the
+	character sets of teletextfonts.font_filename, with a G2 diacritical
+	mark which is composed with it where Unicode can. Smooth mosaics are
+	shown as the block sextant they mostly cover.
+	'''
+	if char_code < 0x20 or char_code > 0x7f:
+		return ' '
+	if char_table[char_set] == None:
+		char_table[char_set] = ''.join(sextant(s) for s in teletextfonts.sixel_table(char_set)[0x20:0x80])
+	char = char_table[char_set][char_code - 0x20]
+	if char_diacritic != 0:
+		char = unicodedata.normalize('NFC', char + _combining[char_diacritic - 1])
+	return char
+
+def decoding_table(char_set):
+	'''
+	Returns a table for codecs.charmap_decode() to decode character codes in
+	a character set to Unicode, with no diacritical marks.
+	'''
+	table = _decoding_tables.get(char_set)
+	if table == None:
+		table = ''.join(unicode_char(char_set, c) for c in range(256))
+		_decoding_tables[char_set] = table
+	return table
+
+def runs(foreground, background):
+	'''
+	Returns the start and end of each run of cells in a row with the same
+	foreground and background colours.
+	'''
+	result = []
+	start = 0
+	for k in range(1, len(foreground)):
+		if foreground[k] != foreground[start] or background[k] != background[start]:
+			result.append((start, k))
+			start = k
+	result.append((start, len(foreground)))
+	return result
+
+class TeletextRenderText:
+	'''
+	Renders a decoded page as Unicode text, one line for each row. decoder
+	can be either a DecodedPage or a TeletextDecode instance that has decoded
+	a page.
+
+	Mosaics are shown as block sextants. Enlarged characters are shown once,
+	in their top left cell, and enlarged mosaics are shown across all their cells.
+	'''
+	# Cells with these attributes are worked out one at a time by cell()
+	_special_display = bytes(i & (teletextdecoder.TeletextPage.DISP_CONCEAL | teletextdecoder.TeletextPage.DISP_INVERT) for i in range(256))
+
+	def render(self, decoder, flash_phase=0, reveal=False):
+		'''
+		Returns the whole page as one string.
+		'''
+		return ''.join(self.render_stream(decoder, flash_phase, reveal))
+
+	def render_stream(self, decoder, flash_phase=0, reveal=False):
+		'''
+		Yields the page one row at a time, so it can be written out while the
+		rest of the page is worked out.
+		'''
+		for r in range(25):
+			chars, foreground, background = self.row(decoder, r, flash_phase, reveal)
+			yield ''.join(chars) + '\n'
+
+	@classmethod
+	def row(cls, decoder, r, flash_phase=0, reveal=False):
+		'''
+		Returns a list of the characters shown in each cell of a row and the
+		foreground and background colours of the cells, from left to right
+		across the left side panel, the main page and the right side panel.
+		'''
+		start = r * 72
+		def shown(plane):
+			row = bytes(plane[start:start + 72])
+			return row[72 - decoder.left_side_panel:] + row[:40 + decoder.right_side_panel]
+
+		# Decode the whole row with each character set used in it
+		codes = shown(decoder.ch_code)
+		sets = shown(decoder.ch_set)
+		decoded = { s: codecs.charmap_decode(codes, 'strict', decoding_table(s))[0] for s in set(sets) }
+		if len(decoded) == 1:
+			chars = list(decoded[sets[0]])
+		else:
+			chars = [decoded[s][k] for k, s in enumerate(sets)]
+		foreground = bytearray(shown(decoder.res_foreground))
+		background = bytearray(shown(decoder.res_background))
+
+		# Then work out the cells where that isn't enough one at a time
+		special = int.from_bytes(shown(decoder.display).translate(cls._special_display), 'big')
+		special |= int.from_bytes(shown(decoder.ch_diacritic), 'big') | int.from_bytes(shown(decoder.fl_mode), 'big') | int.from_bytes(shown(decoder.frag), 'big')
+		if special != 0:
+			columns = list(range(72 - decoder.left_side_panel, 72)) + list(range(40 + decoder.right_side_panel))
+			for match in re.finditer(b'[^\\x00]', special.to_bytes(len(codes), 'big')):
+				k = match.start()
+				chars[k], foreground[k], background[k] = cls.cell(decoder, r, columns[k], flash_phase, reveal)
+
+		return chars, foreground, background
+
+	@staticmethod
+	def cell(decoder, r, c, flash_phase=0, reveal=False):
+		'''
+		Returns the character, foreground colour and background colour shown
+		in a cell.
+		'''
+		i = r * 72 + c
+		char_code = decoder.ch_code[i]
+		char_set = decoder.ch_set[i]
+		display = decoder.display[i]
+
+		if display & decoder.DISP_CONCEAL and not reveal:
+			char_code = 0x20
+
+		if not display & decoder.DISP_INVERT:
+			foreground = decoder.res_foreground[i]
+			background = decoder.res_background[i]
+		else:
+			foreground = decoder.res_background[i]
+			background = decoder.res_foreground[i]
+
+		flash_mode = decoder.fl_mode[i]
+		if flash_mode != 0:
+			# Flashing cell, decide if phase in this cycle is on or off
+			if decoder.fl_rate_phase[i] == 0:
+				flash_phon = (flash_phase < 3) ^ (flash_mode == 2)
+			else:
+				flash_phon = ((flash_phase == decoder.fl_phase_shown[i]-1) or (flash_phase == decoder.fl_phase_shown[i]+2)) ^ (flash_mode == 2)
+			if not flash_phon:
+				if flash_mode == 3:
+					foreground = decoder.res_flash_foreground[i]
+				else:
+					char_code = 0x00
+
+		fragment = decoder.frag[i]
+		if char_set >= 24 and char_set <= 26 and (char_code & 0x20 or char_set == 26):
+			sixels = teletextfonts.sixel_table(char_set)[char_code]
+			if fragment != Frag.NORMALSIZE:
+				sixels = teletextfonts.fragment_sixel_table(Frag(fragment))[sixels]
+			char = sextant(sixels)
+		elif fragment == Frag.NORMALSIZE or fragment == Frag.DH_TOPHALF or fragment == Frag.DW_LEFTHALF or fragment == Frag.DS_TOPLEFTQUARTER:
+			char = unicode_char(char_set, char_code, decoder.ch_diacritic[i])
+		else:
+			char = ' '
+
+		return char, foreground, background
+
+class TeletextRenderANSI(TeletextRenderText):
+	'''
+	Renders a decoded page as Unicode text with ANSI escape codes to colour it
+	for a terminal, using 24 bit colour or the 256 colour palette.
+	'''
+	def __init__(self, truecolor=True):
+		self.truecolor = truecolor
+
+	def colour_code(self, palette, colour, ground):
+		'''
+		Returns the SGR parameters to set the foreground (ground 30) or
+		background (ground 40) to a colour from the page's palette.
+		Colour 8 is transparent and leaves the terminal's default colour.
+		'''
+		if colour == 8:
+			return str(ground + 9)
+		red, green, blue = palette[colour * 3:colour * 3 + 3]
+		if self.truecolor:
+			return '{0};2;{1};{2};{3}'.format(ground + 8, red, green, blue)
+		# Nearest colour in the 6x6x6 cube
+		return '{0};5;{1}'.format(ground + 8, 16 + 36 * round(red * 5 / 255) + 6 * round(green * 5 / 255) + round(blue * 5 / 255))
+
+	def render_stream(self, decoder, flash_phase=0, reveal=False):
+		palette = decoder.get_palette()
+		foreground_codes = [self.colour_code(palette, colour, 30) for colour in range(32)]
+		background_codes = [self.colour_code(palette, colour, 40) for colour in range(32)]
+
+		for r in range(25):
+			chars, foreground, background = self.row(decoder, r, flash_phase, reveal)
+			line = []
+			for start, end in runs(foreground, background):
+				line.append('\x1b[' + foreground_codes[foreground[start]] + ';' + background_codes[background[start]] + 'm')
+				line.extend(chars[start:end])
+			yield ''.join(line) + '\x1b[0m\n'
+
+class TeletextRenderHTML(TeletextRenderText):
+	'''
+	Renders a decoded page as a HTML pre element, with a span for each run
+	of characters with the same colours.
+	'''
+	@staticmethod
+	def colour_value(palette, colour):
+		'''
+		Returns the CSS value of a colour from the page's palette. Colour 8 is transparent.
+		'''
+		if colour == 8:
+			return 'transparent'
+		return '#{0:02x}{1:02x}{2:02x}'.format(*palette[colour * 3:colour * 3 + 3])
+
+	def render_stream(self, decoder, flash_phase=0, reveal=False):
+		palette = decoder.get_palette()
+		values = [self.colour_value(palette, colour) for colour in range(32)]
+
+		yield '<pre class="teletext">\n'
+		for r in range(25):
+			chars, foreground, background = self.row(decoder, r, flash_phase, reveal)
+			line = []
+			for start, end in runs(foreground, background):
+				line.append('<span style="color:{0};background-color:{1}">{2}</span>'.format(values[foreground[start]], values[background[start]], html.escape(''.join(chars[start:end]), quote=False)))
+			yield ''.join(line) + '\n'
+		yield '</pre>\n'